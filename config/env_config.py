@@ -39,7 +39,18 @@ def cleanup_previous_env():
         'SOURCE_DB_NAME', 'SOURCE_DB_USER', 'SOURCE_DB_PASSWORD',
         'SOURCE_DB_HOST', 'SOURCE_DB_PORT',
         'TARGET_DB_NAME', 'TARGET_DB_USER', 'TARGET_DB_PASSWORD',
-        'TARGET_DB_HOST', 'TARGET_DB_PORT'
+        'TARGET_DB_HOST', 'TARGET_DB_PORT',
+        'DB_POOL_MIN', 'DB_POOL_MAX', 'DB_POOL_TIMEOUT',
+        'DB_POOL_HEALTHCHECK_INTERVAL',
+        'WEATHER_API_BASE_URL', 'WEATHER_API_TIMEOUT', 'WEATHER_API_RETRIES',
+        'WEATHER_API_BACKOFF', 'WEATHER_API_POOL_SIZE', 'WEATHER_API_CACHE_ENTRIES',
+        'WEATHER_API_CALLS_PER_MINUTE', 'WEATHER_API_BURST',
+        'INGEST_CITIES', 'INGEST_MAX_CONCURRENCY',
+        'QUERY_CACHE_TTL', 'QUERY_CACHE_MAX_ENTRIES',
+        'WEATHER_READ_MODE', 'AGGREGATION_MODE', 'WEATHER_SNAPSHOT_DIR',
+        'WEATHER_ASSET_CACHE_DIR', 'METRICS_TEXTFILE',
+        'TRANSFORM_FULL_REFRESH_SECONDS', 'WEATHER_DATA_PARTITIONED',
+        'CHART_MAX_POINTS', 'WEATHER_CHANGE_LISTENER', 'WEATHER_DATA_RETENTION_DAYS'
     ]
     for key in keys_to_clear:
         if key in os.environ:
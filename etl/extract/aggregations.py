@@ -0,0 +1,79 @@
+import pandas as pd
+from utils.db_pool import get_connection
+from utils.metrics import timed
+
+# daily series for one city: every historic day plus the latest current
+# reading when its day is not in the historic table yet, mirroring
+# get_weather_data() in app2
+daily_cte = """
+WITH historic AS (
+    SELECT date, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm
+    FROM student.de11_fehu_capstone
+    WHERE city_key = LOWER(%(city)s)
+),
+latest AS (
+    SELECT date, temp_c AS avgtemp_c, temp_c AS maxtemp_c, temp_c AS mintemp_c, precip_mm AS totalprecip_mm
+    FROM student.weather_data_latest
+    WHERE city_key = LOWER(%(city)s)
+),
+daily AS (
+    SELECT * FROM historic
+    UNION ALL
+    SELECT * FROM latest
+    WHERE NOT EXISTS (SELECT 1 FROM historic WHERE historic.date = latest.date)
+)
+"""
+
+# calendar months with a running precipitation total, read from the
+# rollup table the loaders keep up to date (etl/load/rollups.py)
+monthly_query = """
+SELECT to_char(month, 'YYYY-MM') AS month,
+       month AS month_start,
+       to_char(month, 'FMMonth') AS month_name,
+       avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm,
+       SUM(totalprecip_mm) OVER (ORDER BY month) AS cumulative_precip_mm
+FROM student.de11_fehu_monthly_rollup
+WHERE city_key = LOWER(%(city)s)
+ORDER BY month;
+"""
+
+# days matching the highest maximum or lowest minimum temperature
+extremes_query = daily_cte + """
+SELECT date, maxtemp_c, mintemp_c, is_highest_temp, is_lowest_temp
+FROM (
+    SELECT date, maxtemp_c, mintemp_c,
+           maxtemp_c = MAX(maxtemp_c) OVER () AS is_highest_temp,
+           mintemp_c = MIN(mintemp_c) OVER () AS is_lowest_temp
+    FROM daily
+) flagged
+WHERE is_highest_temp OR is_lowest_temp
+ORDER BY date;
+"""
+
+# temperature range per month of the year, across all years of rollups
+month_of_year_query = """
+SELECT to_char(MIN(month), 'FMMonth') AS month,
+       MAX(maxtemp_c) AS maxtemp_c,
+       MIN(mintemp_c) AS mintemp_c
+FROM student.de11_fehu_monthly_rollup
+WHERE city_key = LOWER(%(city)s)
+GROUP BY EXTRACT(MONTH FROM month)
+ORDER BY EXTRACT(MONTH FROM month);
+"""
+
+
+def _read(name, query, city, parse_dates=None):
+    with timed('db_query', statement=name, mode='aggregate'), get_connection() as conn:
+        return pd.read_sql(query, conn, params={'city': city}, parse_dates=parse_dates)
+
+
+def get_monthly_aggregates(city):
+    return _read('monthly', monthly_query, city, parse_dates=['month_start'])
+
+
+def get_extreme_days(city):
+    return _read('extremes', extremes_query, city, parse_dates=['date'])
+
+
+def get_month_of_year_ranges(city):
+    return _read('month_of_year', month_of_year_query, city)
@@ -1,106 +1,118 @@
-import streamlit as st
-import psycopg2
+import functools
 import pandas as pd
 import os
 from dotenv import load_dotenv
-from etl.extract.current import insert_current
+from etl.extract.refresh_worker import refresh_worker
+from etl.extract.query_cache import ALL_CITIES, cached_query, cached_batch_query, normalise_city, weather_cache
+from etl.extract.change_listener import change_listener, listener_enabled
+from etl.extract.weather_repository import WeatherRepository
+from etl.transform.suitability import score_crop_suitability
+from etl.transform.incremental import transform_states
+from etl.transform.downsample import downsample, render_mode
+from etl.transform.comparison import city_stats, monthly_by_city, typical_year_by_city
+from etl.extract.aggregations import get_monthly_aggregates, get_extreme_days, get_month_of_year_ranges
 import datetime
-import plotly.express as px
-import plotly.graph_objects as go
-from etl.extract.vegtables import get_veg_data, VEG_COLOUR
-import base64
+from etl.extract.vegtables import get_veg_data, get_crop_profile, MONTHS, VEG_COLOUR
 import random
-import time
-from PIL import Image
-
-st.set_page_config(layout="wide")
+from etl.extract import assets
+from utils.db_pool import get_connection, pool_stats
+from utils.http_client import client_stats
+from utils.metrics import metrics, timed
+from utils.lazy import lazy_import
+
+# streamlit and plotly are only imported once the page is drawn, so the
+# transforms here can be imported by tests and scripts without them
+st = lazy_import('streamlit')
+px = lazy_import('plotly.express')
+go = lazy_import('plotly.graph_objects')
 
 # set the background image for stremlit
 def set_background(image_file):
-    with open(image_file, "rb") as img_file:
-        b64_image = base64.b64encode(img_file.read()).decode()
-    css_code = f"""
-    <style>
-    .stApp {{
-        background-color:rgb(255,255,255)
-    }}
-    [data-testid="stSidebar"] {{
-        background-image: url("data:image/png;base64,{b64_image}");
-        background-color:rgb(255,255,255,0.8);
-        background-size: cover;
-        background-position: center;
-        background-repeat: no-repeat;
-        background-blend-mode: lighten;
-    }}
-    </style>
-    """
-    st.markdown(css_code, unsafe_allow_html=True)
+    st.markdown(assets.background_css(image_file), unsafe_allow_html=True)
 
 # set the sun image on the top right corner of streamlit
 def add_top_right_image(image_file):
-    with open(image_file, "rb") as img_file:
-        b64_image = base64.b64encode(img_file.read()).decode()
-    css_code = f"""
-    <style>
-    .top-right-image {{
-        position: absolute;
-        top: 10px;
-        right: 10px;
-        width: 100px;
-        z-index: 10;
-    }}
-    </style>
-    <img class="top-right-image" src="data:image/png;base64,{b64_image}" alt="Top Right Image">
-    """
-    st.markdown(css_code, unsafe_allow_html=True)
-
-# load environment variables
-load_dotenv()
-db_user = os.getenv('SOURCE_DB_USER')
-db_password = os.getenv('SOURCE_DB_PASSWORD')
-db_host = os.getenv('SOURCE_DB_HOST')
-db_port = os.getenv('SOURCE_DB_PORT')
-db_name = os.getenv('SOURCE_DB_NAME')
-
-# connect to the postgresql database
+    st.markdown(assets.top_right_image_css(image_file), unsafe_allow_html=True)
+
+# paginated garden gallery: thumbnails for one page, the picked one at display size
+def show_gallery():
+    st.write("### Family Garden Pictures!")
+    pictures = assets.gallery_pictures()
+    if not pictures:
+        st.info("No pictures found in docs/.")
+        return
+
+    pages = assets.page_count(pictures)
+    page = min(st.session_state.get('gallery_page', 0), pages - 1)
+    previous_col, label_col, next_col = st.columns([1, 4, 1])
+    if previous_col.button("Previous", disabled=page == 0):
+        page -= 1
+    if next_col.button("Next", disabled=page == pages - 1):
+        page += 1
+    st.session_state['gallery_page'] = page
+    label_col.caption(f"Page {page + 1} of {pages}")
+
+    # only this page's pictures are processed and sent to the browser
+    page_pictures = assets.gallery_page(pictures, page)
+    for column, picture_path in zip(st.columns(assets.GALLERY_PAGE_SIZE), page_pictures):
+        name = os.path.basename(picture_path)
+        column.image(assets.thumbnail(picture_path), use_container_width=True)
+        if column.button(f"Open {name}", key=f"gallery_open_{name}"):
+            st.session_state['gallery_open'] = picture_path
+
+    picture_path = st.session_state.get('gallery_open')
+    if picture_path in page_pictures:
+        st.image(assets.gallery_image(picture_path), use_container_width=True,
+                 caption=f"Picture: {os.path.basename(picture_path)}")
+
+# "App" aggregates daily rows in pandas, "Database" pushes the monthly,
+# extreme and cumulative aggregations down into PostgreSQL
+AGGREGATION_MODES = ["App", "Database"]
+SQL_AGGREGATED_VIEWS = ("Precipitation", "Monthly Trends", "Extreme Temperatures",
+                        "Vegetable and Temperature Comparison")
+
+# the aggregation mode picked when the page opens, from AGGREGATION_MODE
+def default_aggregation_mode():
+    mode = os.getenv('AGGREGATION_MODE', 'App')
+    return mode if mode in AGGREGATION_MODES else 'App'
+
+# borrow a pooled connection to the postgresql database
 def connect_to_db():
-    conn = psycopg2.connect(
-        dbname=db_name,
-        user=db_user,
-        password=db_password,
-        host=db_host,
-        port=db_port
-    )
-    return conn
+    return get_connection()
+
+# one parameterized, server-prepared query per city on a pooled connection;
+# built on first use, after main() has loaded .env for its read mode
+weather_repository = None
+
+def get_weather_repository():
+    global weather_repository
+    if weather_repository is None:
+        weather_repository = WeatherRepository(lambda: connect_to_db())
+    return weather_repository
 
 # fetch weather data for a specific location
 def get_weather_data(location):
-    conn = connect_to_db()
-
-    # query for historical data in sql
-    historical_query = f"""
-    SELECT city, date, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm, uv_index
-    FROM student.de11_fehu_capstone
-    WHERE LOWER(city) = LOWER('{location}')
-    ORDER BY date ASC;
-    """
-    historical_df = pd.read_sql(historical_query, conn)
-
-    # query for current data in sql
-    current_query = f"""
-    SELECT city, date, temp_c AS avgtemp_c, temp_c AS maxtemp_c, temp_c AS mintemp_c, precip_mm AS totalprecip_mm, uv_index
-    FROM student.weather_data
-    WHERE LOWER(city) = LOWER('{location}')
-    ORDER BY date DESC
-    LIMIT 1;
-    """
-    current_df = pd.read_sql(current_query, conn)
-
-    conn.close()
-
-    # combine both dataframes
-    combined_df = pd.concat([historical_df, current_df]).drop_duplicates(subset=['date'], keep='first')
-    return combined_df
+    return get_weather_repository().get_weather_data(location)
+
+# serve repeat views of a city from memory until a newer row is ingested
+def get_cached_weather_data(location):
+    return cached_query(location, get_weather_data)
+
+# the transformed daily series and monthly aggregates of a city; after the
+# first load only the days since the last refresh are fetched and transformed,
+# and while the change listener runs not even those unless a change was announced
+def get_transformed_weather_data(location):
+    version = weather_cache.version(location) if change_listener.active else None
+    return transform_states.refresh(location, get_cached_weather_data,
+                                    get_weather_repository().get_weather_data_since, version=version)
+
+# several cities' series from one batched query, long format keyed on the city
+def get_multi_city_weather_data(cities):
+    return get_weather_repository().get_weather_data_for_cities(cities)
+
+# historic days of every city, cached under one key that any historic change expires
+def get_all_daily_weather_data(_):
+    return get_weather_repository().get_all_daily()
 
 # data transformation functions
 def transform_to_monthly_data(df):
@@ -133,8 +145,8 @@ def add_cumulative_precipitation(df):
     df['cumulative_precip_mm'] = df['totalprecip_mm'].cumsum()
     return df
 
-# create a range bar chart for temprature and vegtable data
-def create_range_bar_chart(df, city, veg):
+# temperature range per month of the year, across all years
+def monthly_temperature_ranges(df):
     df['date'] = pd.to_datetime(df['date'])
     df['month'] = df['date'].dt.strftime('%B')
     monthly_data = df.groupby('month', as_index=False).agg({
@@ -142,12 +154,16 @@ def create_range_bar_chart(df, city, veg):
         'mintemp_c': 'min'
     })
 
-    month_order = ['January', 'February', 'March', 'April', 'May', 'June',
-                   'July', 'August', 'September', 'October', 'November', 'December']
-    monthly_data['month'] = pd.Categorical(monthly_data['month'], categories=month_order, ordered=True)
-    monthly_data = monthly_data.sort_values('month')
+    monthly_data['month'] = pd.Categorical(monthly_data['month'], categories=MONTHS, ordered=True)
+    return monthly_data.sort_values('month')
+
+# create a range bar chart for temprature and vegtable data, monthly_data
+# can be passed in when the ranges were already aggregated in the database
+def create_range_bar_chart(df, city, veg, monthly_data=None):
+    if monthly_data is None:
+        monthly_data = monthly_temperature_ranges(df)
 
-    veg_data = get_veg_data()
+    crop = get_crop_profile(veg)
 
     fig = go.Figure()
 
@@ -164,9 +180,9 @@ def create_range_bar_chart(df, city, veg):
 
     fig.add_trace(go.Bar(
         width=0.3,
-        x=veg_data[veg]['month'],
-        y=veg_data[veg]['maxtemp_c'] - veg_data[veg]['mintemp_c'],
-        base=veg_data[veg]['mintemp_c'],
+        x=MONTHS,
+        y=crop.maxtemp_c - crop.mintemp_c,
+        base=crop.mintemp_c,
         name=f'Optimal {veg} Temperature Range',
         marker=dict(color=VEG_COLOUR.get(veg, "green")),
         hoverinfo='x+y',
@@ -185,11 +201,83 @@ def create_range_bar_chart(df, city, veg):
 
     return fig
 
+# seconds between checks on a running background refresh
+REFRESH_POLL_SECONDS = 0.5
+
+# progress of the background refresh, redrawn on its own while it runs;
+# reruns the whole app once when it finishes so the views show the new data
+def refresh_progress(city):
+    job = refresh_worker.job_for(city)
+    if job is None:
+        return
+    if job.running:
+        st.progress(job.progress, text=job.message)
+    elif st.session_state.get('refresh_seen') != job.id:
+        st.session_state['refresh_seen'] = job.id
+        st.rerun()
+
+# the fragment is made on first use rather than at import, which would need streamlit
+@functools.cache
+def refresh_progress_fragment():
+    return st.fragment(run_every=REFRESH_POLL_SECONDS)(refresh_progress)
+
+def show_refresh_status(city):
+    job = refresh_worker.job_for(city)
+    if job is None:
+        return
+    if job.running or st.session_state.get('refresh_seen') != job.id:
+        refresh_progress_fragment()(city)
+    elif job.status == 'failed':
+        st.warning(f"{job.message}. Showing the last stored data.")
+    else:
+        st.caption(f"{job.message} at {datetime.datetime.fromtimestamp(job.finished_at):%H:%M:%S}")
+
 # get location from user input
 def get_location():
     user_input = st.sidebar.text_input("Enter City", value="Bristol")
     return user_input
 
+# the cities compared with the main one, typed comma separated
+def get_comparison_cities():
+    user_input = st.sidebar.text_input("Compare With", value="London", help="Comma separated city names")
+    return [name.strip() for name in user_input.split(',') if name.strip()]
+
+# crop a daily series to the date range picked on a slider; narrowing the
+# range is how the charts below get back to full daily detail
+def select_date_range(df):
+    start, end = df['date'].min().date(), df['date'].max().date()
+    if start >= end:
+        return df
+    start, end = st.slider("Date Range", min_value=start, max_value=end, value=(start, end), format="YYYY-MM-DD")
+    return df[(df['date'] >= pd.Timestamp(start)) & (df['date'] <= pd.Timestamp(end))]
+
+# thin a daily series to what a chart can show, and say so when it is thinned
+def chart_points(df, columns, method='lttb'):
+    with timed('transform', step=f'downsample_{method}'):
+        shown = downsample(df, 'date', columns, method=method)
+    if len(shown) < len(df):
+        st.caption(f"Showing {len(shown):,} of {len(df):,} days, narrow the date range for full detail.")
+    return shown
+
+# build a figure with `factory`, timed per chart type for the debug panel
+def build_figure(factory, *args, **kwargs):
+    with timed('figure_build', chart=factory.__name__):
+        return factory(*args, **kwargs)
+
+# hand a figure to streamlit, which serialises it for the browser
+def show_chart(fig):
+    with timed('render'):
+        st.plotly_chart(fig, use_container_width=True)
+
+# stage timings, hidden unless the page is opened with ?debug=1
+def show_debug_panel():
+    if st.query_params.get('debug') != '1':
+        return
+    with st.sidebar.expander("Stage Timings"):
+        st.dataframe(pd.DataFrame(metrics.summary()), hide_index=True)
+        st.download_button("Prometheus Metrics", metrics.prometheus_text(),
+                           file_name="weather_metrics.prom", mime="text/plain")
+
 # fun facts about weather
 fun_facts = [
     "A bolt of lightning is five times hotter than the surface of the sun.",
@@ -203,30 +291,34 @@ fun_facts = [
 
 
 def main():
-    
+    # set_page_config has to be the first streamlit call of a run
+    st.set_page_config(layout="wide")
+    load_dotenv()
+
+    # push-driven invalidation of the caches below, started once per process
+    if listener_enabled():
+        change_listener.start()
+
     ## streamlit main page images
-    set_background("../../docs/background.png")
-    add_top_right_image("../../docs/sun.png")
+    set_background(os.path.join(assets.DOCS_DIR, "background.png"))
+    add_top_right_image(os.path.join(assets.DOCS_DIR, "sun.png"))
     
-    # add a button to display pictures
+    # add a button to display pictures, it stays open across reruns until pressed again
     if st.sidebar.button("Pictures!"):
-        st.write("### Family Garden Pictures!")
-
-        # list of uploaded pictures and edit
-        picture_paths = ["../../docs/1.jpg","../../docs/2.jpg","../../docs/3.jpg","../../docs/4.jpg","../../docs/5.jpg","../../docs/6.jpg","../../docs/7.jpg",]
-
-        for picture_path in picture_paths:
-            image = Image.open(picture_path)
-            rotated_image = image.rotate(-90, expand=True)
-            st.image(rotated_image, use_container_width=True, caption=f"Picture: {os.path.basename(picture_path)}")
+        st.session_state['show_gallery'] = not st.session_state.get('show_gallery', False)
+    if st.session_state.get('show_gallery'):
+        show_gallery()
             
     st.sidebar.title("Weather and Vegetable Data Analysis")
     city = get_location()
 
     # all the analysis type
     analysis_type = st.sidebar.selectbox("Select Analysis Type", [
-        "Temperature Overview", "Precipitation", "Monthly Trends", "Extreme Temperatures", "Vegetable and Temperature Comparison"
+        "Temperature Overview", "Precipitation", "Monthly Trends", "Extreme Temperatures", "Vegetable and Temperature Comparison",
+        "Crop Suitability", "City Comparison"
     ])
+    comparison = analysis_type == "City Comparison"
+    compare_with = get_comparison_cities() if comparison else []
 
     veg_type = st.sidebar.selectbox("Select Vegetable/Fruit Type", get_veg_data().keys())
 
@@ -234,31 +326,70 @@ def main():
     if st.sidebar.button("Show a Fun Fact"):
         st.write(f"🌟 Fun Fact: {random.choice(fun_facts)}")
 
+    # where monthly, extreme and cumulative aggregates are computed; the
+    # database mode only transfers aggregated rows for views that need no daily series
+    aggregation_mode = st.sidebar.radio("Aggregate In", AGGREGATION_MODES,
+                                        index=AGGREGATION_MODES.index(default_aggregation_mode()))
+    use_sql = aggregation_mode == "Database" and analysis_type in SQL_AGGREGATED_VIEWS
+    all_cities = analysis_type == "Crop Suitability"
+
+    # the button starts a background refresh of the city; the views render
+    # straight away from the stored data and again once the refresh lands
     if st.sidebar.button("Fetch Weather and Vegetable Data"):
-        with st.spinner("Fetching weather and vegetable data..."):
-            progress_bar = st.progress(0)
-            for percent in range(100):
-                time.sleep(0.01)  # simulate work
-                progress_bar.progress(percent + 1)
-            insert_current(city)  # insert current weather data into the database
-            df = get_weather_data(city)
-
-        if not df.empty:
-            
-            # apply transformations
-            df['date'] = pd.to_datetime(df['date'])  # ensure date column is datetime
-            df = fill_missing_dates(df)
-            df = add_extreme_flags(df)
-            df = add_cumulative_precipitation(df)
-            monthly_df = transform_to_monthly_data(df)
+        st.session_state['active_city'] = city
+        refresh_worker.start(city)
+
+    active_city = st.session_state.get('active_city')
+    if active_city:
+        city = active_city
+        show_refresh_status(city)
+        with st.spinner("Loading stored weather data..."), timed('load', view=analysis_type):
+            if all_cities:
+                df = cached_query(ALL_CITIES, get_all_daily_weather_data, kind='all_daily')
+                monthly_df = None
+            elif comparison:
+                # one query for every city not cached yet
+                df = cached_batch_query([city] + compare_with, get_multi_city_weather_data, kind='comparison')
+                monthly_df = None
+            elif use_sql:
+                df = None
+                monthly_df = cached_query(city, get_monthly_aggregates, kind='monthly')
+            else:
+                df, monthly_df = get_transformed_weather_data(city)
+
+        if (monthly_df if use_sql else df).empty:
+            st.write(f"No data available for {city}. Please check the city name or try another location.")
+
+        else:
+            # rank every stored city against every crop
+            if analysis_type == "Crop Suitability":
+                with timed('transform', step='crop_suitability'):
+                    scores = score_crop_suitability(df)
+
+                st.write("### Crop Suitability Across Cities")
+                heatmap = scores.pivot(index='city', columns='crop', values='suitability_score')
+                fig = build_figure(px.imshow, heatmap, zmin=0, zmax=1, color_continuous_scale='Greens', text_auto='.2f',
+                                     labels={'color': 'Suitability', 'x': 'Crop', 'y': 'City'},
+                                     title="Suitability Score (0-1) by City and Crop")
+                show_chart(fig)
+
+                city_scores = scores[scores['city'] == city.strip().lower()]
+                if not city_scores.empty:
+                    st.write(f"### Best Crops for {city}")
+                    st.dataframe(city_scores.sort_values('rank'), hide_index=True)
+
+                st.write("### All Rankings")
+                st.dataframe(scores, hide_index=True)
 
             # temperature overview analysis
-            if analysis_type == "Temperature Overview":
-                fig = px.line(df, x='date', y=['avgtemp_c', 'maxtemp_c', 'mintemp_c'],
-                              labels={'value': 'Temperature (°C)', 'variable': 'Temperature Type', 'date': 'Date'},
-                              title=f"Temperature Overview for {city}")
+            elif analysis_type == "Temperature Overview":
+                temperatures = ['avgtemp_c', 'maxtemp_c', 'mintemp_c']
+                shown = chart_points(select_date_range(df), temperatures)
+                fig = build_figure(px.line, shown, x='date', y=temperatures, render_mode=render_mode(len(shown)),
+                                   labels={'value': 'Temperature (°C)', 'variable': 'Temperature Type', 'date': 'Date'},
+                                   title=f"Temperature Overview for {city}")
                 fig.update_traces(mode='lines+markers')
-                st.plotly_chart(fig, use_container_width=True)
+                show_chart(fig)
 
                 # add summary insights below the plot
                 st.write("### Summary Insights")
@@ -269,99 +400,155 @@ def main():
                 st.write(f"**Maximum Temperature**: {max_temp:.2f}°C")
                 st.write(f"**Minimum Temperature**: {min_temp:.2f}°C")
 
-                temp_boxplot = px.box(df, y=['avgtemp_c', 'maxtemp_c', 'mintemp_c'],
-                                      labels={'value': 'Temperature (°C)', 'variable': 'Temperature Type'},
-                                      title="Temperature Distribution")
-                st.plotly_chart(temp_boxplot, use_container_width=True)
+                temp_boxplot = build_figure(px.box, df, y=['avgtemp_c', 'maxtemp_c', 'mintemp_c'],
+                                           labels={'value': 'Temperature (°C)', 'variable': 'Temperature Type'},
+                                           title="Temperature Distribution")
+                show_chart(temp_boxplot)
 
             # precipitation analysis
             elif analysis_type == "Precipitation":
-                
-                # plot cumulative precipitation
-                fig = px.line(df, x='date', y='cumulative_precip_mm',
-                              title=f"Cumulative Precipitation for {city}",
-                              labels={'cumulative_precip_mm': 'Cumulative Precipitation (mm)', 'date': 'Date'})
-                fig.update_traces(mode='lines+markers')
-                st.plotly_chart(fig, use_container_width=True)
 
-                # plot daily precipitation
-                st.write(f"### Daily Precipitation for {city}")
-                daily_precip_fig = px.bar(df, x='date', y='totalprecip_mm',
-                                          title=f"Daily Precipitation for {city}",
-                                          labels={'totalprecip_mm': 'Daily Precipitation (mm)', 'date': 'Date'})
-                st.plotly_chart(daily_precip_fig, use_container_width=True)
+                if use_sql:
+                    # plot cumulative and monthly precipitation from the monthly rows
+                    fig = build_figure(px.line, monthly_df, x='month_start', y='cumulative_precip_mm',
+                                       title=f"Cumulative Precipitation for {city}",
+                                       labels={'cumulative_precip_mm': 'Cumulative Precipitation (mm)', 'month_start': 'Month'})
+                    fig.update_traces(mode='lines+markers')
+                    show_chart(fig)
+
+                    st.write(f"### Monthly Precipitation for {city}")
+                    monthly_precip_fig = build_figure(px.bar, monthly_df, x='month_start', y='totalprecip_mm',
+                                                     title=f"Monthly Precipitation for {city}",
+                                                     labels={'totalprecip_mm': 'Monthly Precipitation (mm)', 'month_start': 'Month'})
+                    show_chart(monthly_precip_fig)
+
+                    monthly_precip = monthly_df[['month_name', 'totalprecip_mm']].rename(columns={'month_name': 'month'})
+                else:
+                    # plot cumulative precipitation
+                    visible = select_date_range(df)
+                    shown = chart_points(visible, ['cumulative_precip_mm'])
+                    fig = build_figure(px.line, shown, x='date', y='cumulative_precip_mm', render_mode=render_mode(len(shown)),
+                                       title=f"Cumulative Precipitation for {city}",
+                                       labels={'cumulative_precip_mm': 'Cumulative Precipitation (mm)', 'date': 'Date'})
+                    fig.update_traces(mode='lines+markers')
+                    show_chart(fig)
+
+                    # plot daily precipitation
+                    # min/max bucketing keeps every wet-day spike
+                    st.write(f"### Daily Precipitation for {city}")
+                    shown = chart_points(visible, ['totalprecip_mm'], method='minmax')
+                    daily_precip_fig = build_figure(px.bar, shown, x='date', y='totalprecip_mm',
+                                                   title=f"Daily Precipitation for {city}",
+                                                   labels={'totalprecip_mm': 'Daily Precipitation (mm)', 'date': 'Date'})
+                    show_chart(daily_precip_fig)
+
+                    monthly_precip = df.resample('M', on='date')['totalprecip_mm'].sum().reset_index()
+                    monthly_precip['month'] = monthly_precip['date'].dt.strftime('%B')
 
                 # add comparison with vegetable's optimal precipitation data
                 st.write(f"### Comparing Precipitation with {veg_type.capitalize()} Needs")
-                veg_data = get_veg_data()
-                veg_df = pd.DataFrame(veg_data[veg_type])
-
+                crop = get_crop_profile(veg_type)
+                veg_precip = pd.DataFrame({'month': MONTHS, 'precip_mm': crop.precip_mm})
 
-                # aggregate vegetable data to get max precipitation per month
-                veg_df['month'] = veg_df['month']
-                veg_precip = veg_df[['month', 'precip_mm']].groupby('month').max().reset_index()
-                
                 # add vegetable precipitation to monthly weather data
-                monthly_precip = df.resample('M', on='date').sum().reset_index()
-                monthly_precip['month'] = monthly_precip['date'].dt.strftime('%B')
                 monthly_precip = monthly_precip.merge(veg_precip, on='month', how='left')
-                
+
                 # create comparison bar chart
-                precip_fig = go.Figure()
-                precip_fig.add_trace(go.Bar(
-                    x=monthly_precip['month'],
-                    y=monthly_precip['totalprecip_mm'],
-                    name=f'{city} Precipitation',
-                    marker_color='skyblue'
-                ))
-                precip_fig.add_trace(go.Bar(
-                    x=monthly_precip['month'],
-                    y=monthly_precip['precip_mm'],
-                    name=f'{veg_type.capitalize()} Optimal Precipitation',
-                    marker_color=VEG_COLOUR.get(veg_type, 'green')
-                ))
-                precip_fig.update_layout(
-                    title=f"Monthly Precipitation: {city} vs {veg_type.capitalize()}",
-                    xaxis_title="Month",
-                    yaxis_title="Precipitation (mm)",
-                    barmode='group',
-                    plot_bgcolor="rgba(255, 255, 255, 0.80)",
-                    paper_bgcolor="rgba(255, 255, 255, 0.80)",
-                )
-                st.plotly_chart(precip_fig, use_container_width=True)
+                with timed('figure_build', chart='precipitation_comparison'):
+                    precip_fig = go.Figure()
+                    precip_fig.add_trace(go.Bar(
+                        x=monthly_precip['month'],
+                        y=monthly_precip['totalprecip_mm'],
+                        name=f'{city} Precipitation',
+                        marker_color='skyblue'
+                    ))
+                    precip_fig.add_trace(go.Bar(
+                        x=monthly_precip['month'],
+                        y=monthly_precip['precip_mm'],
+                        name=f'{veg_type.capitalize()} Optimal Precipitation',
+                        marker_color=VEG_COLOUR.get(veg_type, 'green')
+                    ))
+                    precip_fig.update_layout(
+                        title=f"Monthly Precipitation: {city} vs {veg_type.capitalize()}",
+                        xaxis_title="Month",
+                        yaxis_title="Precipitation (mm)",
+                        barmode='group',
+                        plot_bgcolor="rgba(255, 255, 255, 0.80)",
+                        paper_bgcolor="rgba(255, 255, 255, 0.80)",
+                    )
+                show_chart(precip_fig)
 
             # monthly trends analysis
             elif analysis_type == "Monthly Trends":
-                fig = px.bar(monthly_df, x='month', y='avgtemp_c',
-                             title=f"Monthly Average Temperature for {city}",
-                             labels={'avgtemp_c': 'Average Temperature (°C)', 'month': 'Month'})
-                st.plotly_chart(fig, use_container_width=True)
+                fig = build_figure(px.bar, monthly_df, x='month', y='avgtemp_c',
+                                  title=f"Monthly Average Temperature for {city}",
+                                  labels={'avgtemp_c': 'Average Temperature (°C)', 'month': 'Month'})
+                show_chart(fig)
 
             # extreme temperture analysis
             elif analysis_type == "Extreme Temperatures":
-                extreme_points = df[df['is_highest_temp'] | df['is_lowest_temp']]
+                if use_sql:
+                    extreme_points = cached_query(city, get_extreme_days, kind='extremes')
+                else:
+                    extreme_points = df[df['is_highest_temp'] | df['is_lowest_temp']]
                 st.write("Extreme Temperature Days:")
                 st.dataframe(extreme_points[['date', 'maxtemp_c', 'mintemp_c']])
 
-                fig = px.scatter(extreme_points, x='date', y='maxtemp_c',
-                                 color='is_highest_temp',
-                                 title="Extreme Temperatures",
-                                 labels={'maxtemp_c': 'Temperature (°C)', 'date': 'Date'})
-                st.plotly_chart(fig, use_container_width=True)
+                fig = build_figure(px.scatter, extreme_points, x='date', y='maxtemp_c',
+                                      color='is_highest_temp',
+                                      title="Extreme Temperatures",
+                                      labels={'maxtemp_c': 'Temperature (°C)', 'date': 'Date'})
+                show_chart(fig)
 
             # veg and temp comparison
             elif analysis_type == "Vegetable and Temperature Comparison":
-                fig = create_range_bar_chart(df, city, veg_type)
-                st.plotly_chart(fig, use_container_width=True)
+                if use_sql:
+                    ranges = cached_query(city, get_month_of_year_ranges, kind='month_of_year')
+                    fig = build_figure(create_range_bar_chart, None, city, veg_type, monthly_data=ranges)
+                else:
+                    fig = build_figure(create_range_bar_chart, df, city, veg_type)
+                show_chart(fig)
 
                 # display the veg data frame
                 st.write(f"### {veg_type.capitalize()} Growing Conditions")
-                veg_data = get_veg_data()
-                veg_df = pd.DataFrame(veg_data[veg_type])
-                st.dataframe(veg_df)
-
-        else:
-            st.write(f"No data available for {city}. Please check the city name or try another location.")
+                st.dataframe(get_veg_data()[veg_type])
+
+            # side by side figures of the city and the ones typed in "Compare With"
+            elif analysis_type == "City Comparison":
+                with timed('transform', step='city_comparison'):
+                    stats = city_stats(df)
+                    monthly = monthly_by_city(df)
+                    typical = typical_year_by_city(monthly)
+
+                stored = set(stats['city'])
+                missing = [name for name in [city] + compare_with if normalise_city(name) not in stored]
+                if missing:
+                    st.info(f"No stored data for {', '.join(missing)}. Fetch each city first to include it.")
+
+                st.write("### City Summary")
+                st.dataframe(stats, hide_index=True)
+
+                fig = build_figure(px.line, monthly, x='month_start', y='avgtemp_c', color='city',
+                                   labels={'month_start': 'Month', 'avgtemp_c': 'Average Temperature (°C)', 'city': 'City'},
+                                   title="Monthly Average Temperature by City")
+                show_chart(fig)
+
+                fig = build_figure(px.bar, typical, x='month', y='totalprecip_mm', color='city', barmode='group',
+                                   labels={'month': 'Month', 'totalprecip_mm': 'Precipitation (mm)', 'city': 'City'},
+                                   title="Typical Monthly Precipitation by City")
+                show_chart(fig)
+
+    # connection pool and query cache usage, for sizing DB_POOL_* and QUERY_CACHE_*
+    with st.sidebar.expander("Pool and Cache Stats"):
+        st.json(pool_stats())
+        st.json(weather_cache.stats())
+        st.json(transform_states.stats())
+        st.json(client_stats())
+        st.json(change_listener.stats())
+    show_debug_panel()
+
+    # export the stage metrics when METRICS_TEXTFILE is set
+    metrics.write_textfile()
             
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+import base64
+import functools
+import glob
+import hashlib
+import os
+import threading
+
+from utils.lazy import lazy_import
+
+# PIL is only imported when a derivative has to be built
+Image = lazy_import('PIL.Image')
+ImageOps = lazy_import('PIL.ImageOps')
+
+DOCS_DIR = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..', 'docs'))
+DEFAULT_CACHE_DIR = os.path.join(DOCS_DIR, '.asset_cache')
+
+# bump to invalidate every cached derivative after changing how they are made
+PIPELINE_VERSION = 1
+
+# the sidebar is at most a few hundred pixels wide, the sun is shown at 100px;
+# both are kept at twice that for high-density screens
+BACKGROUND_SIZE = (1280, 1280)
+ICON_SIZE = (200, 200)
+GALLERY_SIZE = (1280, 1280)
+THUMBNAIL_SIZE = (360, 360)
+JPEG_QUALITY = 82
+
+GALLERY_PATTERN = '*.jpg'
+GALLERY_PAGE_SIZE = 3
+
+_write_lock = threading.Lock()
+
+
+def cache_dir():
+    return os.getenv('WEATHER_ASSET_CACHE_DIR') or DEFAULT_CACHE_DIR
+
+
+@functools.lru_cache(maxsize=256)
+def _file_digest(path, mtime_ns, size):
+    # keyed on mtime and size so an unchanged file is hashed once per process
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def content_hash(path):
+    stat = os.stat(path)
+    return _file_digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def _render(source, target, max_size, image_format):
+    with Image.open(source) as image:
+        # decode large JPEGs straight at a reduced scale instead of full size
+        image.draft('RGB', max_size)
+        # pictures taken on a phone carry their rotation in EXIF
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(max_size, Image.LANCZOS)
+        if image_format == 'JPEG':
+            image = image.convert('RGB')
+            options = {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True}
+        else:
+            options = {'optimize': True}
+        tmp_path = f"{target}.{threading.get_ident()}.tmp"
+        image.save(tmp_path, image_format, **options)
+    os.replace(tmp_path, target)
+
+
+def processed_image(source, max_size, image_format='JPEG'):
+    """Return the path of `source` rotated upright and fitted into `max_size`.
+
+    Derivatives are cached under cache_dir(), named after a hash of the
+    source bytes and the settings, so each is built once and an edited
+    picture gets a new file rather than a stale one.
+    """
+    spec = f"{content_hash(source)}:{max_size[0]}x{max_size[1]}:{image_format}:{PIPELINE_VERSION}"
+    key = hashlib.sha256(spec.encode()).hexdigest()[:16]
+    stem = os.path.splitext(os.path.basename(source))[0]
+    extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+    target = os.path.join(cache_dir(), f"{stem}-{key}.{extension}")
+    if not os.path.exists(target):
+        os.makedirs(cache_dir(), exist_ok=True)
+        with _write_lock:
+            if not os.path.exists(target):
+                _render(source, target, max_size, image_format)
+    return target
+
+
+def thumbnail(source):
+    return processed_image(source, THUMBNAIL_SIZE)
+
+
+def gallery_image(source):
+    return processed_image(source, GALLERY_SIZE)
+
+
+def gallery_pictures(directory=DOCS_DIR):
+    # whatever pictures are in docs/, in name order
+    return sorted(glob.glob(os.path.join(directory, GALLERY_PATTERN)))
+
+
+def page_count(pictures, page_size=GALLERY_PAGE_SIZE):
+    return max(1, -(-len(pictures) // page_size))
+
+
+def gallery_page(pictures, page, page_size=GALLERY_PAGE_SIZE):
+    page = min(max(page, 0), page_count(pictures, page_size) - 1)
+    return pictures[page * page_size:(page + 1) * page_size]
+
+
+def data_uri(path):
+    mime = 'image/jpeg' if path.endswith('.jpg') else f"image/{os.path.splitext(path)[1][1:]}"
+    with open(path, 'rb') as f:
+        return f"data:{mime};base64,{base64.b64encode(f.read()).decode()}"
+
+
+@functools.lru_cache(maxsize=None)
+def background_css(image_file):
+    # built once per process; the PNG is shrunk to a JPEG before inlining
+    b64_image = data_uri(processed_image(image_file, BACKGROUND_SIZE))
+    return f"""
+    <style>
+    .stApp {{
+        background-color:rgb(255,255,255)
+    }}
+    [data-testid="stSidebar"] {{
+        background-image: url("{b64_image}");
+        background-color:rgb(255,255,255,0.8);
+        background-size: cover;
+        background-position: center;
+        background-repeat: no-repeat;
+        background-blend-mode: lighten;
+    }}
+    </style>
+    """
+
+
+@functools.lru_cache(maxsize=None)
+def top_right_image_css(image_file):
+    # the sun keeps its transparency, so it stays a PNG
+    b64_image = data_uri(processed_image(image_file, ICON_SIZE, 'PNG'))
+    return f"""
+    <style>
+    .top-right-image {{
+        position: absolute;
+        top: 10px;
+        right: 10px;
+        width: 100px;
+        z-index: 10;
+    }}
+    </style>
+    <img class="top-right-image" src="{b64_image}" alt="Top Right Image">
+    """
+
+
+def warm_cache(directory=DOCS_DIR):
+    # build every derivative ahead of the first page view
+    built = [processed_image(os.path.join(directory, 'background.png'), BACKGROUND_SIZE),
+             processed_image(os.path.join(directory, 'sun.png'), ICON_SIZE, 'PNG')]
+    for picture in gallery_pictures(directory):
+        built += [thumbnail(picture), gallery_image(picture)]
+    return built
+
+
+if __name__ == "__main__":
+    for path in warm_cache():
+        print(f"{path} ({os.path.getsize(path) // 1024} KiB)")
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+
+from etl.extract.historic import (
+    fetch_history, history_rows, initialise_db, load_history
+)
+from utils.db_pool import get_connection, close_pool
+from utils.http_client import get_client, close_client
+from utils.metrics import metrics
+
+# history.json accepts at most a 30 day dt..end_dt window per call
+DEFAULT_CHUNK_DAYS = 30
+DEFAULT_WORKERS = 4
+DEFAULT_CHECKPOINT = 'backfill_checkpoint.json'
+
+Chunk = namedtuple('Chunk', ['city', 'start', 'end'])
+
+
+def chunk_id(chunk):
+    return f"{chunk.city.lower()}|{chunk.start.isoformat()}|{chunk.end.isoformat()}"
+
+
+def plan_chunks(cities, start, end, chunk_days=DEFAULT_CHUNK_DAYS):
+    # split every (city, start..end) range into inclusive API-sized windows
+    if end < start:
+        raise ValueError(f"End date {end} is before start date {start}")
+    chunks = []
+    for city in cities:
+        chunk_start = start
+        while chunk_start <= end:
+            chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+            chunks.append(Chunk(city, chunk_start, chunk_end))
+            chunk_start = chunk_end + timedelta(days=1)
+    return chunks
+
+
+class Checkpoint:
+    """Per-chunk progress stored as JSON, rewritten atomically."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self._state = json.load(f)
+
+    def is_done(self, chunk):
+        return self._state.get(chunk_id(chunk), {}).get('status') == 'done'
+
+    def record(self, chunk, status, **details):
+        with self._lock:
+            self._state[chunk_id(chunk)] = {
+                'status': status,
+                'updated_at': datetime.now().isoformat(timespec='seconds'),
+                **details,
+            }
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self._state, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def load_chunk(chunk, client):
+    # each window is fetched once, caching it would only hold memory
+    response_data = fetch_history(
+        chunk.city, chunk.start.isoformat(), chunk.end.isoformat(), client,
+        use_cache=False
+    )
+    if response_data is None:
+        raise RuntimeError(f"No history returned for {chunk_id(chunk)}")
+    with get_connection() as conn:
+        return load_history(conn, history_rows(response_data))
+
+
+def run_backfill(cities, start, end, chunk_days=DEFAULT_CHUNK_DAYS,
+                 workers=DEFAULT_WORKERS, checkpoint_path=DEFAULT_CHECKPOINT):
+    checkpoint = Checkpoint(checkpoint_path)
+    pending = [c for c in plan_chunks(cities, start, end, chunk_days)
+               if not checkpoint.is_done(c)]
+    print(f"Backfill: {len(pending)} chunk(s) to load")
+    if not pending:
+        return {'loaded': 0, 'rows': 0, 'failed': 0}
+
+    with get_connection() as conn:
+        initialise_db(conn)
+
+    client = get_client()
+    summary = {'loaded': 0, 'rows': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(load_chunk, c, client): c for c in pending}
+        for future in as_completed(futures):
+            chunk = futures[future]
+            try:
+                rows = future.result()
+            except Exception as e:
+                # failed chunks stay pending and are retried on the next run
+                checkpoint.record(chunk, 'failed', error=str(e))
+                summary['failed'] += 1
+                print(f"Chunk {chunk_id(chunk)} failed: {e}")
+                continue
+            checkpoint.record(chunk, 'done', rows=rows)
+            summary['loaded'] += 1
+            summary['rows'] += rows
+    return summary
+
+
+def parse_date(value):
+    return date.fromisoformat(value)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Backfill historic weather for many cities."
+    )
+    parser.add_argument('cities', nargs='+')
+    parser.add_argument('--start', type=parse_date, required=True)
+    parser.add_argument('--end', type=parse_date, required=True)
+    parser.add_argument('--chunk-days', type=int, default=DEFAULT_CHUNK_DAYS)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT)
+    args = parser.parse_args(argv)
+
+    summary = run_backfill(
+        args.cities, args.start, args.end, chunk_days=args.chunk_days,
+        workers=args.workers, checkpoint_path=args.checkpoint
+    )
+    close_client()
+    close_pool()
+    metrics.write_textfile()
+    print(f"Backfill finished: {summary}")
+
+
+if __name__ == "__main__":
+    main()
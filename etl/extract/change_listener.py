@@ -0,0 +1,125 @@
+import json
+import os
+import select
+import threading
+
+import psycopg2
+import psycopg2.extensions
+
+from etl.extract.query_cache import ALL_CITIES, weather_cache
+from etl.load.migrations import CHANGE_CHANNEL
+from utils.db_pool import connection_params
+
+# how long one wait for notifications lasts, bounding how quickly stop() is seen
+POLL_SECONDS = 1.0
+
+# wait before reconnecting after the LISTEN connection is lost
+RECONNECT_SECONDS = 5.0
+
+# tables whose changes also alter the cross-city entries
+HISTORIC_TABLES = {'de11_fehu_capstone'}
+
+
+def listener_enabled():
+    return os.getenv('WEATHER_CHANGE_LISTENER', 'true').lower() in ('1', 'true', 'yes')
+
+
+class ChangeListener:
+    """Drops cached city data when PostgreSQL announces a change to it.
+
+    The notify triggers added by migration 6 send the city and days of
+    every insert or update on the weather tables, so rows written by other
+    processes (the cron run of current.py, a backfill) invalidate only the
+    cached entries of that city. LISTEN runs on a connection of its own,
+    outside the pool, in a daemon thread. While it is disconnected `active`
+    is False, and everything is invalidated when the connection is lost and
+    again after reconnecting, since notifications sent in between are lost.
+    """
+
+    def __init__(self, cache=weather_cache, connect=None, channel=CHANGE_CHANNEL,
+                 poll_seconds=POLL_SECONDS, reconnect_seconds=RECONNECT_SECONDS):
+        self.cache = cache
+        self.connect = connect or (lambda: psycopg2.connect(**connection_params()))
+        self.channel = channel
+        self.poll_seconds = poll_seconds
+        self.reconnect_seconds = reconnect_seconds
+        self.active = False
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._stats = {'notifications': 0, 'ignored': 0, 'reconnects': 0, 'last_error': None}
+
+    def start(self):
+        # idempotent, so every Streamlit rerun can call it
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return self
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='change-listener', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def handle(self, payload):
+        # payload: the JSON built by student.notify_weather_change()
+        try:
+            change = json.loads(payload)
+            city = change['city']
+        except (ValueError, TypeError, KeyError):
+            with self._lock:
+                self._stats['ignored'] += 1
+            return None
+        self.cache.invalidate(city)
+        if change.get('table') in HISTORIC_TABLES:
+            self.cache.invalidate(ALL_CITIES)
+        with self._lock:
+            self._stats['notifications'] += 1
+        return change
+
+    def _listen(self, conn):
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.channel}")
+        # whatever changed before LISTEN took effect was not announced
+        self.cache.invalidate()
+        self.active = True
+        while not self._stop.is_set():
+            if select.select([conn], [], [], self.poll_seconds) == ([], [], []):
+                continue
+            conn.poll()
+            while conn.notifies:
+                self.handle(conn.notifies.pop(0).payload)
+
+    def _run(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = self.connect()
+                self._listen(conn)
+            except Exception as e:
+                # not only psycopg2 errors: a dropped socket can also surface
+                # from select() as OSError or ValueError. Whatever ends the
+                # loop, changes are no longer seen until the reconnect
+                self.active = False
+                self.cache.invalidate()
+                with self._lock:
+                    self._stats['reconnects'] += 1
+                    self._stats['last_error'] = str(e).strip()
+            finally:
+                self.active = False
+                if conn is not None:
+                    conn.close()
+            self._stop.wait(self.reconnect_seconds)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['active'] = self.active
+        return stats
+
+
+change_listener = ChangeListener()
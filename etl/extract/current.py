@@ -1,129 +1,106 @@
-import requests
-import os
 from dotenv import load_dotenv
-import psycopg2 
 from datetime import datetime
+from utils.db_pool import get_connection
+from utils.http_client import WeatherApiError, get_client
+from etl.extract.query_cache import weather_cache
+from etl.load.migrations import ensure_schema
+from etl.load.rollups import refresh_monthly_rollups
+from etl.load.retention import refresh_latest
+from etl.load.copy_loader import CURRENT_TARGET, copy_load
+from utils.metrics import timed
 
 ##------------------------------------------------Create database-------------------------------------------------------------------------------------
 
-def initialise_db():
-    
+def initialise_db(conn):
+    # the tables, keys and indexes are owned by etl/load/migrations.py
+    ensure_schema(conn)
 
+# prepare insert statement
+insert_stmt = """
+INSERT INTO student.weather_data (
+    city, region, country, latitude, longitude, timezone_id, localtime_epoch,
+    last_updated, date, temp_c, wind_mph, precip_mm, humidity, feelslike_c, uv_index
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON CONFLICT (city_key, date, last_updated) DO NOTHING
+"""
+
+# turn a current.json response into a weather_data row
+def current_row(response_data):
+    last_updated = datetime.strptime(response_data['current']['last_updated'], '%Y-%m-%d %H:%M')
+    return (
+        response_data['location']['name'],
+        response_data['location']['region'],
+        response_data['location']['country'],
+        float(response_data['location']['lat']),
+        float(response_data['location']['lon']),
+        response_data['location']['tz_id'],
+        response_data['location']['localtime_epoch'],
+        last_updated,
+        last_updated.date(),
+        response_data['current']['temp_c'],
+        response_data['current']['wind_mph'],
+        response_data['current']['precip_mm'],
+        response_data['current']['humidity'],
+        response_data['current']['feelslike_c'],
+        response_data['current']['uv']
+    )
+
+# stream many weather_data rows through COPY, readings already stored are skipped
+def load_current(conn, rows):
+    loaded = copy_load(conn, CURRENT_TARGET, rows)
+    conn.commit()
+    return loaded
+
+def _no_progress(progress, message):
+    pass
+
+# returns True when a new reading was stored, False when it was already
+# stored and None when the API call failed; progress(fraction, message) is
+# called as each step starts, and with 1.0 on every return
+def insert_current(location="Bristol", progress=_no_progress):
     # load environment variables
     load_dotenv()
-    
-    db_user = os.getenv('SOURCE_DB_USER')
-    db_password = os.getenv('SOURCE_DB_PASSWORD')
-    db_host = os.getenv('SOURCE_DB_HOST')
-    db_port = os.getenv('SOURCE_DB_PORT')
-    db_name = os.getenv('SOURCE_DB_NAME')
-
-    # create connection and cursor
-    conn = psycopg2.connect(
-        dbname=db_name,
-        user=db_user,
-        password=db_password,
-        host=db_host,
-        port=db_port
-    )
-    cursor = conn.cursor()
-
-    # sql to create a table
-    create_table_query = """
-    CREATE TABLE IF NOT EXISTS student.weather_data (
-        id SERIAL PRIMARY KEY,
-        city VARCHAR(255),
-        region VARCHAR(255),
-        country VARCHAR(255),
-        latitude FLOAT,
-        longitude FLOAT,
-        timezone_id VARCHAR(100),
-        localtime_epoch BIGINT,
-        last_updated TIMESTAMP,
-        date DATE,
-        temp_c FLOAT,
-        wind_mph FLOAT,
-        precip_mm FLOAT,
-        humidity INTEGER,
-        feelslike_c FLOAT,
-        uv_index FLOAT
-    );
-    """
-    # execute the SQL command to create the table
-    cursor.execute(create_table_query)
-    conn.commit()  # Commit the transaction
-
-def insert_current(location="Bristol"):
-    # api request
-    
-    initialise_db()
-    
-    weather_api_key = os.getenv("API_KEY")
-    base_url = "http://api.weatherapi.com/v1"
-    endpoint = "/current.json"
-    url = f"{base_url}{endpoint}?key={weather_api_key}&q={location}"
-
-    response = requests.get(url)
-    response_data = response.json()
-    if response.status_code == 200:
-        response_data = response.json()
-
-        db_user = os.getenv('SOURCE_DB_USER')
-        db_password = os.getenv('SOURCE_DB_PASSWORD')
-        db_host = os.getenv('SOURCE_DB_HOST')
-        db_port = os.getenv('SOURCE_DB_PORT')
-        db_name = os.getenv('SOURCE_DB_NAME')
-
-        # create connection and cursor
-        conn = psycopg2.connect(
-            dbname=db_name,
-            user=db_user,
-            password=db_password,
-            host=db_host,
-            port=db_port
-        )
-        cursor = conn.cursor()
-        
-        # prepare insert statement
-        insert_stmt = """
-        INSERT INTO student.weather_data (
-            city, region, country, latitude, longitude, timezone_id, localtime_epoch,
-            last_updated, date, temp_c, wind_mph, precip_mm, humidity, feelslike_c, uv_index
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-
-        # data to be inserted
-        data = (
-            response_data['location']['name'],
-            response_data['location']['region'],
-            response_data['location']['country'],
-            float(response_data['location']['lat']),
-            float(response_data['location']['lon']),
-            response_data['location']['tz_id'],
-            response_data['location']['localtime_epoch'],
-            datetime.strptime(response_data['current']['last_updated'], '%Y-%m-%d %H:%M'),
-            datetime.strptime(response_data['current']['last_updated'], '%Y-%m-%d %H:%M').date(),
-            response_data['current']['temp_c'],
-            response_data['current']['wind_mph'],
-            response_data['current']['precip_mm'],
-            response_data['current']['humidity'],
-            response_data['current']['feelslike_c'],
-            response_data['current']['uv']
-        )
+
+    # api request, repeated clicks within the upstream update interval are
+    # answered from the client's response cache
+    progress(0.1, f"Requesting current conditions for {location}")
+    try:
+        response_data = get_client().get("current.json", {'q': location})
+    except WeatherApiError as e:
+        print(f"Failed to retrieve data: {e}")
+        progress(1.0, f"Failed to retrieve data: {e}")
+        return None
+
+    data = current_row(response_data)
+    last_updated = data[7]
+
+    # a cached response is a reading this process has already stored
+    if weather_cache.key_for(data[0])[1] == last_updated:
+        print("Current conditions already stored.")
+        progress(1.0, "Current conditions already stored")
+        return False
+
+    progress(0.6, f"Storing the {last_updated:%H:%M} reading")
+
+    # borrow a pooled connection for both the table check and the insert
+    with get_connection() as conn:
+        initialise_db(conn)
 
         # execute the insertion
-        cursor.execute(insert_stmt, data)
+        with timed('db_insert', table='student.weather_data'), conn.cursor() as cursor:
+            cursor.execute(insert_stmt, data)
+            refresh_monthly_rollups(cursor, refresh_latest(cursor, [data[0]]))
         conn.commit()
 
-        print("Data inserted successfully.")
-    else:
-        print(f"Failed to retrieve data: HTTP Status Code {response.status_code}")
+    # drop cached dashboard queries for this city if the row is newer
+    weather_cache.note_ingest(location, last_updated)
+    weather_cache.note_ingest(data[0], last_updated)
+
+    print("Data inserted successfully.")
+    progress(1.0, f"Stored the {last_updated:%H:%M} reading")
+    return True
+
 
-    # close the connection
-    cursor.close()
-    conn.close()
-    
-    
 def main():
     insert_current()
 if __name__ == "__main__":
@@ -1,76 +1,33 @@
-import requests
-import os
 from dotenv import load_dotenv
-import psycopg2
-from psycopg2.extras import execute_values
-
-# load environment variables
-load_dotenv()
-weather_api_key = os.getenv("API_KEY")
-db_user = os.getenv('SOURCE_DB_USER')
-db_password = os.getenv('SOURCE_DB_PASSWORD')
-db_host = os.getenv('SOURCE_DB_HOST')
-db_port = os.getenv('SOURCE_DB_PORT')
-db_name = os.getenv('SOURCE_DB_NAME')
-
-# base URL setup
-base_url = "http://api.weatherapi.com/v1"
-endpoint = "/history.json"
-location = "London"
-date = "2025-01-08"
-end_date = "2025-01-21"
-
-# complete URL
-url = f"{base_url}{endpoint}?key={weather_api_key}&q={location}&dt={date}&end_dt={end_date}"
-
-# make api requet
-response = requests.get(url)
-if response.status_code == 200:
-    response_data = response.json()
-
-    # create conection and cursor
-    conn = psycopg2.connect(
-        dbname=db_name,
-        user=db_user,
-        password=db_password,
-        host=db_host,
-        port=db_port
-    )
-    cursor = conn.cursor()
-
-    # sql to create a table
-    create_table_query = """
-    CREATE TABLE IF NOT EXISTS student.de11_fehu_capstone (
-        id SERIAL PRIMARY KEY,
-        city VARCHAR(255),
-        region VARCHAR(255),
-        country VARCHAR(255),
-        latitude FLOAT,
-        longitude FLOAT,
-        timezone_id VARCHAR(100),
-        localtime_epoch BIGINT,
-        date DATE,
-        maxtemp_c FLOAT,
-        mintemp_c FLOAT,
-        avgtemp_c FLOAT,
-        totalprecip_mm FLOAT,
-        uv_index INTEGER
-    );
-    """
-    cursor.execute(create_table_query)
-    conn.commit()  # commit the transaction
-
-    # prepare insert statement for weather data
-    insert_stmt = """
-    INSERT INTO student.de11_fehu_capstone (
-        city, region, country, latitude, longitude, timezone_id, localtime_epoch,
-        date, maxtemp_c, mintemp_c, avgtemp_c, totalprecip_mm, uv_index
-    ) VALUES %s;
-    """
-
-    # data to be inserted
-    data_tuples = [
-        (
+from utils.db_pool import get_connection, close_pool
+from utils.http_client import WeatherApiError, get_client, close_client
+from etl.load.migrations import ensure_schema
+from etl.load.copy_loader import HISTORIC_TARGET, copy_load
+
+endpoint = "history.json"
+
+def initialise_db(conn):
+    # the tables, keys and indexes are owned by etl/load/migrations.py
+    ensure_schema(conn)
+
+
+# make api request for one location and date window
+def fetch_history(location, date, end_date, client=None, use_cache=True):
+    load_dotenv()
+    try:
+        return (client or get_client()).get(
+            endpoint, {'q': location, 'dt': date, 'end_dt': end_date}, use_cache=use_cache
+        )
+    except WeatherApiError as e:
+        print(f"Failed to retrieve data: {e}")
+        return None
+
+
+# yield de11_fehu_capstone rows from a history.json response, one per day;
+# a day repeated in the response is merged once, keeping its last row
+def history_rows(response_data):
+    for forecast_day in response_data['forecast']['forecastday']:
+        yield (
             response_data['location']['name'],
             response_data['location']['region'],
             response_data['location']['country'],
@@ -84,17 +41,36 @@ if response.status_code == 200:
             forecast_day['day']['avgtemp_c'],
             forecast_day['day']['totalprecip_mm'],
             forecast_day['day']['uv']
-        ) for forecast_day in response_data['forecast']['forecastday']
-    ]
+        )
+
 
-    # execute the insertion
-    execute_values(cursor, insert_stmt, data_tuples)
+# stream rows through COPY into a staging table and upsert them, re-runs
+# overwrite the same day
+def load_history(conn, rows):
+    loaded = copy_load(conn, HISTORIC_TARGET, rows)
     conn.commit()
+    return loaded
 
-    # close the connection
-    cursor.close()
-    conn.close()
+
+def insert_history(location, date, end_date):
+    response_data = fetch_history(location, date, end_date)
+    if response_data is None:
+        return 0
+
+    # borrow a pooled connection, it goes back to the pool afterwards
+    with get_connection() as conn:
+        initialise_db(conn)
+        inserted = load_history(conn, history_rows(response_data))
 
     print("Data inserted successfully.")
-else:
-    print(f"Failed to retrieve data: HTTP Status Code {response.status_code}")
+    return inserted
+
+
+def main():
+    insert_history("London", "2025-01-08", "2025-01-21")
+    close_client()
+    close_pool()
+
+
+if __name__ == "__main__":
+    main()
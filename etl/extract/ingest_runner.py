@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import os
+import time
+
+from dotenv import load_dotenv
+
+from etl.extract.current import current_row, initialise_db, load_current
+from etl.extract.query_cache import weather_cache
+from etl.load.migrations import extend_partitions, partitioning_enabled
+from utils.db_pool import get_connection
+from utils.http_client import WeatherApiError, get_client
+from utils.metrics import metrics, timed
+
+# WeatherAPI's free plan allows 1,000,000 calls a month (~23 a minute)
+DEFAULT_CALLS_PER_MINUTE = 20
+DEFAULT_BURST = 5
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_INTERVAL_SECONDS = 3600
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, up to `capacity`.
+
+    `clock` and `sleep` default to time.monotonic and asyncio.sleep and
+    can be replaced, e.g. by a fake clock in tests.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=asyncio.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await self.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def acquire_blocking(self, loop):
+        # for worker threads: wait until the event loop running `loop` hands out a token
+        asyncio.run_coroutine_threadsafe(self.acquire(), loop).result()
+
+
+class CurrentIngestRunner:
+    """Fetch current conditions for many cities in one parallel wave.
+
+    The WeatherAPI client is blocking, so each call runs in a worker thread;
+    the semaphore bounds how many are in flight and the token bucket keeps
+    the overall call rate inside the WeatherAPI plan. A token is taken per
+    HTTP attempt, so the client's own retries are rate limited too, and a
+    cached response costs none.
+    """
+
+    def __init__(self, cities, calls_per_minute=DEFAULT_CALLS_PER_MINUTE,
+                 burst=DEFAULT_BURST, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.cities = list(dict.fromkeys(c.strip() for c in cities if c.strip()))
+        self.calls_per_minute = calls_per_minute
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+
+        load_dotenv()
+        # shared keep-alive client, sized by WEATHER_API_POOL_SIZE
+        self.client = get_client()
+
+    def _fetch_blocking(self, city, take_token):
+        response_data = self.client.get("current.json", {'q': city}, before_attempt=take_token)
+        return city, current_row(response_data), None
+
+    async def _fetch(self, city, semaphore, bucket):
+        loop = asyncio.get_running_loop()
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(
+                    self._fetch_blocking, city, lambda: bucket.acquire_blocking(loop)
+                )
+            except (WeatherApiError, ValueError, KeyError) as e:
+                return city, None, str(e)
+
+    async def fetch_all(self):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        bucket = TokenBucket(self.calls_per_minute / 60, self.burst)
+        return await asyncio.gather(
+            *(self._fetch(city, semaphore, bucket) for city in self.cities)
+        )
+
+    def write_rows(self, rows):
+        # returns the number of readings stored, already stored ones are skipped
+        if not rows:
+            return 0
+        with get_connection() as conn:
+            initialise_db(conn)
+            if partitioning_enabled():
+                # a daemon outlives the partitions created at its start
+                extend_partitions(conn)
+            return load_current(conn, rows)
+
+    async def run_cycle(self):
+        started = time.monotonic()
+        with timed('ingest_fetch'):
+            results = await self.fetch_all()
+        rows = [row for _, row, _ in results if row is not None]
+        failures = {city: error for city, _, error in results if error}
+
+        # one COPY for the whole wave; a database error fails this cycle's
+        # rows but not the daemon, the next cycle fetches them again
+        inserted = 0
+        try:
+            with timed('ingest_write'):
+                inserted = await asyncio.to_thread(self.write_rows, rows)
+        except Exception as e:
+            print(f"Ingest write failed: {e}")
+            for city, row, _ in results:
+                if row is not None:
+                    failures[city] = f"write failed: {str(e).strip()}"
+        else:
+            for city, row, _ in results:
+                if row is not None:
+                    weather_cache.note_ingest(city, row[7])
+                    weather_cache.note_ingest(row[0], row[7])
+
+        return {
+            'cities': len(self.cities),
+            'inserted': inserted,
+            'failed': failures,
+            'seconds': round(time.monotonic() - started, 3),
+        }
+
+    async def run_forever(self, interval=DEFAULT_INTERVAL_SECONDS):
+        while True:
+            started = time.monotonic()
+            summary = await self.run_cycle()
+            print(f"Ingest cycle: {summary}")
+            metrics.write_textfile()
+            await asyncio.sleep(max(0, interval - (time.monotonic() - started)))
+
+
+def parse_args(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        description="Ingest current weather for many cities concurrently."
+    )
+    parser.add_argument(
+        'cities', nargs='*',
+        default=os.getenv('INGEST_CITIES', 'Bristol,London').split(','),
+        help="cities to ingest (default: INGEST_CITIES or Bristol,London)"
+    )
+    parser.add_argument(
+        '--calls-per-minute', type=float,
+        default=float(os.getenv('WEATHER_API_CALLS_PER_MINUTE', DEFAULT_CALLS_PER_MINUTE))
+    )
+    parser.add_argument(
+        '--burst', type=int,
+        default=int(os.getenv('WEATHER_API_BURST', DEFAULT_BURST))
+    )
+    parser.add_argument(
+        '--max-concurrency', type=int,
+        default=int(os.getenv('INGEST_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY))
+    )
+    parser.add_argument(
+        '--interval', type=int, default=DEFAULT_INTERVAL_SECONDS,
+        help="seconds between cycles when running as a daemon"
+    )
+    parser.add_argument(
+        '--once', action='store_true', help="run a single cycle and exit"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    runner = CurrentIngestRunner(
+        args.cities, calls_per_minute=args.calls_per_minute,
+        burst=args.burst, max_concurrency=args.max_concurrency
+    )
+    if args.once:
+        print(f"Ingest cycle: {asyncio.run(runner.run_cycle())}")
+        metrics.write_textfile()
+    else:
+        asyncio.run(runner.run_forever(args.interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils.lazy import lazy_import
+
+# only the batched lookup needs pandas, and current.py imports this module
+pd = lazy_import('pandas')
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 32
+
+# key of entries holding every city, dropped whenever any city's history changes
+ALL_CITIES = "*"
+
+
+def normalise_city(city):
+    return city.strip().lower()
+
+
+class QueryCache:
+    """In-process LRU cache with a TTL, keyed on (city, latest ingest).
+
+    The latest ingested timestamp per city is part of the key, so when
+    insert_current() records a newer row the old entries stop matching and
+    are dropped; the TTL bounds staleness for rows written by other
+    processes (e.g. the hourly cron run of current.py).
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL_SECONDS,
+                 max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._latest_ingest = {}
+        # bumped on every invalidation, so holders of derived state can
+        # tell whether a city changed since they last looked
+        self._versions = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0,
+                       'invalidations': 0}
+
+    def key_for(self, city):
+        city_key = normalise_city(city)
+        with self._lock:
+            return city_key, self._latest_ingest.get(city_key)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self, city=None):
+        with self._lock:
+            if city is None:
+                self._stats['invalidations'] += len(self._entries)
+                self._entries.clear()
+                self._generation += 1
+                return
+            city_key = normalise_city(city)
+            self._versions[city_key] = self._versions.get(city_key, 0) + 1
+            stale = [key for key in self._entries if key[0] == city_key]
+            for key in stale:
+                del self._entries[key]
+            self._stats['invalidations'] += len(stale)
+
+    def note_ingest(self, city, last_updated):
+        # only a strictly newer row changes what the queries would return
+        city_key = normalise_city(city)
+        with self._lock:
+            known = self._latest_ingest.get(city_key)
+            if known is not None and last_updated <= known:
+                return False
+            self._latest_ingest[city_key] = last_updated
+        self.invalidate(city_key)
+        return True
+
+    def version(self, city):
+        # changes whenever the city, or the whole cache, is invalidated
+        with self._lock:
+            return self._generation, self._versions.get(normalise_city(city), 0)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        return stats
+
+
+def _from_env(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+weather_cache = QueryCache(
+    ttl=_from_env('QUERY_CACHE_TTL', DEFAULT_TTL_SECONDS),
+    max_entries=_from_env('QUERY_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+)
+
+
+def cached_query(city, loader, cache=weather_cache, kind='daily'):
+    # loader(city) runs only on a miss; callers get a copy so in-place
+    # transforms never leak back into the cached frame. `kind` keeps
+    # different queries for the same city apart.
+    key = cache.key_for(city) + (kind,)
+    result = cache.get(key)
+    if result is None:
+        result = loader(city)
+        cache.set(key, result)
+    return result.copy()
+
+
+def cached_batch_query(cities, loader, cache=weather_cache, kind='daily'):
+    """Per-city cached lookup of several cities with one loader call.
+
+    loader(cities) gets only the cities missing from the cache and returns
+    one long frame whose `city` column holds the normalised keys. Each
+    city's slice is cached under its own key, so an ingest for one city
+    only refetches that city. Returns the frames of `cities` concatenated
+    in the order given, each city once.
+    """
+    cities = list(dict.fromkeys(normalise_city(city) for city in cities))
+    if not cities:
+        return loader(cities)
+    keys = {city: cache.key_for(city) + (kind,) for city in cities}
+    frames = {}
+    for city in cities:
+        result = cache.get(keys[city])
+        if result is not None:
+            frames[city] = result
+    missing = [city for city in cities if city not in frames]
+    if missing:
+        loaded = loader(missing)
+        groups = dict(tuple(loaded.groupby(loaded['city'].astype(str), sort=False)))
+        for city in missing:
+            # cities without rows are cached empty too
+            frames[city] = groups.get(city, loaded.iloc[:0]).reset_index(drop=True)
+            cache.set(keys[city], frames[city])
+    return pd.concat([frames[city] for city in cities], ignore_index=True)
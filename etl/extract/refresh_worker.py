@@ -0,0 +1,86 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from etl.extract import current
+from etl.extract.query_cache import normalise_city
+from utils.metrics import timed
+
+DEFAULT_MAX_WORKERS = 2
+
+_job_ids = itertools.count(1)
+
+
+class RefreshJob:
+    """One background insert_current() run and the progress it reports."""
+
+    def __init__(self, city):
+        self.id = next(_job_ids)
+        self.city = city
+        self.status = 'running'  # then 'updated', 'unchanged' or 'failed'
+        self.progress = 0.0
+        self.message = "Queued"
+        self.started_at = time.time()
+        self.finished_at = None
+
+    @property
+    def running(self):
+        return self.status == 'running'
+
+    def report(self, progress, message):
+        self.progress = progress
+        self.message = message
+
+    def finish(self, status, message):
+        self.status = status
+        self.progress = 1.0
+        self.message = message
+        self.finished_at = time.time()
+
+
+class RefreshWorker:
+    """Runs insert_current() off the Streamlit script thread.
+
+    The app renders the last stored data straight away and polls the job
+    for its progress; one job per city runs at a time and repeated requests
+    for that city join it.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='refresh')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, city):
+        city_key = normalise_city(city)
+        with self._lock:
+            job = self._jobs.get(city_key)
+            if job is not None and job.running:
+                return job
+            job = RefreshJob(city)
+            self._jobs[city_key] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def job_for(self, city):
+        with self._lock:
+            return self._jobs.get(normalise_city(city))
+
+    def _run(self, job):
+        try:
+            # looked up on each run so tests can patch current.insert_current
+            with timed('refresh'):
+                stored = current.insert_current(job.city, progress=job.report)
+        except Exception as e:
+            job.finish('failed', f"Refresh failed: {e}")
+            return
+        if stored is None:
+            job.finish('failed', job.message)
+        elif stored:
+            job.finish('updated', "Latest conditions stored")
+        else:
+            job.finish('unchanged', "Already up to date")
+
+
+refresh_worker = RefreshWorker()
@@ -0,0 +1,194 @@
+import argparse
+import functools
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import pandas as pd
+from dotenv import load_dotenv
+
+from utils.db_pool import get_connection
+from utils.lazy import lazy_import
+from etl.load.migrations import ensure_schema
+
+# the Parquet side of pyarrow is only imported once a snapshot is used
+pa = lazy_import('pyarrow')
+ds = lazy_import('pyarrow.dataset')
+pq = lazy_import('pyarrow.parquet')
+
+# the high-water mark is set this far before each refresh started, so a
+# load that committed after the refresh but began before it is not missed
+HIGH_WATER_OVERLAP = timedelta(minutes=10)
+
+# rows fetched per round trip while refreshing
+REFRESH_BATCH_ROWS = 50000
+
+META_FILE = 'meta.json'
+
+SNAPSHOT_COLUMNS = ['city', 'date', 'avgtemp_c', 'maxtemp_c', 'mintemp_c', 'totalprecip_mm',
+                    'uv_index', 'loaded_at']
+
+
+@functools.lru_cache(maxsize=None)
+def snapshot_schema():
+    return pa.schema([
+        ('city', pa.string()),
+        ('date', pa.timestamp('ns')),
+        ('avgtemp_c', pa.float64()),
+        ('maxtemp_c', pa.float64()),
+        ('mintemp_c', pa.float64()),
+        ('totalprecip_mm', pa.float64()),
+        ('uv_index', pa.float64()),
+        ('loaded_at', pa.timestamp('us', tz='UTC')),
+    ])
+
+
+@functools.lru_cache(maxsize=None)
+def year_partitioning():
+    # year comes from the partition directories below each city's directory
+    return ds.partitioning(pa.schema([('year', pa.int32())]), flavor='hive')
+
+
+refresh_query = """
+SELECT city_key, city, date::TIMESTAMP AS date, avgtemp_c, maxtemp_c, mintemp_c,
+       totalprecip_mm, uv_index::FLOAT AS uv_index, loaded_at
+FROM student.de11_fehu_capstone
+WHERE date IS NOT NULL AND (%(since)s::TIMESTAMPTZ IS NULL OR loaded_at > %(since)s)
+ORDER BY city_key, date
+"""
+
+
+class SnapshotStore:
+    """Parquet snapshot of student.de11_fehu_capstone on local disk.
+
+    Files are laid out as city_key=<city>/year=<year>/data.parquet so a
+    city's read only opens that city's files. meta.json records the
+    high-water mark: every historic row loaded before it is in the snapshot.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def meta(self):
+        try:
+            with open(os.path.join(self.path, META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def available(self):
+        return self.meta() is not None
+
+    def high_water_mark(self):
+        meta = self.meta()
+        return datetime.fromisoformat(meta['high_water_mark']) if meta else None
+
+    def _city_dir(self, city_key):
+        return os.path.join(self.path, f"city_key={quote(city_key, safe='')}")
+
+    def _partition_file(self, city_key, year):
+        return os.path.join(self._city_dir(city_key), f"year={year}", 'data.parquet')
+
+    def write_partition(self, city_key, year, rows):
+        # merge rows into one (city, year) partition, newer loads win per day
+        path = self._partition_file(city_key, year)
+        if os.path.exists(path):
+            rows = pd.concat([pq.read_table(path, schema=snapshot_schema()).to_pandas(), rows], ignore_index=True)
+        rows = rows.sort_values(['date', 'loaded_at']).drop_duplicates('date', keep='last')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        pq.write_table(pa.Table.from_pandas(rows[SNAPSHOT_COLUMNS], schema=snapshot_schema(), preserve_index=False),
+                       tmp_path)
+        os.replace(tmp_path, path)
+
+    def write_meta(self, high_water_mark, rows):
+        meta = {
+            'high_water_mark': high_water_mark.isoformat(),
+            'refreshed_at': datetime.now().isoformat(timespec='seconds'),
+            'rows_last_refresh': rows,
+        }
+        os.makedirs(self.path, exist_ok=True)
+        tmp_path = os.path.join(self.path, f"{META_FILE}.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, META_FILE))
+
+    def read_city(self, city_key, years=None):
+        # only the city's directory is scanned; `years` prunes year partitions too
+        city_dir = self._city_dir(city_key)
+        if not os.path.isdir(city_dir):
+            return pd.DataFrame(columns=SNAPSHOT_COLUMNS)
+        dataset = ds.dataset(city_dir, format='parquet', schema=snapshot_schema().append(pa.field('year', pa.int32())),
+                             partitioning=year_partitioning(), exclude_invalid_files=True)
+        row_filter = ds.field('year').isin(list(years)) if years is not None else None
+        return dataset.to_table(columns=SNAPSHOT_COLUMNS, filter=row_filter).to_pandas()
+
+    def clear(self):
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+
+
+def refresh_snapshot(conn, store, full=False):
+    """Copy historic rows loaded since the high-water mark into the snapshot.
+
+    Returns the number of rows fetched. `full` rebuilds it from scratch.
+    """
+    with store._lock:
+        if full:
+            store.clear()
+        since = store.high_water_mark()
+
+        # server time, the same clock loaded_at is stamped with
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT now()")
+            high_water_mark = cursor.fetchone()[0] - HIGH_WATER_OVERLAP
+
+        fetched = 0
+        # server-side cursor so a first full refresh never holds the table in memory
+        with conn.cursor(name='weather_snapshot_refresh') as cursor:
+            cursor.itersize = REFRESH_BATCH_ROWS
+            cursor.execute(refresh_query, {'since': since})
+            while True:
+                batch = cursor.fetchmany(REFRESH_BATCH_ROWS)
+                if not batch:
+                    break
+                rows = pd.DataFrame.from_records(batch, columns=['city_key'] + SNAPSHOT_COLUMNS)
+                rows['date'] = rows['date'].astype('datetime64[ns]')
+                rows['loaded_at'] = pd.to_datetime(rows['loaded_at'], utc=True)
+                for (city_key, year), partition in rows.groupby(['city_key', rows['date'].dt.year]):
+                    store.write_partition(city_key, year, partition)
+                fetched += len(rows)
+        conn.commit()
+
+        # recorded last, a crash before this only repeats the same delta
+        store.write_meta(high_water_mark, fetched)
+    return fetched
+
+
+def default_store():
+    # the snapshot is opt-in: no WEATHER_SNAPSHOT_DIR, no snapshot reads
+    path = os.getenv('WEATHER_SNAPSHOT_DIR')
+    return SnapshotStore(path) if path else None
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Refresh the local Parquet snapshot of the historic weather table.")
+    parser.add_argument('--dir', default=os.getenv('WEATHER_SNAPSHOT_DIR', 'weather_snapshot'),
+                        help="snapshot directory (default: WEATHER_SNAPSHOT_DIR or ./weather_snapshot)")
+    parser.add_argument('--full', action='store_true', help="rebuild the snapshot from scratch")
+    args = parser.parse_args(argv)
+
+    store = SnapshotStore(args.dir)
+    with get_connection() as conn:
+        ensure_schema(conn)
+        fetched = refresh_snapshot(conn, store, full=args.full)
+    print(f"Snapshot refreshed: {fetched} row(s) fetched, high-water mark {store.meta()['high_water_mark']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,11 @@
-import pandas as pd
 import os
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
 
 #colour maping dict created to be used in app.py script
 VEG_COLOUR = {
@@ -7,21 +13,87 @@ VEG_COLOUR = {
     "lettuce":"green",
     "tomatoes":"red"
 }
-def get_veg_data():
-    
-    # traverse up to the project root folder
-    print(os.path.dirname(__file__))
-    root_folder = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../../../'))
-    root_folder = os.path.join(root_folder,"etl/data")
-    
-    file_names = [f for f in os.listdir(root_folder)]
-    data_dict = {}
-    for filename in file_names:
+
+MONTHS = ('January', 'February', 'March', 'April', 'May', 'June',
+          'July', 'August', 'September', 'October', 'November', 'December')
+
+# crop csv files live in etl/data next to this package
+DATA_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+# seconds between checks of the data folder for changed files
+MTIME_CHECK_INTERVAL = 5
+
+# one crop's growing conditions; the numeric arrays are indexed by month
+# (0 = January) and read-only, missing months are NaN
+CropProfile = namedtuple('CropProfile', ['name', 'frame', 'mintemp_c', 'maxtemp_c', 'precip_mm'])
+
+_lock = threading.Lock()
+_registry = None
+_frames = None
+_signature = None
+_checked_at = 0.0
+
+
+def _folder_signature(folder):
+    return tuple(sorted(
+        (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+        for entry in os.scandir(folder)
+        if entry.is_file() and entry.name.endswith('.csv')
+    ))
+
+
+def _month_array(frame, column):
+    values = np.full(len(MONTHS), np.nan)
+    month_index = frame['month'].map({m: i for i, m in enumerate(MONTHS)})
+    known = month_index.notna()
+    values[month_index[known].astype(int).to_numpy()] = frame.loc[known, column].to_numpy(dtype=float)
+    values.setflags(write=False)
+    return values
+
+
+def _load_profiles(folder):
+    profiles = {}
+    for filename in sorted(os.listdir(folder)):
+        if not filename.endswith('.csv'):
+            continue
         datatype = filename.split(".")[0]
-        data = pd.read_csv(os.path.join(root_folder,filename))
-        data_dict[datatype] = data
-    print(data_dict)
+        data = pd.read_csv(os.path.join(folder, filename), encoding='utf-8-sig')
+        profiles[datatype] = CropProfile(
+            name=datatype,
+            frame=data,
+            mintemp_c=_month_array(data, 'mintemp_c'),
+            maxtemp_c=_month_array(data, 'maxtemp_c'),
+            precip_mm=_month_array(data, 'precip_mm'),
+        )
+    return MappingProxyType(profiles)
+
+
+def _refresh():
+    # loaded once per process, reloaded only when a csv file changes
+    global _registry, _frames, _signature, _checked_at
+    now = time.monotonic()
+    if _registry is not None and now - _checked_at < MTIME_CHECK_INTERVAL:
+        return
+    with _lock:
+        signature = _folder_signature(DATA_FOLDER)
+        if _registry is None or signature != _signature:
+            _registry = _load_profiles(DATA_FOLDER)
+            _frames = MappingProxyType({name: profile.frame for name, profile in _registry.items()})
+            _signature = signature
+        _checked_at = now
 
-    return data_dict
 
-get_veg_data()
\ No newline at end of file
+def get_crop_registry():
+    _refresh()
+    return _registry
+
+
+def get_crop_profile(veg):
+    return get_crop_registry()[veg]
+
+
+def get_veg_data():
+    # read-only mapping of crop name to its csv DataFrame; copy a frame
+    # before modifying it
+    _refresh()
+    return _frames
@@ -0,0 +1,233 @@
+import os
+import threading
+import weakref
+
+import pandas as pd
+import psycopg2
+from utils.db_pool import get_connection
+from etl.extract.copy_reader import copy_frame
+from etl.extract.snapshot import default_store
+from etl.extract.query_cache import normalise_city
+from utils.metrics import metrics, timed
+
+WEATHER_COLUMNS = ['city', 'date', 'avgtemp_c', 'maxtemp_c', 'mintemp_c', 'totalprecip_mm', 'uv_index']
+ALL_DAILY_COLUMNS = ['city', 'date', 'mintemp_c', 'maxtemp_c', 'totalprecip_mm']
+
+# "prepared" fetches rows through the prepared statements, "copy" streams
+# the same queries out with COPY into compact float32/categorical frames
+READ_MODES = ('prepared', 'copy')
+
+# historic series plus the latest current reading in one round trip; the
+# current row is dropped when its day is already in the historic table,
+# matching the old drop_duplicates(keep='first'). date comes back as a
+# timestamp so pandas builds a datetime64 column directly.
+series_template = """
+WITH historic AS (
+    SELECT city, date, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm, uv_index::FLOAT AS uv_index
+    FROM student.de11_fehu_capstone
+    WHERE city_key = LOWER($1){since}
+),
+latest AS (
+    SELECT city, date, temp_c AS avgtemp_c, temp_c AS maxtemp_c, temp_c AS mintemp_c,
+           precip_mm AS totalprecip_mm, uv_index
+    FROM student.weather_data_latest
+    WHERE city_key = LOWER($1)
+)
+SELECT city, date::TIMESTAMP AS date, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm, uv_index
+FROM (
+    SELECT * FROM historic
+    UNION ALL
+    SELECT * FROM latest
+    WHERE NOT EXISTS (SELECT 1 FROM historic WHERE historic.date = latest.date){since}
+) combined
+ORDER BY date ASC
+"""
+
+series_query = series_template.format(since="")
+
+# the same series from a given day on, for incremental refreshes
+series_since_query = series_template.format(since=" AND date >= $2")
+
+# what a local snapshot of the historic table is missing: historic rows
+# loaded after its high-water mark, plus the latest current reading when
+# the historic table has no row for that day
+snapshot_delta_query = """
+WITH historic AS (
+    SELECT city, date, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm, uv_index::FLOAT AS uv_index
+    FROM student.de11_fehu_capstone
+    WHERE city_key = LOWER($1) AND loaded_at > $2
+),
+latest AS (
+    SELECT city, date, temp_c AS avgtemp_c, temp_c AS maxtemp_c, temp_c AS mintemp_c,
+           precip_mm AS totalprecip_mm, uv_index
+    FROM student.weather_data_latest
+    WHERE city_key = LOWER($1)
+)
+SELECT city, date::TIMESTAMP AS date, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm, uv_index
+FROM (
+    SELECT * FROM historic
+    UNION ALL
+    SELECT * FROM latest
+    WHERE NOT EXISTS (
+        SELECT 1 FROM student.de11_fehu_capstone h
+        WHERE h.city_key = LOWER($1) AND h.date = latest.date
+    )
+) combined
+ORDER BY date ASC
+"""
+
+# the series of several cities in one round trip, long format with the
+# normalised city key as `city`; $1 is a text[] of city keys and each
+# city gets its own latest current reading, a primary key read per city
+multi_series_query = """
+WITH historic AS (
+    SELECT city_key, date, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm, uv_index::FLOAT AS uv_index
+    FROM student.de11_fehu_capstone
+    WHERE city_key = ANY($1::TEXT[])
+),
+latest AS (
+    SELECT city_key, date, temp_c AS avgtemp_c, temp_c AS maxtemp_c,
+           temp_c AS mintemp_c, precip_mm AS totalprecip_mm, uv_index
+    FROM student.weather_data_latest
+    WHERE city_key = ANY($1::TEXT[])
+)
+SELECT city_key AS city, date::TIMESTAMP AS date, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm, uv_index
+FROM (
+    SELECT * FROM historic
+    UNION ALL
+    SELECT * FROM latest
+    WHERE NOT EXISTS (
+        SELECT 1 FROM historic
+        WHERE historic.city_key = latest.city_key AND historic.date = latest.date
+    )
+) combined
+ORDER BY city, date ASC
+"""
+
+# historic days of every city, for cross-city analyses
+all_daily_query = """
+SELECT city_key AS city, date::TIMESTAMP AS date, mintemp_c, maxtemp_c, totalprecip_mm
+FROM student.de11_fehu_capstone
+WHERE date IS NOT NULL
+ORDER BY city_key, date
+"""
+
+
+class WeatherRepository:
+    """Reads weather series with server-side prepared statements.
+
+    Each statement is PREPAREd once per pooled connection and then only
+    EXECUTEd, so PostgreSQL can reuse the plan and the city is always sent
+    as a bound parameter. In "copy" read mode the same queries are streamed
+    out with COPY instead (see etl/extract/copy_reader.py). With a local
+    snapshot (etl/extract/snapshot.py) a city's historic rows come from
+    Parquet and only the delta since its high-water mark from PostgreSQL.
+    """
+
+    statements = {
+        'weather_series': ('text', series_query),
+        'weather_series_since': ('text, date', series_since_query),
+        'weather_series_delta': ('text, timestamptz', snapshot_delta_query),
+        'weather_series_multi': ('text[]', multi_series_query),
+        'all_daily': ('', all_daily_query),
+    }
+
+    def __init__(self, connection_factory=get_connection, read_mode=None, snapshot=None):
+        self.connection_factory = connection_factory
+        self.snapshot = snapshot if snapshot is not None else default_store()
+        self.read_mode = read_mode or os.getenv('WEATHER_READ_MODE', 'prepared')
+        if self.read_mode not in READ_MODES:
+            raise ValueError(f"Unknown read mode {self.read_mode!r}, expected one of {READ_MODES}")
+        self._prepared = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _prepare(self, cursor, conn, name):
+        arg_types, query = self.statements[name]
+        arg_list = f" ({arg_types})" if arg_types else ""
+        try:
+            cursor.execute(f"PREPARE {name}{arg_list} AS {query}")
+        except psycopg2.errors.DuplicatePreparedStatement:
+            # prepared by an earlier repository on this pooled connection,
+            # e.g. before Streamlit re-ran the app script
+            conn.rollback()
+        with self._lock:
+            self._prepared.setdefault(conn, set()).add(name)
+
+    def execute(self, conn, name, params):
+        with self._lock:
+            prepared = name in self._prepared.get(conn, ())
+        statement = f"EXECUTE {name}"
+        if params:
+            statement += f" ({', '.join(['%s'] * len(params))})"
+        with conn.cursor() as cursor:
+            if not prepared:
+                self._prepare(cursor, conn, name)
+            try:
+                cursor.execute(statement, params)
+            except psycopg2.errors.InvalidSqlStatementName:
+                # the server session was reset (e.g. DISCARD ALL), prepare again
+                conn.rollback()
+                self._prepare(cursor, conn, name)
+                cursor.execute(statement, params)
+            rows = cursor.fetchall()
+        conn.commit()
+        return rows
+
+    def _read_frame(self, name, params, columns):
+        with self.connection_factory() as conn:
+            if self.read_mode == 'copy':
+                return copy_frame(conn, self.statements[name][1], params, columns)
+            rows = self.execute(conn, name, params)
+        return self.to_frame(rows, columns)
+
+    def read_frame(self, name, params, columns):
+        with timed('db_query', statement=name, mode=self.read_mode):
+            df = self._read_frame(name, params, columns)
+        metrics.count_rows('db_query', len(df), statement=name)
+        return df
+
+    def get_weather_data(self, location):
+        if self.snapshot is not None and self.snapshot.available():
+            return self.get_weather_data_from_snapshot(location)
+        return self.read_frame('weather_series', (location,), WEATHER_COLUMNS)
+
+    def get_weather_data_from_snapshot(self, location):
+        since = self.snapshot.high_water_mark()
+        delta = self.read_frame('weather_series_delta', (location, since), WEATHER_COLUMNS)
+        stored = self.snapshot.read_city(normalise_city(location))[WEATHER_COLUMNS]
+
+        frames = [frame for frame in (stored, delta) if not frame.empty]
+        if not frames:
+            return delta
+        # rows reloaded since the snapshot replace their snapshot copy
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates('date', keep='last').sort_values('date', ignore_index=True)
+        if self.read_mode == 'copy':
+            df = df.astype({c: 'category' if c == 'city' else 'float32' for c in WEATHER_COLUMNS if c != 'date'})
+        return df
+
+    def get_weather_data_since(self, location, since):
+        return self.read_frame('weather_series_since', (location, since), WEATHER_COLUMNS)
+
+    def get_weather_data_for_cities(self, locations):
+        """The series of every city in `locations` from one query.
+
+        Returns a long frame with one row per (city, day), `city` holding
+        the normalised key. Names that differ only in case or spacing are
+        fetched once. Always read from PostgreSQL, the snapshot is per city.
+        """
+        city_keys = list(dict.fromkeys(normalise_city(location) for location in locations))
+        if not city_keys:
+            return self.to_frame([], WEATHER_COLUMNS)
+        return self.read_frame('weather_series_multi', (city_keys,), WEATHER_COLUMNS)
+
+    def get_all_daily(self):
+        return self.read_frame('all_daily', (), ALL_DAILY_COLUMNS)
+
+    @staticmethod
+    def to_frame(rows, columns=WEATHER_COLUMNS):
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        floats = [c for c in columns if c not in ('city', 'date')]
+        df[floats] = df[floats].astype('float64')
+        df['date'] = df['date'].astype('datetime64[ns]')
+        return df
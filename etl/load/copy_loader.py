@@ -0,0 +1,142 @@
+import csv
+import io
+from collections import namedtuple
+
+from etl.load.rollups import refresh_monthly_rollups
+from etl.load.retention import refresh_latest
+from utils.metrics import metrics, timed
+
+# rows buffered in memory before each COPY round trip
+DEFAULT_CHUNK_ROWS = 5000
+
+# written for None so empty strings (e.g. a blank region) stay empty strings
+NULL_MARKER = r'\N'
+
+# table: merge target; columns: order of the row tuples; key: expressions
+# identifying a row, matching the unique index named by conflict; update:
+# overwrite existing rows on conflict, or keep them; touch: timestamp column
+# set to now() when a row is overwritten; staging_types: staging column
+# types that differ from the target's, cast back by the merge; latest:
+# refresh student.weather_data_latest for the cities loaded
+CopyTarget = namedtuple('CopyTarget', ['table', 'columns', 'key', 'conflict', 'update', 'touch',
+                                       'staging_types', 'latest'],
+                        defaults=(None, None, False))
+
+HISTORIC_TARGET = CopyTarget(
+    table='student.de11_fehu_capstone',
+    columns=('city', 'region', 'country', 'latitude', 'longitude', 'timezone_id', 'localtime_epoch',
+             'date', 'maxtemp_c', 'mintemp_c', 'avgtemp_c', 'totalprecip_mm', 'uv_index'),
+    key='LOWER(city), date',
+    conflict='(city_key, date)',
+    update=True,
+    touch='loaded_at',
+    # WeatherAPI sends uv as 1.0; COPY will not read that into INTEGER the
+    # way an INSERT casts it, so it is staged as NUMERIC and rounded on merge
+    staging_types={'uv_index': 'NUMERIC'},
+)
+
+CURRENT_TARGET = CopyTarget(
+    table='student.weather_data',
+    columns=('city', 'region', 'country', 'latitude', 'longitude', 'timezone_id', 'localtime_epoch',
+             'last_updated', 'date', 'temp_c', 'wind_mph', 'precip_mm', 'humidity', 'feelslike_c',
+             'uv_index'),
+    key='LOWER(city), date, last_updated',
+    conflict='(city_key, date, last_updated)',
+    update=False,
+    latest=True,
+)
+
+STAGING_TABLE = 'weather_copy_staging'
+
+
+def create_staging_stmt(target):
+    # column types copied from the target, without its keys or generated columns;
+    # seq keeps the arrival order so the last copy of a duplicate row wins
+    retyped = ''.join(f" ALTER COLUMN {column} TYPE {column_type},"
+                      for column, column_type in (target.staging_types or {}).items())
+    return f"""
+    CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS
+    SELECT {', '.join(target.columns)} FROM {target.table} WITH NO DATA;
+    ALTER TABLE {STAGING_TABLE}{retyped} ADD COLUMN seq BIGSERIAL;
+    """
+
+
+def merge_stmt(target):
+    columns = ', '.join(target.columns)
+    if target.update:
+        updates = ', '.join(f"{c} = EXCLUDED.{c}" for c in target.columns if c != 'city')
+        if target.touch:
+            updates += f", {target.touch} = now()"
+        on_conflict = f"ON CONFLICT {target.conflict} DO UPDATE SET {updates}"
+    else:
+        on_conflict = f"ON CONFLICT {target.conflict} DO NOTHING"
+    return f"""
+    INSERT INTO {target.table} ({columns})
+    SELECT DISTINCT ON ({target.key}) {columns}
+    FROM {STAGING_TABLE}
+    ORDER BY {target.key}, seq DESC
+    {on_conflict}
+    """
+
+
+def _copy_buffer(cursor, buffer, columns):
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {STAGING_TABLE} ({', '.join(columns)}) FROM STDIN "
+        f"WITH (FORMAT csv, NULL '{NULL_MARKER}')",
+        buffer
+    )
+    buffer.seek(0)
+    buffer.truncate()
+
+
+def copy_rows(cursor, columns, rows, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # stream row tuples into the staging table, chunk_rows at a time
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    copied = buffered = 0
+    for row in rows:
+        writer.writerow([NULL_MARKER if value is None else value for value in row])
+        buffered += 1
+        if buffered == chunk_rows:
+            _copy_buffer(cursor, buffer, columns)
+            copied += buffered
+            buffered = 0
+    if buffered:
+        _copy_buffer(cursor, buffer, columns)
+        copied += buffered
+    return copied
+
+
+def copy_load(conn, target, rows, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Load an iterable of row tuples into `target` through COPY FROM STDIN.
+
+    Rows are consumed lazily and copied into a temporary staging table in
+    chunks and merged into the target with its ON CONFLICT rule. Historic
+    rows refresh the monthly rollups of the months they touch; current
+    readings refresh the latest row of each city, and the rollups of the
+    months that row left or entered. Runs in the caller's
+    transaction; returns the number of rows the merge wrote, so rows
+    skipped by ON CONFLICT DO NOTHING are not counted.
+    """
+    written = 0
+    with timed('db_load', table=target.table), conn.cursor() as cursor:
+        cursor.execute(create_staging_stmt(target))
+        copied = copy_rows(cursor, target.columns, rows, chunk_rows)
+        if copied:
+            cursor.execute(merge_stmt(target))
+            written = cursor.rowcount
+            if target.latest:
+                # current readings reach the rollups only through the latest row
+                cursor.execute(f"SELECT DISTINCT city FROM {STAGING_TABLE}")
+                city_days = refresh_latest(cursor, [row[0] for row in cursor.fetchall()])
+            else:
+                cursor.execute(f"""
+                SELECT DISTINCT city, date_trunc('month', date)::date
+                FROM {STAGING_TABLE} WHERE date IS NOT NULL
+                """)
+                city_days = cursor.fetchall()
+            refresh_monthly_rollups(cursor, city_days)
+        cursor.execute(f"DROP TABLE {STAGING_TABLE}")
+    metrics.count_rows('db_load', copied, table=target.table)
+    return written
@@ -0,0 +1,506 @@
+import argparse
+import os
+import threading
+from datetime import date
+
+from dotenv import load_dotenv
+from utils.db_pool import get_connection
+from etl.load.rollups import create_rollup_table
+from etl.load.retention import create_daily_table, create_latest_table, rebuild_latest
+
+# versioned schema changes for the weather tables, applied in order and
+# recorded in student.de11_fehu_schema_migrations; never edit an applied
+# migration, add a new one instead
+MIGRATIONS_TABLE = "student.de11_fehu_schema_migrations"
+
+# arbitrary constant so concurrent migrators queue on one advisory lock
+MIGRATION_LOCK_ID = 7204511
+
+# months of weather_data partitions created ahead of today
+PARTITION_MONTHS_AHEAD = 3
+
+# channel the change triggers NOTIFY on, see etl/extract/change_listener.py
+CHANGE_CHANNEL = "weather_changes"
+
+create_tables = """
+CREATE TABLE IF NOT EXISTS student.de11_fehu_capstone (
+    id SERIAL PRIMARY KEY,
+    city VARCHAR(255),
+    region VARCHAR(255),
+    country VARCHAR(255),
+    latitude FLOAT,
+    longitude FLOAT,
+    timezone_id VARCHAR(100),
+    localtime_epoch BIGINT,
+    date DATE,
+    maxtemp_c FLOAT,
+    mintemp_c FLOAT,
+    avgtemp_c FLOAT,
+    totalprecip_mm FLOAT,
+    uv_index INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS student.weather_data (
+    id SERIAL PRIMARY KEY,
+    city VARCHAR(255),
+    region VARCHAR(255),
+    country VARCHAR(255),
+    latitude FLOAT,
+    longitude FLOAT,
+    timezone_id VARCHAR(100),
+    localtime_epoch BIGINT,
+    last_updated TIMESTAMP,
+    date DATE,
+    temp_c FLOAT,
+    wind_mph FLOAT,
+    precip_mm FLOAT,
+    humidity INTEGER,
+    feelslike_c FLOAT,
+    uv_index FLOAT
+);
+"""
+
+# lower-cased city stored alongside the name so lookups are plain index scans
+add_city_key = """
+ALTER TABLE student.de11_fehu_capstone
+    ADD COLUMN IF NOT EXISTS city_key TEXT GENERATED ALWAYS AS (LOWER(city)) STORED;
+
+ALTER TABLE student.weather_data
+    ADD COLUMN IF NOT EXISTS city_key TEXT GENERATED ALWAYS AS (LOWER(city)) STORED;
+"""
+
+# one row per city and day in the historic table, one per reading in the
+# current table; duplicates from earlier plain inserts keep the newest row
+add_keys_and_indexes = """
+DELETE FROM student.de11_fehu_capstone older
+USING student.de11_fehu_capstone newer
+WHERE older.city_key = newer.city_key
+  AND older.date = newer.date
+  AND older.id < newer.id;
+
+DROP INDEX IF EXISTS student.de11_fehu_capstone_city_date_key;
+
+CREATE UNIQUE INDEX IF NOT EXISTS de11_fehu_capstone_city_key_date_key
+ON student.de11_fehu_capstone (city_key, date);
+
+DELETE FROM student.weather_data older
+USING student.weather_data newer
+WHERE older.city_key = newer.city_key
+  AND older.date = newer.date
+  AND older.last_updated = newer.last_updated
+  AND older.id < newer.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS weather_data_city_key_date_last_updated_key
+ON student.weather_data (city_key, date, last_updated);
+"""
+
+# when each historic row was last written, so the local snapshot can fetch
+# only rows loaded since its high-water mark
+add_loaded_at = """
+ALTER TABLE student.de11_fehu_capstone
+    ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS de11_fehu_capstone_loaded_at_idx
+ON student.de11_fehu_capstone (loaded_at);
+"""
+
+# one NOTIFY per city touched by an INSERT or UPDATE statement, with the
+# table and the first and last day written; statement-level triggers keep
+# a COPY merge of thousands of rows to a handful of notifications, and
+# PostgreSQL only delivers them once the transaction commits
+create_notify_function = f"""
+CREATE OR REPLACE FUNCTION student.notify_weather_change() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    change RECORD;
+BEGIN
+    FOR change IN
+        SELECT city_key, MIN(date) AS first_date, MAX(date) AS last_date, COUNT(*) AS row_count
+        FROM changed_rows
+        WHERE city_key IS NOT NULL
+        GROUP BY city_key
+    LOOP
+        PERFORM pg_notify('{CHANGE_CHANNEL}', json_build_object(
+            'table', TG_TABLE_NAME, 'city', change.city_key, 'first_date', change.first_date,
+            'last_date', change.last_date, 'rows', change.row_count
+        )::text);
+    END LOOP;
+    RETURN NULL;
+END
+$$;
+"""
+
+# transition tables allow one event per trigger, and upserts that hit an
+# existing row only fire the UPDATE one
+notify_triggers_template = """
+DROP TRIGGER IF EXISTS {name}_notify_insert ON student.{name};
+CREATE TRIGGER {name}_notify_insert
+AFTER INSERT ON student.{name}
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION student.notify_weather_change();
+
+DROP TRIGGER IF EXISTS {name}_notify_update ON student.{name};
+CREATE TRIGGER {name}_notify_update
+AFTER UPDATE ON student.{name}
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION student.notify_weather_change();
+"""
+
+NOTIFY_TABLES = ('weather_data', 'de11_fehu_capstone')
+
+
+def _add_change_notifications(cursor):
+    cursor.execute(create_notify_function)
+    for name in NOTIFY_TABLES:
+        cursor.execute(notify_triggers_template.format(name=name))
+
+
+# weather_data rebuilt as a table range-partitioned by month; the default
+# partition catches rows beyond the partitions created ahead of time
+partition_weather_data = """
+ALTER TABLE student.weather_data RENAME TO weather_data_unpartitioned;
+ALTER INDEX student.weather_data_city_key_date_last_updated_key
+    RENAME TO weather_data_unpartitioned_key;
+
+CREATE TABLE student.weather_data (
+    id SERIAL,
+    city VARCHAR(255),
+    region VARCHAR(255),
+    country VARCHAR(255),
+    latitude FLOAT,
+    longitude FLOAT,
+    timezone_id VARCHAR(100),
+    localtime_epoch BIGINT,
+    last_updated TIMESTAMP,
+    date DATE NOT NULL,
+    temp_c FLOAT,
+    wind_mph FLOAT,
+    precip_mm FLOAT,
+    humidity INTEGER,
+    feelslike_c FLOAT,
+    uv_index FLOAT,
+    city_key TEXT GENERATED ALWAYS AS (LOWER(city)) STORED,
+    PRIMARY KEY (id, date)
+) PARTITION BY RANGE (date);
+
+CREATE UNIQUE INDEX weather_data_city_key_date_last_updated_key
+ON student.weather_data (city_key, date, last_updated);
+
+CREATE TABLE student.weather_data_default
+PARTITION OF student.weather_data DEFAULT;
+"""
+
+# stored columns of weather_data, city_key is generated
+PARTITION_COLUMNS = """
+    id, city, region, country, latitude, longitude, timezone_id, localtime_epoch,
+    last_updated, date, temp_c, wind_mph, precip_mm, humidity, feelslike_c, uv_index
+"""
+
+copy_into_partitions = f"""
+INSERT INTO student.weather_data ({PARTITION_COLUMNS})
+SELECT {PARTITION_COLUMNS}
+FROM student.weather_data_unpartitioned
+WHERE date IS NOT NULL;
+
+SELECT setval(pg_get_serial_sequence('student.weather_data', 'id'),
+              COALESCE((SELECT MAX(id) FROM student.weather_data), 0) + 1, false);
+
+DROP TABLE student.weather_data_unpartitioned;
+"""
+
+
+def _add_month(month_start, months=1):
+    month_index = month_start.month - 1 + months
+    return date(month_start.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+# a partition cannot be created while the default partition holds rows in
+# its range, so those rows are parked in a temporary table meanwhile
+hold_default_rows = f"""
+CREATE TEMP TABLE weather_data_moving AS
+SELECT {PARTITION_COLUMNS} FROM student.weather_data_default WITH NO DATA;
+
+WITH moved AS (
+    DELETE FROM student.weather_data_default
+    WHERE date >= %(start)s AND date < %(end)s
+    RETURNING {PARTITION_COLUMNS}
+)
+INSERT INTO weather_data_moving SELECT * FROM moved;
+"""
+
+restore_default_rows = f"""
+INSERT INTO student.weather_data ({PARTITION_COLUMNS})
+SELECT {PARTITION_COLUMNS} FROM weather_data_moving;
+
+DROP TABLE weather_data_moving;
+"""
+
+
+def _create_month_partition(cursor, month_start):
+    month_end = _add_month(month_start)
+    cursor.execute(hold_default_rows, {'start': month_start, 'end': month_end})
+    cursor.execute(f"""
+    CREATE TABLE student.weather_data_{month_start:%Y_%m}
+    PARTITION OF student.weather_data
+    FOR VALUES FROM ('{month_start:%Y-%m-%d}') TO ('{month_end:%Y-%m-%d}');
+    """)
+    cursor.execute(restore_default_rows)
+
+
+def ensure_month_partitions(cursor, first_month, last_month):
+    # create any missing monthly partitions of weather_data in the range,
+    # moving rows the default partition caught for those months into them
+    month_start = date(first_month.year, first_month.month, 1)
+    while month_start <= last_month:
+        cursor.execute("SELECT to_regclass(%s)", (f"student.weather_data_{month_start:%Y_%m}",))
+        if cursor.fetchone()[0] is None:
+            _create_month_partition(cursor, month_start)
+        month_start = _add_month(month_start)
+
+
+def extend_partitions(conn, today=None):
+    """Keep weather_data partitioned up to PARTITION_MONTHS_AHEAD months ahead.
+
+    Also creates the partitions of any earlier month whose rows fell into
+    the default partition, e.g. written by a process that outlived the
+    partitions made at its start. Safe to call on every ingest cycle.
+    """
+    today = today or date.today()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        cursor.execute("SELECT MIN(date) FROM student.weather_data_default")
+        stranded = cursor.fetchone()[0]
+        ensure_month_partitions(
+            cursor, min(stranded or today, today),
+            _add_month(date(today.year, today.month, 1), PARTITION_MONTHS_AHEAD)
+        )
+    conn.commit()
+
+
+def _partition(cursor):
+    cursor.execute("SELECT MIN(date), MAX(date) FROM student.weather_data")
+    first_day, last_day = cursor.fetchone()
+    cursor.execute(partition_weather_data)
+    today = date.today()
+    ensure_month_partitions(
+        cursor, min(first_day or today, today),
+        _add_month(date(today.year, today.month, 1), PARTITION_MONTHS_AHEAD)
+    )
+    cursor.execute(copy_into_partitions)
+    # the renamed table took its triggers with it
+    cursor.execute(notify_triggers_template.format(name='weather_data'))
+
+
+# the rollup rebuild as it stood when migration 4 was written; later
+# migrations change the rollup source, so this copy must stay as it is
+rebuild_rollup_v4 = """
+WITH targets AS (
+    SELECT city_key, date_trunc('month', date)::date AS month
+    FROM student.de11_fehu_capstone WHERE date IS NOT NULL
+    UNION
+    SELECT city_key, date_trunc('month', date)::date
+    FROM student.weather_data WHERE date IS NOT NULL
+),
+historic AS (
+    SELECT h.city_key, h.city, h.date, h.avgtemp_c, h.maxtemp_c, h.mintemp_c,
+           h.totalprecip_mm, h.uv_index::FLOAT AS uv_index
+    FROM student.de11_fehu_capstone h
+    JOIN targets t ON h.city_key = t.city_key
+     AND h.date >= t.month AND h.date < t.month + INTERVAL '1 month'
+),
+current_days AS (
+    SELECT DISTINCT ON (w.city_key, w.date)
+           w.city_key, w.city, w.date, w.temp_c AS avgtemp_c, w.temp_c AS maxtemp_c,
+           w.temp_c AS mintemp_c, w.precip_mm AS totalprecip_mm, w.uv_index
+    FROM student.weather_data w
+    JOIN targets t ON w.city_key = t.city_key
+     AND w.date >= t.month AND w.date < t.month + INTERVAL '1 month'
+    ORDER BY w.city_key, w.date, w.last_updated DESC
+),
+daily AS (
+    SELECT * FROM historic
+    UNION ALL
+    SELECT * FROM current_days c
+    WHERE NOT EXISTS (
+        SELECT 1 FROM historic h WHERE h.city_key = c.city_key AND h.date = c.date
+    )
+)
+INSERT INTO student.de11_fehu_monthly_rollup (
+    city_key, month, city, avgtemp_c, maxtemp_c, mintemp_c,
+    totalprecip_mm, max_uv_index, day_count, updated_at
+)
+SELECT city_key, date_trunc('month', date)::date, MAX(city),
+       AVG(avgtemp_c), MAX(maxtemp_c), MIN(mintemp_c),
+       SUM(totalprecip_mm), MAX(uv_index), COUNT(*), now()
+FROM daily
+GROUP BY 1, 2
+ON CONFLICT (city_key, month) DO UPDATE SET
+    city = EXCLUDED.city,
+    avgtemp_c = EXCLUDED.avgtemp_c,
+    maxtemp_c = EXCLUDED.maxtemp_c,
+    mintemp_c = EXCLUDED.mintemp_c,
+    totalprecip_mm = EXCLUDED.totalprecip_mm,
+    max_uv_index = EXCLUDED.max_uv_index,
+    day_count = EXCLUDED.day_count,
+    updated_at = EXCLUDED.updated_at;
+"""
+
+
+# the rollup rebuild as it stood when migration 7 was written: historic days
+# plus each city's latest reading, kept as it is for the same reason
+rebuild_rollup_v7 = """
+WITH targets AS (
+    SELECT city_key, date_trunc('month', date)::date AS month
+    FROM student.de11_fehu_capstone WHERE date IS NOT NULL
+    UNION
+    SELECT city_key, date_trunc('month', date)::date
+    FROM student.weather_data_latest WHERE date IS NOT NULL
+),
+historic AS (
+    SELECT h.city_key, h.city, h.date, h.avgtemp_c, h.maxtemp_c, h.mintemp_c,
+           h.totalprecip_mm, h.uv_index::FLOAT AS uv_index
+    FROM student.de11_fehu_capstone h
+    JOIN targets t ON h.city_key = t.city_key
+     AND h.date >= t.month AND h.date < t.month + INTERVAL '1 month'
+),
+latest AS (
+    SELECT l.city_key, l.city, l.date, l.temp_c AS avgtemp_c, l.temp_c AS maxtemp_c,
+           l.temp_c AS mintemp_c, l.precip_mm AS totalprecip_mm, l.uv_index
+    FROM student.weather_data_latest l
+    JOIN targets t ON l.city_key = t.city_key
+     AND l.date >= t.month AND l.date < t.month + INTERVAL '1 month'
+),
+daily AS (
+    SELECT * FROM historic
+    UNION ALL
+    SELECT * FROM latest l
+    WHERE NOT EXISTS (
+        SELECT 1 FROM historic h WHERE h.city_key = l.city_key AND h.date = l.date
+    )
+)
+INSERT INTO student.de11_fehu_monthly_rollup (
+    city_key, month, city, avgtemp_c, maxtemp_c, mintemp_c,
+    totalprecip_mm, max_uv_index, day_count, updated_at
+)
+SELECT city_key, date_trunc('month', date)::date, MAX(city),
+       AVG(avgtemp_c), MAX(maxtemp_c), MIN(mintemp_c),
+       SUM(totalprecip_mm), MAX(uv_index), COUNT(*), now()
+FROM daily
+GROUP BY 1, 2
+ON CONFLICT (city_key, month) DO UPDATE SET
+    city = EXCLUDED.city,
+    avgtemp_c = EXCLUDED.avgtemp_c,
+    maxtemp_c = EXCLUDED.maxtemp_c,
+    mintemp_c = EXCLUDED.mintemp_c,
+    totalprecip_mm = EXCLUDED.totalprecip_mm,
+    max_uv_index = EXCLUDED.max_uv_index,
+    day_count = EXCLUDED.day_count,
+    updated_at = EXCLUDED.updated_at;
+"""
+
+
+def _add_monthly_rollup(cursor):
+    cursor.execute(create_rollup_table)
+    cursor.execute(rebuild_rollup_v4)
+
+
+def _add_latest_and_daily_tables(cursor):
+    cursor.execute(create_latest_table)
+    cursor.execute(create_daily_table)
+    rebuild_latest(cursor)
+    # the rollups now read the latest reading, recompute them from it
+    cursor.execute(rebuild_rollup_v7)
+
+
+# (version, name, sql or callable taking a cursor)
+MIGRATIONS = [
+    (1, 'create weather tables', create_tables),
+    (2, 'add normalised city key', add_city_key),
+    (3, 'add unique keys and city/date indexes', add_keys_and_indexes),
+    (4, 'add monthly rollup table', _add_monthly_rollup),
+    (5, 'add historic loaded_at high-water column', add_loaded_at),
+    (6, 'notify on weather changes', _add_change_notifications),
+    (7, 'add latest reading and daily summary tables', _add_latest_and_daily_tables),
+]
+
+# applied only when partitioning is switched on, after the core migrations
+PARTITION_MIGRATION = (100, 'partition weather_data by month', _partition)
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def partitioning_enabled():
+    return os.getenv('WEATHER_DATA_PARTITIONED', 'false').lower() in ('1', 'true', 'yes')
+
+
+def applied_versions(cursor):
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+        version INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    );
+    """)
+    cursor.execute(f"SELECT version FROM {MIGRATIONS_TABLE}")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn, partition=None):
+    if partition is None:
+        partition = partitioning_enabled()
+    migrations = MIGRATIONS + ([PARTITION_MIGRATION] if partition else [])
+
+    applied = []
+    with conn.cursor() as cursor:
+        # each migration commits on its own, the lock is held per transaction
+        for version, name, migration in migrations:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            if version in applied_versions(cursor):
+                conn.commit()
+                continue
+            if callable(migration):
+                migration(cursor)
+            else:
+                cursor.execute(migration)
+            cursor.execute(
+                f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (%s, %s)",
+                (version, name)
+            )
+            conn.commit()
+            applied.append(version)
+            print(f"Applied migration {version}: {name}")
+
+    if partition:
+        extend_partitions(conn)
+    return applied
+
+
+def ensure_schema(conn):
+    # run pending migrations once per process
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if not _schema_ready:
+            migrate(conn)
+            _schema_ready = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply weather schema migrations.")
+    parser.add_argument(
+        '--partition-weather-data', action='store_true', default=None,
+        help="also range-partition student.weather_data by month "
+             "(default: WEATHER_DATA_PARTITIONED)"
+    )
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    with get_connection() as conn:
+        applied = migrate(conn, partition=args.partition_weather_data)
+    print(f"Schema up to date ({len(applied)} migration(s) applied).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import os
+from datetime import date, timedelta
+
+from dotenv import load_dotenv
+from utils.db_pool import get_connection
+from utils.metrics import metrics, timed
+
+# raw hourly readings in student.weather_data are kept this many days;
+# older days are rolled into student.weather_data_daily by compact()
+DEFAULT_RETENTION_DAYS = 30
+
+# days of raw rows compacted per transaction
+DEFAULT_BATCH_DAYS = 31
+
+WEATHER_DATA_COLUMNS = ('city', 'region', 'country', 'latitude', 'longitude', 'timezone_id', 'localtime_epoch',
+                        'last_updated', 'date', 'temp_c', 'wind_mph', 'precip_mm', 'humidity', 'feelslike_c',
+                        'uv_index')
+
+# the newest reading of each city, upserted by every current-conditions
+# load so the dashboard's latest lookup is a primary key read
+create_latest_table = """
+CREATE TABLE IF NOT EXISTS student.weather_data_latest (
+    city_key TEXT PRIMARY KEY,
+    city VARCHAR(255),
+    region VARCHAR(255),
+    country VARCHAR(255),
+    latitude FLOAT,
+    longitude FLOAT,
+    timezone_id VARCHAR(100),
+    localtime_epoch BIGINT,
+    last_updated TIMESTAMP,
+    date DATE,
+    temp_c FLOAT,
+    wind_mph FLOAT,
+    precip_mm FLOAT,
+    humidity INTEGER,
+    feelslike_c FLOAT,
+    uv_index FLOAT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+"""
+
+# one row per city and day of compacted hourly readings; temp_c, precip_mm
+# and uv_index are the day's last reading
+create_daily_table = """
+CREATE TABLE IF NOT EXISTS student.weather_data_daily (
+    city_key TEXT NOT NULL,
+    date DATE NOT NULL,
+    city VARCHAR(255),
+    readings INTEGER NOT NULL,
+    first_updated TIMESTAMP,
+    last_updated TIMESTAMP,
+    temp_c FLOAT,
+    precip_mm FLOAT,
+    uv_index FLOAT,
+    avg_temp_c FLOAT,
+    max_temp_c FLOAT,
+    min_temp_c FLOAT,
+    max_precip_mm FLOAT,
+    avg_humidity FLOAT,
+    PRIMARY KEY (city_key, date)
+);
+"""
+
+_columns = ', '.join(WEATHER_DATA_COLUMNS)
+
+# one index probe per city on (city_key, date, last_updated), however many
+# readings the city has piled up; an older reading never replaces a newer one.
+# Returns the day of each replaced latest row and of its replacement
+refresh_latest_stmt = f"""
+WITH previous AS (
+    SELECT city_key, date
+    FROM student.weather_data_latest
+    WHERE city_key = ANY(%(city_keys)s::TEXT[])
+),
+refreshed AS (
+INSERT INTO student.weather_data_latest AS latest (city_key, {_columns}, updated_at)
+SELECT k.city_key, {', '.join('w.' + c for c in WEATHER_DATA_COLUMNS)}, now()
+FROM unnest(%(city_keys)s::TEXT[]) AS k(city_key)
+CROSS JOIN LATERAL (
+    SELECT {_columns}
+    FROM student.weather_data
+    WHERE city_key = k.city_key
+    ORDER BY date DESC, last_updated DESC
+    LIMIT 1
+) w
+ON CONFLICT (city_key) DO UPDATE SET
+    {', '.join(f'{c} = EXCLUDED.{c}' for c in WEATHER_DATA_COLUMNS)},
+    updated_at = EXCLUDED.updated_at
+WHERE (EXCLUDED.date, EXCLUDED.last_updated) >= (latest.date, latest.last_updated)
+   OR latest.last_updated IS NULL
+RETURNING latest.city_key, latest.date
+)
+SELECT city_key, date FROM refreshed
+UNION
+SELECT p.city_key, p.date FROM previous p JOIN refreshed r USING (city_key)
+"""
+
+rebuild_latest_stmt = f"""
+INSERT INTO student.weather_data_latest (city_key, {_columns})
+SELECT DISTINCT ON (city_key) city_key, {_columns}
+FROM student.weather_data
+WHERE date IS NOT NULL
+ORDER BY city_key, date DESC, last_updated DESC
+ON CONFLICT (city_key) DO UPDATE SET
+    {', '.join(f'{c} = EXCLUDED.{c}' for c in WEATHER_DATA_COLUMNS)},
+    updated_at = now()
+"""
+
+# moves the raw readings of [start, end) into daily summaries in one
+# statement, returning the readings and days moved; a day already compacted
+# (a late reading) is merged into its summary, averages weighted by the
+# readings behind them
+compact_stmt = """
+WITH moved AS (
+    DELETE FROM student.weather_data
+    WHERE date >= %(start)s AND date < %(end)s
+    RETURNING city_key, city, date, last_updated, temp_c, precip_mm, humidity, uv_index
+),
+summarised AS (
+    INSERT INTO student.weather_data_daily AS daily (
+        city_key, date, city, readings, first_updated, last_updated, temp_c, precip_mm, uv_index,
+        avg_temp_c, max_temp_c, min_temp_c, max_precip_mm, avg_humidity
+    )
+    SELECT city_key, date, MAX(city), COUNT(*), MIN(last_updated), MAX(last_updated),
+           (ARRAY_AGG(temp_c ORDER BY last_updated DESC))[1],
+           (ARRAY_AGG(precip_mm ORDER BY last_updated DESC))[1],
+           (ARRAY_AGG(uv_index ORDER BY last_updated DESC))[1],
+           AVG(temp_c), MAX(temp_c), MIN(temp_c), MAX(precip_mm), AVG(humidity)
+    FROM moved
+    GROUP BY city_key, date
+    ON CONFLICT (city_key, date) DO UPDATE SET
+        readings = daily.readings + EXCLUDED.readings,
+        first_updated = LEAST(daily.first_updated, EXCLUDED.first_updated),
+        last_updated = GREATEST(daily.last_updated, EXCLUDED.last_updated),
+        temp_c = CASE WHEN EXCLUDED.last_updated >= daily.last_updated THEN EXCLUDED.temp_c ELSE daily.temp_c END,
+        precip_mm = CASE WHEN EXCLUDED.last_updated >= daily.last_updated THEN EXCLUDED.precip_mm ELSE daily.precip_mm END,
+        uv_index = CASE WHEN EXCLUDED.last_updated >= daily.last_updated THEN EXCLUDED.uv_index ELSE daily.uv_index END,
+        avg_temp_c = (daily.avg_temp_c * daily.readings + EXCLUDED.avg_temp_c * EXCLUDED.readings)
+                     / (daily.readings + EXCLUDED.readings),
+        max_temp_c = GREATEST(daily.max_temp_c, EXCLUDED.max_temp_c),
+        min_temp_c = LEAST(daily.min_temp_c, EXCLUDED.min_temp_c),
+        max_precip_mm = GREATEST(daily.max_precip_mm, EXCLUDED.max_precip_mm),
+        avg_humidity = (daily.avg_humidity * daily.readings + EXCLUDED.avg_humidity * EXCLUDED.readings)
+                       / (daily.readings + EXCLUDED.readings)
+    RETURNING 1
+)
+SELECT (SELECT COUNT(*) FROM moved), (SELECT COUNT(*) FROM summarised)
+"""
+
+
+def retention_days():
+    value = os.getenv('WEATHER_DATA_RETENTION_DAYS')
+    return int(value) if value not in (None, '') else DEFAULT_RETENTION_DAYS
+
+
+def refresh_latest(cursor, cities):
+    # cities: names written by a load; runs in the caller's transaction so
+    # the latest row commits together with the readings. Returns the
+    # (city_key, day) pairs whose monthly rollup the change affects
+    city_keys = sorted({city.strip().lower() for city in cities if city})
+    if not city_keys:
+        return []
+    cursor.execute(refresh_latest_stmt, {'city_keys': city_keys})
+    return cursor.fetchall()
+
+
+def rebuild_latest(cursor):
+    cursor.execute(rebuild_latest_stmt)
+
+
+def compact(conn, retention=None, batch_days=DEFAULT_BATCH_DAYS, today=None):
+    """Roll raw readings older than `retention` days into daily summaries.
+
+    Works forward from the oldest raw day in batches of `batch_days`, one
+    transaction each, so an interrupted run leaves whole batches done and
+    can simply be repeated. The latest table and the monthly rollups are
+    unaffected: pruning never touches the latest rows, and the rollups
+    only read historic days and the latest rows. Returns the number of raw
+    rows removed.
+    """
+    retention = retention_days() if retention is None else retention
+    if retention < 1:
+        raise ValueError(f"Retention must be at least one day, got {retention}")
+    cutoff = (today or date.today()) - timedelta(days=retention)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT MIN(date) FROM student.weather_data")
+        start = cursor.fetchone()[0]
+    conn.commit()
+
+    removed = 0
+    while start is not None and start < cutoff:
+        end = min(start + timedelta(days=batch_days), cutoff)
+        with timed('compact', table='student.weather_data'), conn.cursor() as cursor:
+            cursor.execute(compact_stmt, {'start': start, 'end': end})
+            removed += cursor.fetchone()[0]
+        conn.commit()
+        start = end
+    metrics.count_rows('compact', removed, table='student.weather_data')
+    return removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compact old hourly readings into daily summaries and prune them."
+    )
+    parser.add_argument('--retention-days', type=int,
+                        help=f"raw days to keep (default: WEATHER_DATA_RETENTION_DAYS or {DEFAULT_RETENTION_DAYS})")
+    parser.add_argument('--batch-days', type=int, default=DEFAULT_BATCH_DAYS,
+                        help="days compacted per transaction")
+    parser.add_argument('--rebuild-latest', action='store_true',
+                        help="also recompute every city's latest reading from the raw rows")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    # imported here, migrations imports this module for its tables
+    from etl.load.migrations import ensure_schema
+    with get_connection() as conn:
+        ensure_schema(conn)
+        if args.rebuild_latest:
+            with conn.cursor() as cursor:
+                rebuild_latest(cursor)
+            conn.commit()
+        removed = compact(conn, args.retention_days, args.batch_days)
+    metrics.write_textfile()
+    print(f"Compacted {removed} raw reading(s) into daily summaries.")
+
+
+if __name__ == "__main__":
+    main()
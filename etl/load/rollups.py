@@ -0,0 +1,132 @@
+import argparse
+from datetime import date
+
+from dotenv import load_dotenv
+from utils.db_pool import get_connection
+
+# per city and calendar month aggregates, kept up to date by the loaders so
+# the dashboard reads a handful of monthly rows instead of every daily row
+create_rollup_table = """
+CREATE TABLE IF NOT EXISTS student.de11_fehu_monthly_rollup (
+    city_key TEXT NOT NULL,
+    month DATE NOT NULL,
+    city VARCHAR(255),
+    avgtemp_c FLOAT,
+    maxtemp_c FLOAT,
+    mintemp_c FLOAT,
+    totalprecip_mm FLOAT,
+    max_uv_index FLOAT,
+    day_count INTEGER NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (city_key, month)
+);
+"""
+
+# daily rows feeding the rollup, the same days as the dashboard's series
+# (series_query in etl/extract/weather_repository.py): every historic day,
+# plus the city's latest current reading when its day is not covered yet
+daily_source = """
+historic AS (
+    SELECT h.city_key, h.city, h.date, h.avgtemp_c, h.maxtemp_c, h.mintemp_c,
+           h.totalprecip_mm, h.uv_index::FLOAT AS uv_index
+    FROM student.de11_fehu_capstone h
+    JOIN targets t ON h.city_key = t.city_key
+     AND h.date >= t.month AND h.date < t.month + INTERVAL '1 month'
+),
+latest AS (
+    SELECT l.city_key, l.city, l.date, l.temp_c AS avgtemp_c, l.temp_c AS maxtemp_c,
+           l.temp_c AS mintemp_c, l.precip_mm AS totalprecip_mm, l.uv_index
+    FROM student.weather_data_latest l
+    JOIN targets t ON l.city_key = t.city_key
+     AND l.date >= t.month AND l.date < t.month + INTERVAL '1 month'
+),
+daily AS (
+    SELECT * FROM historic
+    UNION ALL
+    SELECT * FROM latest l
+    WHERE NOT EXISTS (
+        SELECT 1 FROM historic h WHERE h.city_key = l.city_key AND h.date = l.date
+    )
+)
+"""
+
+upsert_rollup = """
+INSERT INTO student.de11_fehu_monthly_rollup (
+    city_key, month, city, avgtemp_c, maxtemp_c, mintemp_c,
+    totalprecip_mm, max_uv_index, day_count, updated_at
+)
+SELECT city_key, date_trunc('month', date)::date, MAX(city),
+       AVG(avgtemp_c), MAX(maxtemp_c), MIN(mintemp_c),
+       SUM(totalprecip_mm), MAX(uv_index), COUNT(*), now()
+FROM daily
+GROUP BY 1, 2
+ON CONFLICT (city_key, month) DO UPDATE SET
+    city = EXCLUDED.city,
+    avgtemp_c = EXCLUDED.avgtemp_c,
+    maxtemp_c = EXCLUDED.maxtemp_c,
+    mintemp_c = EXCLUDED.mintemp_c,
+    totalprecip_mm = EXCLUDED.totalprecip_mm,
+    max_uv_index = EXCLUDED.max_uv_index,
+    day_count = EXCLUDED.day_count,
+    updated_at = EXCLUDED.updated_at;
+"""
+
+# recompute only the (city, month) groups that received new rows
+refresh_stmt = """
+WITH targets AS (
+    SELECT DISTINCT city_key, month
+    FROM unnest(%(city_keys)s::TEXT[], %(months)s::DATE[]) AS t(city_key, month)
+),
+""" + daily_source + upsert_rollup
+
+# every (city, month) present in either source table
+rebuild_stmt = """
+WITH targets AS (
+    SELECT city_key, date_trunc('month', date)::date AS month
+    FROM student.de11_fehu_capstone WHERE date IS NOT NULL
+    UNION
+    SELECT city_key, date_trunc('month', date)::date
+    FROM student.weather_data_latest WHERE date IS NOT NULL
+),
+""" + daily_source + upsert_rollup
+
+
+def month_start(day):
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return date(day.year, day.month, 1)
+
+
+def refresh_monthly_rollups(cursor, city_days):
+    # city_days: iterable of (city, day) pairs touched by a load, for current
+    # readings the days refresh_latest() returns; runs in the caller's
+    # transaction so the rollup commits together with the rows
+    targets = {(city.strip().lower(), month_start(day)) for city, day in city_days}
+    if not targets:
+        return 0
+    city_keys, months = zip(*sorted(targets))
+    cursor.execute(refresh_stmt, {'city_keys': list(city_keys), 'months': list(months)})
+    return len(targets)
+
+
+def rebuild_monthly_rollups(cursor):
+    cursor.execute(rebuild_stmt)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the monthly weather rollups.")
+    parser.parse_args(argv)
+
+    load_dotenv()
+    # imported here, migrations imports this module for its rollup migration
+    from etl.load.migrations import ensure_schema
+    with get_connection() as conn:
+        ensure_schema(conn)
+        with conn.cursor() as cursor:
+            rebuild_monthly_rollups(cursor)
+        conn.commit()
+    print("Monthly rollups rebuilt.")
+
+
+if __name__ == "__main__":
+    main()
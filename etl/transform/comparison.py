@@ -0,0 +1,59 @@
+# a day counts as rainy from this much precipitation
+RAINY_DAY_MM = 1.0
+
+
+def city_stats(daily):
+    """Headline figures of each city in a long daily frame.
+
+    `daily` has one row per (city, day) with the WEATHER_COLUMNS, as
+    returned by get_weather_data_for_cities(). Everything comes from one
+    grouped aggregation, whatever the number of cities.
+    """
+    flagged = daily.assign(rainy=daily['totalprecip_mm'] >= RAINY_DAY_MM,
+                           frost=daily['mintemp_c'] < 0)
+    stats = flagged.groupby('city', observed=True, sort=False).agg(
+        days=('date', 'count'),
+        first_day=('date', 'min'),
+        last_day=('date', 'max'),
+        mean_temp_c=('avgtemp_c', 'mean'),
+        max_temp_c=('maxtemp_c', 'max'),
+        min_temp_c=('mintemp_c', 'min'),
+        total_precip_mm=('totalprecip_mm', 'sum'),
+        mean_precip_mm=('totalprecip_mm', 'mean'),
+        rainy_days=('rainy', 'sum'),
+        frost_days=('frost', 'sum'),
+        mean_uv_index=('uv_index', 'mean'),
+    )
+    stats['rainy_share'] = stats['rainy_days'] / stats['days']
+    return stats.reset_index().round(2)
+
+
+def monthly_by_city(daily):
+    # one row per (city, calendar month), like transform_to_monthly_data for every city at once
+    month_start = daily['date'].dt.to_period('M').dt.to_timestamp()
+    monthly = daily.groupby([daily['city'], month_start.rename('month_start')], observed=True).agg(
+        avgtemp_c=('avgtemp_c', 'mean'),
+        maxtemp_c=('maxtemp_c', 'max'),
+        mintemp_c=('mintemp_c', 'min'),
+        totalprecip_mm=('totalprecip_mm', 'sum'),
+        days=('date', 'count'),
+    )
+    return monthly.reset_index()
+
+
+def typical_year_by_city(monthly):
+    """Each city's average month over every year in `monthly`.
+
+    Takes the output of monthly_by_city(), so cities stored over different
+    periods can still be compared month by month. Partly stored months have
+    their rainfall scaled up to the whole month.
+    """
+    month = monthly['month_start'].dt.month.rename('month')
+    scaled = monthly.assign(totalprecip_mm=monthly['totalprecip_mm'] / monthly['days']
+                            * monthly['month_start'].dt.days_in_month)
+    typical = scaled.groupby([scaled['city'], month], observed=True).agg(
+        avgtemp_c=('avgtemp_c', 'mean'),
+        totalprecip_mm=('totalprecip_mm', 'mean'),
+        years=('month_start', 'count'),
+    )
+    return typical.reset_index()
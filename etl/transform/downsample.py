@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# roughly one point per horizontal pixel of a full-width chart in the wide layout
+DEFAULT_MAX_POINTS = 1200
+
+# above this many points a trace is drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 1000
+
+CHART_MAX_POINTS = int(os.getenv('CHART_MAX_POINTS') or DEFAULT_MAX_POINTS)
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points of (x, y).
+
+    The first and last points are always kept. Every other bucket keeps the
+    point forming the largest triangle with the point kept before it and
+    the mean of the next bucket, which preserves peaks and the line's shape.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    # threshold - 2 buckets over the points between the first and the last
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    counts = np.diff(edges)
+    # mean of each bucket, followed by the last point as the final "next bucket"
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        ax, ay = x[previous], y[previous]
+        cx, cy = mean_x[bucket + 1], mean_y[bucket + 1]
+        area = np.abs((ax - cx) * (y[start:end] - ay) - (ax - x[start:end]) * (cy - ay))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y, buckets):
+    """Indices of each bucket's lowest and highest value, plus both ends.
+
+    Cheaper than LTTB and keeps every spike, which suits bar charts of
+    daily totals. At most 2 * buckets + 2 indices are returned, in order.
+    """
+    n = len(y)
+    if 2 * buckets + 2 >= n or buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    bucket_ids = np.arange(n) * buckets // n
+    # sorted by bucket then value: each bucket's first entry is its min, last its max
+    order = np.lexsort((y, bucket_ids))
+    starts = np.searchsorted(bucket_ids[order], np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate([[0, n - 1], order[starts], order[ends]]))
+
+
+def _selection_values(series):
+    # gaps are interpolated for choosing points only, the plotted values keep them
+    values = series.astype(float)
+    return values.interpolate(limit_direction='both').fillna(0).to_numpy()
+
+
+def downsample(df, x, columns, max_points=None, method='lttb'):
+    """Rows of `df` (sorted by `x`) to plot `columns` with about `max_points` points each.
+
+    Rows are picked per column and combined, so wide-form px.line/px.bar
+    calls work unchanged; correlated columns such as min/avg/max mostly pick
+    the same days. Frames already small enough are returned as they are.
+    """
+    max_points = max_points or CHART_MAX_POINTS
+    if len(df) <= max_points or df.empty:
+        return df
+    x_values = df[x]
+    if pd.api.types.is_datetime64_any_dtype(x_values):
+        x_values = x_values.astype('int64')
+    x_values = x_values.to_numpy(dtype=float)
+
+    per_column = max(3, max_points)
+    picked = []
+    for column in columns:
+        y_values = _selection_values(df[column])
+        if method == 'minmax':
+            picked.append(minmax_indices(y_values, per_column // 2 - 1))
+        else:
+            picked.append(lttb_indices(x_values, y_values, per_column))
+    return df.iloc[np.unique(np.concatenate(picked))]
+
+
+def render_mode(points):
+    # plotly express render_mode for a trace of this many points
+    return 'webgl' if points > WEBGL_THRESHOLD else 'svg'
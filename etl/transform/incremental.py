@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from etl.extract.query_cache import normalise_city
+from utils.metrics import timed
+
+# rebuild a city's state from the full history at least this often, so days
+# backfilled into the past by another process are picked up
+DEFAULT_FULL_REFRESH_SECONDS = 3600
+
+MONTHLY_COLUMNS = ['month', 'avgtemp_c', 'maxtemp_c', 'mintemp_c', 'totalprecip_mm']
+
+
+class CityTransformState:
+    """Transformed daily series and monthly aggregates of one city.
+
+    Produces the same frames as fill_missing_dates, add_extreme_flags,
+    add_cumulative_precipitation and transform_to_monthly_data in app2, but
+    keeps the running precipitation total, the temperature extremes and the
+    per-month partial aggregates between refreshes, so apply() only works
+    through the rows it is given. The last day is held apart as the tail:
+    later readings of the same day replace it instead of being added twice,
+    and it is only settled once rows past it show that it stays.
+    """
+
+    def __init__(self):
+        self.segments = []          # settled, transformed daily frames
+        self.tail = None            # one-row frame for the last day
+        self.last_settled = None    # last date covered by segments
+        self.precip_total = 0.0     # precipitation summed over segments
+        self.max_temp = np.nan
+        self.min_temp = np.nan
+        self.months = {}            # month -> [avg sum, avg count, max, min, precip]
+        self.built_at = time.monotonic()
+        self.version = None         # cache version the state was last brought up to date at
+        self._frames = None
+
+    @property
+    def last_date(self):
+        if self.tail is not None:
+            return self.tail['date'].iloc[0]
+        return self.last_settled
+
+    def apply(self, rows):
+        # rows: daily series rows dated on or after last_date; returns False
+        # when they reach further back and the state needs a full rebuild
+        rows = rows.dropna(subset=['date']).sort_values('date')
+        if rows.empty:
+            return True
+        first = rows['date'].iloc[0]
+        last_date = self.last_date
+        if last_date is not None and first < last_date:
+            return False
+
+        # a newer reading of the tail day replaces it. Rows starting after it
+        # mean the day has left the series (a latest reading that historic
+        # rows never covered), so it is dropped and filled like any gap
+        self.tail = None
+
+        # fill missing days between the settled rows and the new ones
+        start = first if self.last_settled is None else self.last_settled + timedelta(days=1)
+        all_dates = pd.date_range(start=start, end=rows['date'].iloc[-1])
+        filled = rows.set_index('date').reindex(all_dates).reset_index()
+        filled.rename(columns={'index': 'date'}, inplace=True)
+        filled['month'] = filled['date'].dt.to_period('M').astype(str)
+
+        if len(filled) > 1:
+            self._settle(filled.iloc[:-1])
+        self.tail = filled.iloc[-1:].reset_index(drop=True)
+        self._frames = None
+        return True
+
+    def _settle(self, rows):
+        # fold rows into the running totals, extremes and monthly aggregates
+        rows = rows.copy()
+        rows['cumulative_precip_mm'] = self.precip_total + rows['totalprecip_mm'].cumsum()
+        self.precip_total += rows['totalprecip_mm'].sum()
+        self.max_temp = np.fmax(self.max_temp, rows['maxtemp_c'].max())
+        self.min_temp = np.fmin(self.min_temp, rows['mintemp_c'].min())
+        self._add_months(rows)
+        self.segments.append(rows)
+        self.last_settled = rows['date'].iloc[-1]
+
+    def _add_months(self, rows, months=None):
+        months = self.months if months is None else months
+        grouped = rows.groupby('month').agg(
+            avg_sum=('avgtemp_c', 'sum'), avg_count=('avgtemp_c', 'count'),
+            maxtemp_c=('maxtemp_c', 'max'), mintemp_c=('mintemp_c', 'min'),
+            totalprecip_mm=('totalprecip_mm', 'sum'),
+        )
+        for month, avg_sum, avg_count, high, low, precip in grouped.itertuples():
+            current = months.get(month, [0.0, 0, np.nan, np.nan, 0.0])
+            months[month] = [current[0] + avg_sum, current[1] + avg_count,
+                             np.fmax(current[2], high), np.fmin(current[3], low),
+                             current[4] + precip]
+        return months
+
+    def frames(self):
+        # (daily, monthly) frames, rebuilt only after apply() changed the state
+        if self._frames is None:
+            tail = self.tail.copy()
+            tail['cumulative_precip_mm'] = self.precip_total + tail['totalprecip_mm'].cumsum()
+            max_temp = np.fmax(self.max_temp, tail['maxtemp_c'].max())
+            min_temp = np.fmin(self.min_temp, tail['mintemp_c'].min())
+
+            # compact the settled segments so later reads concat two frames
+            if len(self.segments) > 1:
+                self.segments = [pd.concat(self.segments, ignore_index=True)]
+            daily = pd.concat(self.segments + [tail], ignore_index=True)
+            daily.insert(len(daily.columns) - 2, 'is_highest_temp', daily['maxtemp_c'] == max_temp)
+            daily.insert(len(daily.columns) - 2, 'is_lowest_temp', daily['mintemp_c'] == min_temp)
+            # month goes last, where transform_to_monthly_data adds it
+            daily['month'] = daily.pop('month')
+
+            months = self._add_months(tail, {m: list(v) for m, v in self.months.items()})
+            monthly = pd.DataFrame(
+                [(month, avg_sum / avg_count if avg_count else np.nan, high, low, precip)
+                 for month, (avg_sum, avg_count, high, low, precip) in sorted(months.items())],
+                columns=MONTHLY_COLUMNS,
+            )
+            self._frames = (daily, monthly)
+        return self._frames
+
+
+class TransformStates:
+    """Per-city CityTransformState objects shared by every app session."""
+
+    def __init__(self, full_refresh_seconds=DEFAULT_FULL_REFRESH_SECONDS):
+        self.full_refresh_seconds = full_refresh_seconds
+        self._states = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._stats = {'full_builds': 0, 'incremental_updates': 0, 'rows_applied': 0,
+                       'unchanged_refreshes': 0}
+
+    def _city_lock(self, city_key):
+        with self._lock:
+            return self._locks.setdefault(city_key, threading.Lock())
+
+    def refresh(self, city, load_all, load_since, version=None):
+        # load_all(city) returns the whole daily series, load_since(city, day)
+        # the rows from that day on; returns copies of the (daily, monthly) frames.
+        # `version` is the city's QueryCache.version() when changes are pushed
+        # by the change listener: a state already at that version is served
+        # without querying. Without it the days since the last one are always fetched.
+        city_key = normalise_city(city)
+        with self._city_lock(city_key):
+            state = self._states.get(city_key)
+            if state is not None and time.monotonic() - state.built_at > self.full_refresh_seconds:
+                state = None
+
+            applied = False
+            if state is not None and version is not None and state.version == version:
+                applied = True
+                with self._lock:
+                    self._stats['unchanged_refreshes'] += 1
+            elif state is not None:
+                rows = load_since(city, state.last_date.date())
+                with timed('transform', step='apply_incremental'):
+                    applied = state.apply(rows)
+                if applied:
+                    with self._lock:
+                        self._stats['incremental_updates'] += 1
+                        self._stats['rows_applied'] += len(rows)
+
+            if not applied:
+                rows = load_all(city)
+                if rows.dropna(subset=['date']).empty:
+                    self.invalidate(city_key)
+                    return rows, pd.DataFrame(columns=MONTHLY_COLUMNS)
+                state = CityTransformState()
+                with timed('transform', step='apply_full'):
+                    state.apply(rows)
+                with self._lock:
+                    self._states[city_key] = state
+                    self._stats['full_builds'] += 1
+                    self._stats['rows_applied'] += len(rows)
+            state.version = version
+
+            with timed('transform', step='frames'):
+                daily, monthly = state.frames()
+        return daily.copy(), monthly.copy()
+
+    def invalidate(self, city=None):
+        with self._lock:
+            if city is None:
+                self._states.clear()
+            else:
+                self._states.pop(normalise_city(city), None)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cities'] = len(self._states)
+        return stats
+
+
+transform_states = TransformStates(
+    full_refresh_seconds=int(os.getenv('TRANSFORM_FULL_REFRESH_SECONDS') or DEFAULT_FULL_REFRESH_SECONDS)
+)
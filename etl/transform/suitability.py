@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from etl.extract.vegtables import get_crop_registry
+
+# share of the suitability score from temperature vs precipitation
+TEMPERATURE_WEIGHT = 0.7
+PRECIPITATION_WEIGHT = 0.3
+
+
+def _crop_bands(registry):
+    # (crops, 12) month-indexed bands stacked from the registry arrays
+    crops = list(registry)
+    mintemp = np.vstack([registry[c].mintemp_c for c in crops])
+    maxtemp = np.vstack([registry[c].maxtemp_c for c in crops])
+    precip = np.vstack([registry[c].precip_mm for c in crops])
+    return crops, mintemp, maxtemp, precip
+
+
+def temperature_scores(day_min, day_max, month_idx, band_min, band_max):
+    """Share of each day's temperature range inside each crop's band.
+
+    Day arrays have shape (days,), bands (crops, 12); the result is
+    (crops, days). Days with no spread (a single current reading) score 1
+    inside the band and 0 outside. Missing values give NaN.
+    """
+    low = band_min[:, month_idx]
+    high = band_max[:, month_idx]
+    overlap = np.minimum(day_max, high) - np.maximum(day_min, low)
+    spread = day_max - day_min
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ranged = np.clip(overlap, 0, None) / spread
+    point = ((day_min >= low) & (day_max <= high)).astype(float)
+    scores = np.where(spread > 0, ranged, point)
+    scores[np.isnan(overlap) | np.isnan(spread)] = np.nan
+    return np.clip(scores, 0, 1)
+
+
+def precipitation_scores(totals, observed_days, days_in_month, month_idx, band_precip):
+    """Closeness of each month's rainfall to each crop's monthly need.
+
+    Inputs are per observed (city, month) group; partial months are
+    compared against the need scaled to the days observed. Returns
+    (crops, groups) holding the smaller of rainfall and need divided by
+    the larger, so 1 is an exact match and 0.5 is half or double the need.
+    """
+    need = band_precip[:, month_idx] * (observed_days / days_in_month)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = np.minimum(totals, need) / np.maximum(totals, need)
+    return np.where((totals == 0) & (need == 0), 1.0, scores)
+
+
+def _grouped_mean(values, groups, n_groups, weights=None):
+    # mean of each row of `values` (rows, items) per group id, skipping NaN
+    rows = values.shape[0]
+    valid = ~np.isnan(values)
+    w = valid * (1.0 if weights is None else weights)
+    flat = (np.arange(rows)[:, None] * n_groups + groups[None, :]).ravel()
+    sums = np.bincount(flat, weights=(np.where(valid, values, 0) * w).ravel(), minlength=rows * n_groups)
+    counts = np.bincount(flat, weights=w.ravel(), minlength=rows * n_groups)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (sums / counts).reshape(rows, n_groups)
+
+
+def score_crop_suitability(daily, registry=None):
+    """Score and rank every city in `daily` against every crop.
+
+    `daily` needs city, date, mintemp_c, maxtemp_c and totalprecip_mm
+    columns, one row per city and day. Returns one row per (city, crop)
+    with the temperature, precipitation and combined scores (0-1) and the
+    crop's rank within its city.
+    """
+    registry = registry or get_crop_registry()
+    crops, band_min, band_max, band_precip = _crop_bands(registry)
+
+    daily = daily.dropna(subset=['date'])
+    city_codes, cities = pd.factorize(daily['city'].str.strip().str.lower())
+    dates = pd.to_datetime(daily['date'])
+    month_idx = dates.dt.month.to_numpy() - 1
+    day_min = daily['mintemp_c'].to_numpy(dtype=float)
+    day_max = daily['maxtemp_c'].to_numpy(dtype=float)
+
+    # every day of every city against every crop in one broadcast
+    temp = temperature_scores(day_min, day_max, month_idx, band_min, band_max)
+    temp_score = _grouped_mean(temp, city_codes, len(cities))
+
+    # monthly rainfall per city, then every city-month against every crop
+    period = dates.dt.year.to_numpy() * 12 + month_idx
+    group_codes, group_keys = pd.factorize(pd.Series(city_codes) * 1_000_000 + period)
+    precip = daily['totalprecip_mm'].to_numpy(dtype=float)
+    has_precip = ~np.isnan(precip)
+    totals = np.bincount(group_codes, weights=np.where(has_precip, precip, 0))
+    observed = np.bincount(group_codes, weights=has_precip.astype(float))
+    group_city = group_keys.to_numpy() // 1_000_000
+    group_period = group_keys.to_numpy() % 1_000_000
+    group_month = group_period % 12
+    group_days = pd.to_datetime({
+        'year': group_period // 12, 'month': group_month + 1, 'day': 1
+    }).dt.days_in_month.to_numpy()
+    rain = precipitation_scores(totals, observed, group_days, group_month, band_precip)
+    rain[:, observed == 0] = np.nan
+    precip_score = _grouped_mean(rain, group_city, len(cities), weights=observed)
+
+    days = np.bincount(city_codes, minlength=len(cities))
+    combined = np.where(
+        np.isnan(precip_score), temp_score,
+        TEMPERATURE_WEIGHT * temp_score + PRECIPITATION_WEIGHT * precip_score
+    )
+
+    scores = pd.DataFrame({
+        'city': np.repeat(np.asarray(cities), len(crops)),
+        'crop': np.tile(crops, len(cities)),
+        'temperature_score': temp_score.T.ravel(),
+        'precipitation_score': precip_score.T.ravel(),
+        'suitability_score': combined.T.ravel(),
+        'days': np.repeat(days, len(crops)),
+    })
+    scores['rank'] = scores.groupby('city')['suitability_score'].rank(ascending=False, method='min').astype('Int64')
+    return scores.sort_values(['suitability_score'], ascending=False, ignore_index=True)
@@ -0,0 +1,288 @@
+import argparse
+import contextlib
+import datetime
+import json
+import io
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from unittest import mock
+
+from tests.bench import synthetic
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+
+# a case fails when its best time is this much slower than the baseline's;
+# the best of several runs is far steadier than the median on a busy machine
+DEFAULT_THRESHOLD = 0.25
+# differences below this are timer and scheduler noise, whatever the ratio
+NOISE_FLOOR_MS = 1.0
+
+DEFAULT_REPEATS = 7
+DEFAULT_CITIES = 4
+DEFAULT_YEARS = 10
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# generous ceilings on `python -X importtime`, in milliseconds; they catch a
+# heavy dependency creeping back to import time, not small regressions
+IMPORT_BUDGETS_MS = {
+    'utils.http_client': 150,
+    'etl.extract.current': 400,
+    'etl.extract.historic': 400,
+    'etl.extract.app2': 2000,
+}
+IMPORT_RUNS = 3
+
+
+def time_case(fn, repeats=DEFAULT_REPEATS, setup=None):
+    # one untimed warm-up call, then `repeats` timed calls; setup() runs
+    # untimed before each call and its result is passed to fn
+    fn(setup()) if setup else fn()
+    timings = []
+    for _ in range(repeats):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': round(statistics.median(timings), 3), 'min_ms': round(min(timings), 3)}
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Cases whose best time regressed past `threshold` against `baseline`.
+
+    Returns (name, baseline_ms, current_ms) tuples. Cases missing from
+    either side are not compared.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        before, now = previous['min_ms'], result['min_ms']
+        if now > before * (1 + threshold) and now - before > NOISE_FLOOR_MS:
+            regressions.append((name, before, now))
+    return regressions
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path) as f:
+            return json.load(f)['cases']
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(results, settings, path=BASELINE_FILE):
+    with open(path, 'w') as f:
+        json.dump({
+            'created': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'settings': settings,
+            'cases': results,
+        }, f, indent=2, sort_keys=True)
+
+
+##------------------------------------------------Cases------------------------------------------------------------------------------------------------
+
+def transform_cases(years):
+    # the app2 transforms, range chart and vegetable registry on synthetic frames
+    from etl.extract import app2
+    from etl.extract.current import current_row
+    from etl.extract.historic import history_rows
+    from etl.extract.vegtables import get_veg_data
+
+    df = synthetic.daily_weather(synthetic.city_names(1)[0], years)
+    # drop every 20th day so fill_missing_dates has gaps to fill
+    gappy = df.drop(df.index[::20]).reset_index(drop=True)
+    veg = next(iter(get_veg_data()))
+    history = synthetic.history_response("Bench City 00", years)
+    reading = synthetic.current_response("Bench City 00", datetime.datetime(2025, 1, 8, 12, 0))
+
+    return {
+        'transform_to_monthly_data': (app2.transform_to_monthly_data, df.copy),
+        'add_extreme_flags': (app2.add_extreme_flags, df.copy),
+        'fill_missing_dates': (app2.fill_missing_dates, gappy.copy),
+        'add_cumulative_precipitation': (app2.add_cumulative_precipitation, df.copy),
+        'monthly_temperature_ranges': (app2.monthly_temperature_ranges, df.copy),
+        'create_range_bar_chart': (lambda frame: app2.create_range_bar_chart(frame, "Bench", veg), df.copy),
+        'get_veg_data': (get_veg_data, None),
+        'history_rows': (lambda: list(history_rows(history)), None),
+        'current_row': (lambda: current_row(reading), None),
+    }
+
+
+class FakeClient:
+    """Stands in for the WeatherAPI client, one new reading per call."""
+
+    def __init__(self, city):
+        self.city = city
+        self.last_updated = datetime.datetime(2025, 1, 8, 0, 0)
+
+    def get(self, endpoint, params, use_cache=True):
+        self.last_updated += datetime.timedelta(minutes=15)
+        return synthetic.current_response(self.city, self.last_updated)
+
+
+def database_available():
+    from utils.db_pool import get_connection
+    try:
+        with get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        return True
+    except Exception as e:
+        print(f"Stand-in database not reachable, skipping database cases: {e}")
+        return False
+
+
+def clear_bench_rows(conn):
+    # only the synthetic cities are removed
+    with conn.cursor() as cursor:
+        for table in ('student.de11_fehu_capstone', 'student.weather_data', 'student.weather_data_latest',
+                      'student.weather_data_daily', 'student.de11_fehu_monthly_rollup'):
+            cursor.execute(f"DELETE FROM {table} WHERE city_key LIKE %s", (synthetic.CITY_PREFIX.lower() + '%',))
+    conn.commit()
+
+
+def database_cases(cities, years):
+    # the read and ingest paths against the stand-in database from .env.test,
+    # seeded with `cities` synthetic cities of `years` years each; only run
+    # with --db, since they migrate that database and write to it
+    from utils.db_pool import get_connection
+    from etl.extract import current
+    from etl.extract.historic import history_rows, load_history
+    from etl.extract.query_cache import weather_cache
+    from etl.extract.weather_repository import WeatherRepository
+    from etl.load.migrations import ensure_schema
+
+    names = synthetic.city_names(cities)
+    histories = [synthetic.history_response(city, years, seed=i) for i, city in enumerate(names)]
+    with get_connection() as conn:
+        ensure_schema(conn)
+        clear_bench_rows(conn)
+        for history in histories:
+            load_history(conn, history_rows(history))
+        # fresh statistics, so plans do not change mid-run when autovacuum catches up
+        with conn.cursor() as cursor:
+            cursor.execute("ANALYZE student.de11_fehu_capstone")
+        conn.commit()
+
+    prepared = WeatherRepository(read_mode='prepared')
+    copy = WeatherRepository(read_mode='copy')
+    client = FakeClient(names[0])
+
+    def ingest_history():
+        with get_connection() as conn:
+            load_history(conn, history_rows(histories[0]))
+
+    def ingest_current():
+        weather_cache.invalidate()
+        with mock.patch.object(current, 'get_client', return_value=client), \
+                contextlib.redirect_stdout(io.StringIO()):
+            current.insert_current(names[0])
+
+    return {
+        'get_weather_data[prepared]': (lambda: prepared.get_weather_data(names[-1]), None),
+        'get_weather_data[copy]': (lambda: copy.get_weather_data(names[-1]), None),
+        'load_history': (ingest_history, None),
+        'insert_current': (ingest_current, None),
+    }
+
+
+def import_time_ms(module):
+    # cumulative microseconds of the module's own line in a fresh interpreter's importtime report
+    report = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+                            cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT), capture_output=True,
+                            text=True, timeout=60, check=True).stderr
+    for line in report.splitlines():
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000
+    raise ValueError(f"{module} not in the importtime report")
+
+
+def check_import_budgets(budgets=IMPORT_BUDGETS_MS, runs=IMPORT_RUNS, only=None):
+    """Modules importing slower than their budget, as (module, best_ms, budget_ms).
+
+    The best of `runs` cold imports is taken, so one slow start on a busy
+    machine does not count.
+    """
+    over_budget = []
+    for module, budget_ms in budgets.items():
+        if only and only not in f"import[{module}]":
+            continue
+        best = min(import_time_ms(module) for _ in range(runs))
+        print(f"{'import[' + module + ']':<32} best {best:>12.3f} ms   budget {budget_ms:>7} ms")
+        if best >= budget_ms:
+            over_budget.append((module, best, budget_ms))
+    return over_budget
+
+
+##------------------------------------------------Runner-----------------------------------------------------------------------------------------------
+
+def run(cities=DEFAULT_CITIES, years=DEFAULT_YEARS, repeats=DEFAULT_REPEATS, use_database=False, only=None):
+    cases = transform_cases(years)
+    seeded = use_database and database_available()
+    if seeded:
+        cases.update(database_cases(cities, years))
+
+    results = {}
+    try:
+        for name, (fn, setup) in cases.items():
+            if only and only not in name:
+                continue
+            results[name] = time_case(fn, repeats, setup)
+            print(f"{name:<32} median {results[name]['median_ms']:>10.3f} ms   min {results[name]['min_ms']:>10.3f} ms")
+    finally:
+        if seeded:
+            from utils.db_pool import get_connection
+            with get_connection() as conn:
+                clear_bench_rows(conn)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="run_tests.py bench",
+                                     description="Time the query, transform, charting and ingest hot paths.")
+    parser.add_argument('--cities', type=int, default=DEFAULT_CITIES)
+    parser.add_argument('--years', type=int, default=DEFAULT_YEARS)
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of the best time against the baseline (default 0.25 = 25%%)")
+    parser.add_argument('--only', help="run only cases whose name contains this")
+    parser.add_argument('--db', action='store_true',
+                        help="also run the database cases, which migrate the database configured in .env.test "
+                             "and write and delete 'Bench City' rows there")
+    parser.add_argument('--save-baseline', action='store_true', help="record this run as the new baseline")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    args = parser.parse_args(argv)
+
+    settings = {'cities': args.cities, 'years': args.years, 'repeats': args.repeats}
+    results = run(args.cities, args.years, args.repeats, args.db, args.only)
+    # absolute ceilings, checked whatever the baseline says
+    over_budget = check_import_budgets(only=args.only)
+    for module, best, budget_ms in over_budget:
+        print(f"OVER BUDGET import {module}: {best:.0f} ms, budget {budget_ms} ms")
+
+    baseline = load_baseline(args.baseline)
+    if args.save_baseline or baseline is None:
+        save_baseline(results, settings, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 1 if over_budget else 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, now in regressions:
+        print(f"REGRESSION {name}: {before:.3f} ms -> {now:.3f} ms (+{(now / before - 1) * 100:.0f}%)")
+    if regressions or over_budget:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
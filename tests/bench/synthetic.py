@@ -0,0 +1,64 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+# every synthetic city starts with this, so the rows can be cleared afterwards
+CITY_PREFIX = "Bench City"
+
+
+def city_names(cities):
+    return [f"{CITY_PREFIX} {i:02d}" for i in range(cities)]
+
+
+def daily_weather(city, years, seed=0, end=datetime.date(2024, 12, 31)):
+    # a seasonal temperature curve with noise and exponential rainfall,
+    # shaped like the frame get_weather_data() returns
+    days = pd.date_range(end=end, periods=years * 365, freq='D')
+    rng = np.random.default_rng(seed)
+    season = 11 + 7 * np.sin(2 * np.pi * (days.dayofyear.to_numpy() - 110) / 365)
+    avg = season + rng.normal(0, 2, len(days))
+    return pd.DataFrame({
+        'city': city,
+        'date': days,
+        'avgtemp_c': avg.round(1),
+        'maxtemp_c': (avg + rng.uniform(2, 6, len(days))).round(1),
+        'mintemp_c': (avg - rng.uniform(2, 6, len(days))).round(1),
+        'totalprecip_mm': rng.exponential(2.2, len(days)).round(2),
+        'uv_index': rng.integers(0, 8, len(days)).astype(float),
+    })
+
+
+def multi_city_weather(cities, years):
+    return pd.concat([daily_weather(city, years, seed=i) for i, city in enumerate(city_names(cities))],
+                     ignore_index=True)
+
+
+def _location(city):
+    return {'name': city, 'region': 'Benchshire', 'country': 'United Kingdom', 'lat': 51.45,
+            'lon': -2.58, 'tz_id': 'Europe/London', 'localtime_epoch': 1735689600}
+
+
+def history_response(city, years, seed=0):
+    # a history.json body covering `years` of days for one city
+    df = daily_weather(city, years, seed)
+    return {
+        'location': _location(city),
+        'forecast': {'forecastday': [
+            {'date': f"{row.date:%Y-%m-%d}",
+             'day': {'maxtemp_c': row.maxtemp_c, 'mintemp_c': row.mintemp_c, 'avgtemp_c': row.avgtemp_c,
+                     'totalprecip_mm': row.totalprecip_mm, 'uv': row.uv_index}}
+            for row in df.itertuples()
+        ]},
+    }
+
+
+def current_response(city, last_updated):
+    # a current.json body for one reading
+    return {
+        'location': _location(city),
+        'current': {'last_updated': f"{last_updated:%Y-%m-%d %H:%M}",
+                    'last_updated_epoch': int(last_updated.timestamp()),
+                    'temp_c': 9.5, 'wind_mph': 7.2, 'precip_mm': 0.1, 'humidity': 81,
+                    'feelslike_c': 7.8, 'uv': 1.0},
+    }
@@ -0,0 +1,262 @@
+import argparse
+import datetime
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# cities the fake rejects the way WeatherAPI does, with error code 1006
+UNKNOWN_CITIES = {'nowhere'}
+
+# first reading of every city; each current.json call moves it on 15 minutes
+FIRST_READING = datetime.datetime(2025, 1, 8, 6, 0)
+READING_INTERVAL = datetime.timedelta(minutes=15)
+
+
+def _city_seed(city):
+    return int(hashlib.sha1(city.lower().encode()).hexdigest()[:8], 16)
+
+
+def _location(city, now):
+    seed = _city_seed(city)
+    return {
+        'name': city.title(), 'region': 'Fakeshire', 'country': 'United Kingdom',
+        'lat': round(50 + seed % 800 / 100, 2), 'lon': round(-5 + seed % 700 / 100, 2),
+        'tz_id': 'Europe/London', 'localtime_epoch': int(now.timestamp()),
+        'localtime': f"{now:%Y-%m-%d %H:%M}",
+    }
+
+
+def _condition(precip):
+    if precip > 2:
+        return {'text': 'Moderate rain', 'icon': '//cdn.weatherapi.com/weather/64x64/day/302.png', 'code': 1189}
+    if precip > 0:
+        return {'text': 'Light drizzle', 'icon': '//cdn.weatherapi.com/weather/64x64/day/266.png', 'code': 1153}
+    return {'text': 'Partly cloudy', 'icon': '//cdn.weatherapi.com/weather/64x64/day/116.png', 'code': 1003}
+
+
+def _day_weather(city, day):
+    # a seasonal curve per city, noisy but the same for the same day
+    rng = random.Random(_city_seed(city) ^ day.toordinal())
+    avg = 11 + 7 * math.sin(2 * math.pi * (day.timetuple().tm_yday - 110) / 365) + rng.gauss(0, 2)
+    spread = rng.uniform(2, 6)
+    precip = round(max(0.0, rng.expovariate(0.45) - 1), 2)
+    return round(avg, 1), round(avg + spread, 1), round(avg - spread, 1), precip, float(rng.randint(0, 7))
+
+
+def current_payload(city, last_updated):
+    avg, _, _, precip, uv = _day_weather(city, last_updated.date())
+    return {
+        'location': _location(city, last_updated),
+        'current': {
+            'last_updated_epoch': int(last_updated.timestamp()),
+            'last_updated': f"{last_updated:%Y-%m-%d %H:%M}",
+            'temp_c': avg, 'temp_f': round(avg * 9 / 5 + 32, 1), 'is_day': 1,
+            'condition': _condition(precip),
+            'wind_mph': 8.1, 'wind_kph': 13.0, 'wind_degree': 240, 'wind_dir': 'WSW',
+            'pressure_mb': 1012.0, 'pressure_in': 29.88, 'precip_mm': round(precip / 24, 2),
+            'precip_in': 0.0, 'humidity': 82, 'cloud': 75, 'feelslike_c': round(avg - 2.4, 1),
+            'feelslike_f': round((avg - 2.4) * 9 / 5 + 32, 1), 'vis_km': 10.0, 'vis_miles': 6.0,
+            'uv': uv, 'gust_mph': 12.4, 'gust_kph': 20.0,
+        },
+    }
+
+
+def history_payload(city, start, end, hourly=True):
+    days = []
+    day = start
+    while day <= end:
+        avg, high, low, precip, uv = _day_weather(city, day)
+        days.append({
+            'date': f"{day:%Y-%m-%d}",
+            'date_epoch': int(datetime.datetime(day.year, day.month, day.day).timestamp()),
+            'day': {
+                'maxtemp_c': high, 'mintemp_c': low, 'avgtemp_c': avg, 'maxwind_mph': 14.3,
+                'totalprecip_mm': precip, 'avgvis_km': 9.6, 'avghumidity': 81,
+                'condition': _condition(precip), 'uv': uv,
+            },
+            'astro': {'sunrise': '08:09 AM', 'sunset': '04:22 PM', 'moon_phase': 'Waxing Gibbous'},
+            # real responses carry 24 hourly entries per day, which dominate their size
+            'hour': [
+                {'time': f"{day:%Y-%m-%d} {hour:02d}:00", 'temp_c': round(low + (high - low) * hour / 23, 1),
+                 'precip_mm': round(precip / 24, 2), 'humidity': 80, 'cloud': 70, 'uv': uv}
+                for hour in range(24)
+            ] if hourly else [],
+        })
+        day += datetime.timedelta(days=1)
+    return {'location': _location(city, datetime.datetime.combine(end, datetime.time(12))),
+            'forecast': {'forecastday': days}}
+
+
+class FakeSettings:
+    """Latency and failure mix of the fake server, changeable while it runs."""
+
+    def __init__(self, latency_ms=50, jitter_ms=20, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1, hourly=True, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.hourly = hourly
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.readings = {}
+        self.stats = {'requests': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0, 'bad_requests': 0}
+
+    def roll(self):
+        # (delay seconds, failure) for one request
+        with self.lock:
+            delay = max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+            draw = self.random.random()
+        if draw < self.rate_limit_rate:
+            return delay, 'rate_limited'
+        if draw < self.rate_limit_rate + self.error_rate:
+            return delay, 'errors'
+        return delay, None
+
+    def next_reading(self, city):
+        with self.lock:
+            count = self.readings.get(city.lower(), 0)
+            self.readings[city.lower()] = count + 1
+        return FIRST_READING + count * READING_INTERVAL
+
+    def count(self, outcome):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats[outcome] += 1
+
+
+class FakeWeatherApiHandler(BaseHTTPRequestHandler):
+    settings = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, status, code, message, headers=None):
+        self._send(status, {'error': {'code': code, 'message': message}}, headers)
+
+    def do_GET(self):
+        settings = self.settings
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        endpoint = url.path.rsplit('/', 1)[-1]
+
+        delay, failure = settings.roll()
+        time.sleep(delay)
+        if failure == 'rate_limited':
+            settings.count('rate_limited')
+            return self._error(429, 2007, "API key has exceeded calls per month quota.",
+                               {'Retry-After': str(settings.retry_after)})
+        if failure == 'errors':
+            settings.count('errors')
+            return self._error(503, 9999, "Internal application error.")
+
+        city = params.get('q', '').strip()
+        if not city:
+            settings.count('bad_requests')
+            return self._error(400, 1003, "Parameter q is missing.")
+        if city.lower() in UNKNOWN_CITIES:
+            settings.count('bad_requests')
+            return self._error(400, 1006, "No matching location found.")
+
+        if endpoint == 'current.json':
+            body = current_payload(city, settings.next_reading(city))
+        elif endpoint == 'history.json':
+            try:
+                start = datetime.date.fromisoformat(params['dt'])
+                end = datetime.date.fromisoformat(params.get('end_dt', params['dt']))
+            except (KeyError, ValueError):
+                settings.count('bad_requests')
+                return self._error(400, 1007, "Parameter dt is missing or invalid.")
+            body = history_payload(city, start, end, settings.hourly)
+        else:
+            settings.count('bad_requests')
+            return self._error(400, 1005, "API request url is invalid.")
+        settings.count('ok')
+        self._send(200, body)
+
+
+class FakeWeatherApi:
+    """A local stand-in for api.weatherapi.com/v1, served from a thread.
+
+    Point WEATHER_API_BASE_URL at base_url to use it.
+    """
+
+    def __init__(self, settings=None, host='127.0.0.1', port=0):
+        self.settings = settings or FakeSettings()
+        handler = type('Handler', (FakeWeatherApiHandler,), {'settings': self.settings})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-weatherapi', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def add_settings_args(parser):
+    parser.add_argument('--latency-ms', type=float, default=50, help="mean response latency")
+    parser.add_argument('--jitter-ms', type=float, default=20, help="latency standard deviation")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="share of requests answered 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument('--no-hourly', action='store_true', help="leave out the hourly entries of history.json")
+    parser.add_argument('--seed', type=int)
+
+
+def settings_from_args(args):
+    return FakeSettings(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate,
+                        args.retry_after, not args.no_hourly, args.seed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a fake WeatherAPI for local load tests.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    add_settings_args(parser)
+    args = parser.parse_args(argv)
+
+    fake = FakeWeatherApi(settings_from_args(args), args.host, args.port)
+    print(f"Fake WeatherAPI on {fake.base_url}, set WEATHER_API_BASE_URL={fake.base_url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        fake.server.server_close()
+        print(f"Served: {fake.settings.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from tests.load.fake_weatherapi import FakeWeatherApi, add_settings_args, settings_from_args
+from utils.metrics import metrics
+
+# every load-test city starts with this, so the rows can be cleared afterwards
+CITY_PREFIX = "Load City"
+
+# history windows end here and walk back one window per repeat of a city
+LAST_HISTORY_DAY = datetime.date(2024, 12, 31)
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def city_name(i, cities):
+    return f"{CITY_PREFIX} {i % cities:03d}"
+
+
+def history_window(i, cities, days):
+    # each repeat of a city goes one window further back, so no two calls overlap
+    end = LAST_HISTORY_DAY - datetime.timedelta(days=days * (i // cities))
+    return end - datetime.timedelta(days=days - 1), end
+
+
+def clear_load_rows(conn):
+    with conn.cursor() as cursor:
+        for table in ('student.de11_fehu_capstone', 'student.weather_data', 'student.weather_data_latest',
+                      'student.weather_data_daily', 'student.de11_fehu_monthly_rollup'):
+            cursor.execute(f"DELETE FROM {table} WHERE city_key LIKE %s", (CITY_PREFIX.lower() + '%',))
+    conn.commit()
+
+
+def run_calls(calls, concurrency):
+    # run the calls on `concurrency` threads, returning (seconds, result) per
+    # call and the wall time; the ingest functions' prints are swallowed
+    def timed_call(call):
+        start = time.perf_counter()
+        try:
+            result = call()
+        except Exception as e:
+            result = e
+        return time.perf_counter() - start, result
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed_call, calls))
+    return results, time.perf_counter() - started
+
+
+def stage_totals(stages):
+    # (runs, busy seconds) summed over the timed series of `stages`
+    rows = [row for row in metrics.summary() if row['stage'] in stages]
+    return sum(row['count'] for row in rows), sum(row['total_ms'] for row in rows) / 1000
+
+
+def report(name, results, elapsed, rows, succeeded):
+    latencies = [seconds * 1000 for seconds, _ in results]
+    failed = len(results) - succeeded
+    writes, write_seconds = stage_totals(('db_insert', 'db_load'))
+    api_calls, api_seconds = stage_totals(('api_fetch',))
+    print(f"\n{name}: {len(results)} calls in {elapsed:.2f} s, {succeeded} ok, {failed} failed")
+    print(f"  throughput   {len(results) / elapsed:8.1f} calls/s   {rows / elapsed:10.1f} rows/s")
+    print(f"  latency      p50 {percentile(latencies, 0.5):8.1f} ms   p99 {percentile(latencies, 0.99):8.1f} ms")
+    print(f"  api          {api_calls} requests (retries included), {api_seconds:.2f} s waiting")
+    if write_seconds:
+        print(f"  db writes    {writes} statements, {rows} rows in {write_seconds:.2f} s busy "
+              f"= {rows / write_seconds:.1f} rows/s")
+    return {'calls': len(results), 'ok': succeeded, 'failed': failed, 'seconds': round(elapsed, 3),
+            'rows': rows, 'rows_per_second': round(rows / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 0.5), 1), 'p99_ms': round(percentile(latencies, 0.99), 1)}
+
+
+def run_current(requests, cities, concurrency):
+    from etl.extract.current import insert_current
+
+    metrics.reset()
+    calls = [lambda city=city_name(i, cities): insert_current(city) for i in range(requests)]
+    results, elapsed = run_calls(calls, concurrency)
+    stored = sum(1 for _, result in results if result is True)
+    succeeded = sum(1 for _, result in results if result in (True, False))
+    return report("insert_current", results, elapsed, stored, succeeded)
+
+
+def run_history(chunks, cities, days, concurrency):
+    from etl.extract.historic import insert_history
+
+    metrics.reset()
+    calls = []
+    for i in range(chunks):
+        start, end = history_window(i, cities, days)
+        calls.append(lambda city=city_name(i, cities), start=start, end=end:
+                     insert_history(city, f"{start:%Y-%m-%d}", f"{end:%Y-%m-%d}"))
+    results, elapsed = run_calls(calls, concurrency)
+    # insert_history returns the rows copied, 0 when the API call failed
+    rows = sum(result for _, result in results if isinstance(result, int))
+    succeeded = sum(1 for _, result in results if isinstance(result, int) and result > 0)
+    return report("insert_history", results, elapsed, rows, succeeded)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Drive insert_current and the historic loader against a fake WeatherAPI."
+    )
+    parser.add_argument('--base-url', help="use an already running fake instead of starting one")
+    parser.add_argument('--mode', choices=['current', 'history', 'both'], default='both')
+    parser.add_argument('--requests', type=int, default=200, help="insert_current calls")
+    parser.add_argument('--chunks', type=int, default=40, help="insert_history calls")
+    parser.add_argument('--days', type=int, default=30, help="days per history call (WeatherAPI allows 30)")
+    parser.add_argument('--cities', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--keep', action='store_true', help="leave the load-test rows in the database")
+    add_settings_args(parser)
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    from utils.db_pool import get_connection, close_pool
+    from utils.http_client import close_client
+    from etl.load.migrations import ensure_schema
+
+    fake = None
+    if not args.base_url:
+        fake = FakeWeatherApi(settings_from_args(args)).start()
+    # every call must reach the fake, so the client's response cache is off
+    os.environ['WEATHER_API_BASE_URL'] = args.base_url or fake.base_url
+    os.environ['WEATHER_API_CACHE_ENTRIES'] = '0'
+    close_client()
+
+    with get_connection() as conn:
+        ensure_schema(conn)
+        clear_load_rows(conn)
+    try:
+        if args.mode in ('current', 'both'):
+            run_current(args.requests, args.cities, args.concurrency)
+        if args.mode in ('history', 'both'):
+            run_history(args.chunks, args.cities, args.days, args.concurrency)
+        if fake is not None:
+            print(f"\nfake server: {fake.settings.stats}")
+    finally:
+        if not args.keep:
+            with get_connection() as conn:
+                clear_load_rows(conn)
+        if fake is not None:
+            fake.stop()
+        close_client()
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
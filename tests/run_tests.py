@@ -80,6 +80,12 @@ def main():
         run_linting(command)
         return
 
+    # Time the hot paths and compare them with the saved baseline,
+    # the remaining arguments go to the benchmark runner
+    if command == 'bench':
+        from tests.bench.runner import main as run_benchmarks
+        sys.exit(run_benchmarks(sys.argv[2:]))
+
     # Check to see if a command was supplied for the test run
     if command in TEST_CONFIG:
         # Run the test command
@@ -93,7 +99,7 @@ def main():
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         raise ValueError(
-            "Usage: run_tests.py <unit|integration|component|all|lint>"
+            "Usage: run_tests.py <unit|integration|component|all|lint|bench>"
         )
     else:
         main()
@@ -0,0 +1,46 @@
+import os
+from contextlib import contextmanager
+
+import psycopg2
+import pytest
+
+from etl.load.migrations import migrate
+
+# database tests are opt-in: they migrate and write to whatever this points at
+TEST_DATABASE_URL = 'WEATHER_TEST_DATABASE_URL'
+
+# the only city the database tests write, deleted before and after each test
+TEST_CITY = "Testington"
+
+TEST_TABLES = ('de11_fehu_capstone', 'weather_data', 'weather_data_latest',
+               'weather_data_daily', 'de11_fehu_monthly_rollup')
+
+
+def _clear_test_city(conn):
+    with conn.cursor() as cursor:
+        for table in TEST_TABLES:
+            cursor.execute(f"DELETE FROM student.{table} WHERE city_key = LOWER(%s)", (TEST_CITY,))
+    conn.commit()
+
+
+@pytest.fixture
+def test_db():
+    url = os.getenv(TEST_DATABASE_URL)
+    if not url:
+        pytest.skip(f"set {TEST_DATABASE_URL} to run the database tests")
+    conn = psycopg2.connect(url)
+    migrate(conn, partition=False)
+    _clear_test_city(conn)
+    yield conn
+    conn.rollback()
+    _clear_test_city(conn)
+    conn.close()
+
+
+@pytest.fixture
+def test_db_factory(test_db):
+    # a get_connection() stand-in handing out the test connection
+    @contextmanager
+    def connection():
+        yield test_db
+    return connection
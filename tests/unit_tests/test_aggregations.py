@@ -0,0 +1,120 @@
+import datetime
+from contextlib import contextmanager
+
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock
+
+from etl.extract import aggregations
+from etl.extract.aggregations import get_extreme_days, get_month_of_year_ranges, get_monthly_aggregates
+from etl.extract.app2 import add_extreme_flags, monthly_temperature_ranges, transform_to_monthly_data
+from etl.extract.current import current_row, load_current
+from etl.extract.historic import history_rows, load_history
+from etl.extract.weather_repository import WeatherRepository
+from tests.load.fake_weatherapi import current_payload, history_payload
+from tests.unit_tests.conftest import TEST_CITY
+
+MONTHLY_COLUMNS = ['month', 'avgtemp_c', 'maxtemp_c', 'mintemp_c', 'totalprecip_mm']
+
+
+@pytest.fixture
+def read_sql(mocker):
+    conn = MagicMock()
+
+    @contextmanager
+    def connection():
+        yield conn
+    mocker.patch.object(aggregations, 'get_connection', connection)
+    read_sql = mocker.patch.object(aggregations.pd, 'read_sql', return_value=pd.DataFrame())
+    read_sql.conn = conn
+    return read_sql
+
+
+@pytest.mark.parametrize('read, table, parse_dates', [
+    (get_monthly_aggregates, 'de11_fehu_monthly_rollup', ['month_start']),
+    (get_extreme_days, 'de11_fehu_capstone', ['date']),
+    (get_month_of_year_ranges, 'de11_fehu_monthly_rollup', None),
+])
+def test_each_view_is_one_bound_query(read_sql, read, table, parse_dates):
+    read("Bristol")
+
+    read_sql.assert_called_once()
+    query, conn = read_sql.call_args.args
+    assert conn is read_sql.conn
+    assert f"student.{table}" in query
+    assert "city_key = LOWER(%(city)s)" in query
+    assert "Bristol" not in query
+    assert read_sql.call_args.kwargs == {'params': {'city': "Bristol"}, 'parse_dates': parse_dates}
+
+
+def test_extremes_flag_days_over_historic_and_latest_rows():
+    query = aggregations.extremes_query
+
+    assert "FROM student.weather_data_latest" in query
+    assert "maxtemp_c = MAX(maxtemp_c) OVER ()" in query
+    assert "mintemp_c = MIN(mintemp_c) OVER ()" in query
+    assert "WHERE is_highest_temp OR is_lowest_temp" in query
+
+
+def test_monthly_rollups_carry_a_running_precipitation_total():
+    assert "SUM(totalprecip_mm) OVER (ORDER BY month)" in aggregations.monthly_query
+    assert "GROUP BY EXTRACT(MONTH FROM month)" in aggregations.month_of_year_query
+
+
+def app_mode_daily(test_db_factory, monkeypatch):
+    monkeypatch.delenv('WEATHER_SNAPSHOT_DIR', raising=False)
+    return WeatherRepository(test_db_factory, read_mode='prepared').get_weather_data(TEST_CITY)
+
+
+def assert_modes_agree(daily, monkeypatch, test_db_factory):
+    monkeypatch.setattr(aggregations, 'get_connection', test_db_factory)
+
+    monthly = get_monthly_aggregates(TEST_CITY)[MONTHLY_COLUMNS]
+    pd.testing.assert_frame_equal(monthly, transform_to_monthly_data(daily.copy())[MONTHLY_COLUMNS],
+                                  check_dtype=False)
+
+    extremes = get_extreme_days(TEST_CITY)
+    flagged = add_extreme_flags(daily.copy())
+    flagged = flagged[flagged['is_highest_temp'] | flagged['is_lowest_temp']]
+    assert extremes['date'].tolist() == flagged['date'].tolist()
+    assert extremes['is_highest_temp'].tolist() == flagged['is_highest_temp'].tolist()
+
+    ranges = get_month_of_year_ranges(TEST_CITY)
+    expected = monthly_temperature_ranges(daily.copy())
+    assert ranges['month'].tolist() == expected['month'].astype(str).tolist()
+    assert ranges['maxtemp_c'].tolist() == pytest.approx(expected['maxtemp_c'].tolist())
+    assert ranges['mintemp_c'].tolist() == pytest.approx(expected['mintemp_c'].tolist())
+
+
+def test_database_mode_matches_app_mode_on_historic_rows(test_db, test_db_factory, monkeypatch):
+    load_history(test_db, history_rows(history_payload(
+        TEST_CITY, datetime.date(2024, 12, 20), datetime.date(2025, 2, 10), hourly=False
+    )))
+
+    daily = app_mode_daily(test_db_factory, monkeypatch)
+
+    assert len(daily) == 53
+    assert_modes_agree(daily, monkeypatch, test_db_factory)
+
+
+def test_database_mode_matches_app_mode_with_current_readings(test_db, test_db_factory, monkeypatch):
+    load_history(test_db, history_rows(history_payload(
+        TEST_CITY, datetime.date(2024, 12, 20), datetime.date(2025, 2, 10), hourly=False
+    )))
+
+    def readings(*times):
+        load_current(test_db, [current_row(current_payload(TEST_CITY, datetime.datetime(*t))) for t in times])
+
+    # a day the historic table covers, then two days it does not: only the
+    # latest reading's day joins the series
+    readings((2025, 2, 5, 9), (2025, 2, 11, 9), (2025, 2, 11, 18), (2025, 2, 12, 8))
+    daily = app_mode_daily(test_db_factory, monkeypatch)
+    assert daily['date'].max() == pd.Timestamp(2025, 2, 12)
+    assert len(daily) == 54
+    assert_modes_agree(daily, monkeypatch, test_db_factory)
+
+    # the latest reading moves on to March, February loses its extra day
+    readings((2025, 3, 1, 7))
+    daily = app_mode_daily(test_db_factory, monkeypatch)
+    assert len(daily) == 54
+    assert_modes_agree(daily, monkeypatch, test_db_factory)
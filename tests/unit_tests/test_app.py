@@ -1,20 +1,72 @@
 import os
 import sys
+import datetime
 import pytest
+from contextlib import contextmanager
 from unittest import mock
-from etl.extract.app import get_weather_data
+from etl.extract import app2
+from etl.extract.app2 import get_weather_data
+from etl.extract.weather_repository import WeatherRepository
 from unittest.mock import MagicMock, ANY
 
 
-def test_function_calls_pandas_read_sql_query(mocker):
-    mock_read_sql = mocker.patch('pandas.read_sql')
-    query = f"""
-    SELECT city, date, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm, uv_index
-    FROM student.de11_fehu_capstone
-    WHERE city = 'Bristol'
-    ORDER BY date ASC;
-    """
+@pytest.fixture
+def mock_conn(mocker):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [
+        ('Bristol', datetime.datetime(2025, 1, 8), 5.0, 8.0, 2.0, 1.5, 1),
+    ]
+
+    @contextmanager
+    def connect():
+        yield conn
+
+    mocker.patch('etl.extract.app2.connect_to_db', side_effect=connect)
+    mocker.patch.object(app2, 'weather_repository', WeatherRepository(lambda: app2.connect_to_db()))
+    return conn
+
+
+def test_function_executes_one_prepared_parameterized_query(mock_conn):
+    cursor = mock_conn.cursor.return_value.__enter__.return_value
 
     get_weather_data("Bristol")
+    get_weather_data("Bristol')); DROP TABLE student.weather_data; --")
+
+    statements = [c.args for c in cursor.execute.call_args_list]
+    assert statements[0] == (ANY,)
+    assert statements[0][0].startswith("PREPARE weather_series (text) AS")
+    assert statements[1:] == [
+        ("EXECUTE weather_series (%s)", ("Bristol",)),
+        ("EXECUTE weather_series (%s)", ("Bristol')); DROP TABLE student.weather_data; --",)),
+    ]
+
+
+def test_function_returns_typed_columns(mock_conn):
+    df = get_weather_data("Bristol")
+
+    assert list(df.columns) == [
+        'city', 'date', 'avgtemp_c', 'maxtemp_c', 'mintemp_c', 'totalprecip_mm', 'uv_index'
+    ]
+    assert str(df['date'].dtype) == 'datetime64[ns]'
+    assert str(df['uv_index'].dtype) == 'float64'
+
+
+def test_multi_city_data_is_one_query_on_normalised_keys(mock_conn):
+    cursor = mock_conn.cursor.return_value.__enter__.return_value
+
+    app2.get_multi_city_weather_data(["Bristol", " london", "BRISTOL"])
+
+    statements = [c.args for c in cursor.execute.call_args_list]
+    assert statements[0][0].startswith("PREPARE weather_series_multi (text[]) AS")
+    assert statements[1:] == [("EXECUTE weather_series_multi (%s)", (["bristol", "london"],))]
+
+
+@pytest.mark.parametrize('setting, expected', [(None, 'App'), ('Database', 'Database'), ('SQL', 'App')])
+def test_aggregation_mode_defaults_to_app(monkeypatch, setting, expected):
+    if setting is None:
+        monkeypatch.delenv('AGGREGATION_MODE', raising=False)
+    else:
+        monkeypatch.setenv('AGGREGATION_MODE', setting)
 
-    mock_read_sql.assert_called_once_with(query, ANY)
\ No newline at end of file
+    assert app2.default_aggregation_mode() == expected
@@ -0,0 +1,45 @@
+import os
+from PIL import Image
+from etl.extract import assets
+
+
+def make_photo(path, colour='green'):
+    # landscape pixels tagged "rotate 90 clockwise", as phone cameras save them
+    image = Image.new('RGB', (800, 600), colour)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    image.save(path, 'JPEG', exif=exif)
+
+
+def test_processed_image_is_upright_resized_and_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv('WEATHER_ASSET_CACHE_DIR', str(tmp_path / 'cache'))
+    photo = tmp_path / '1.jpg'
+    make_photo(photo)
+
+    first = assets.thumbnail(str(photo))
+    with Image.open(first) as image:
+        assert image.size == (270, 360)
+
+    def render(*args):
+        raise AssertionError("cached thumbnail was rebuilt")
+
+    monkeypatch.setattr(assets, '_render', render)
+    assert assets.thumbnail(str(photo)) == first
+
+
+def test_changed_picture_gets_a_new_cache_file(tmp_path, monkeypatch):
+    monkeypatch.setenv('WEATHER_ASSET_CACHE_DIR', str(tmp_path / 'cache'))
+    photo = tmp_path / '1.jpg'
+    make_photo(photo, 'green')
+    first = assets.gallery_image(str(photo))
+    make_photo(photo, 'red')
+    os.utime(photo, ns=(1, 1))
+    assert assets.gallery_image(str(photo)) != first
+
+
+def test_gallery_pages():
+    pictures = [f"{i}.jpg" for i in range(7)]
+    assert assets.page_count(pictures, 3) == 3
+    assert assets.gallery_page(pictures, 2, 3) == ['6.jpg']
+    assert assets.gallery_page(pictures, 9, 3) == ['6.jpg']
+    assert assets.page_count([], 3) == 1
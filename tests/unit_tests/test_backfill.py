@@ -0,0 +1,40 @@
+from datetime import date
+from etl.extract import backfill
+from etl.extract.backfill import Checkpoint, Chunk, plan_chunks, run_backfill
+
+
+def test_plan_chunks_splits_each_city_into_api_sized_windows():
+    chunks = plan_chunks(["Bristol", "London"], date(2025, 1, 1),
+                         date(2025, 2, 15), chunk_days=30)
+
+    assert chunks == [
+        Chunk("Bristol", date(2025, 1, 1), date(2025, 1, 30)),
+        Chunk("Bristol", date(2025, 1, 31), date(2025, 2, 15)),
+        Chunk("London", date(2025, 1, 1), date(2025, 1, 30)),
+        Chunk("London", date(2025, 1, 31), date(2025, 2, 15)),
+    ]
+
+
+def test_run_backfill_resumes_after_failed_chunk(tmp_path, mocker):
+    mocker.patch.object(backfill, 'get_connection')
+    mocker.patch.object(backfill, 'initialise_db')
+    load_chunk = mocker.patch.object(
+        backfill, 'load_chunk', side_effect=[5, RuntimeError("HTTP 500")]
+    )
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+
+    first = run_backfill(["Bristol"], date(2025, 1, 1), date(2025, 1, 4),
+                         chunk_days=2, workers=1,
+                         checkpoint_path=checkpoint_path)
+
+    assert first == {'loaded': 1, 'rows': 5, 'failed': 1}
+
+    load_chunk.side_effect = [3]
+    second = run_backfill(["Bristol"], date(2025, 1, 1), date(2025, 1, 4),
+                          chunk_days=2, workers=1,
+                          checkpoint_path=checkpoint_path)
+
+    assert second == {'loaded': 1, 'rows': 3, 'failed': 0}
+    retried = load_chunk.call_args[0][0]
+    assert retried == Chunk("Bristol", date(2025, 1, 3), date(2025, 1, 4))
+    assert Checkpoint(checkpoint_path).is_done(retried)
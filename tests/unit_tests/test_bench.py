@@ -0,0 +1,43 @@
+from tests.bench import runner
+from tests.bench.runner import compare, time_case, save_baseline, load_baseline
+
+
+def test_compare_flags_only_real_slowdowns():
+    baseline = {'fast': {'min_ms': 10.0}, 'tiny': {'min_ms': 0.1}, 'gone': {'min_ms': 5.0}}
+    results = {'fast': {'min_ms': 13.0}, 'tiny': {'min_ms': 0.5}, 'new': {'min_ms': 99.0}}
+    assert compare(results, baseline, threshold=0.25) == [('fast', 10.0, 13.0)]
+    assert compare(results, baseline, threshold=0.5) == []
+
+
+def test_time_case_runs_setup_untimed_before_each_call(tmp_path):
+    frames = []
+    result = time_case(frames.append, repeats=3, setup=lambda: len(frames))
+    assert frames == [0, 1, 2, 3]
+    assert set(result) == {'median_ms', 'min_ms'}
+
+    path = str(tmp_path / 'baseline.json')
+    assert load_baseline(path) is None
+    save_baseline({'case': result}, {'repeats': 3}, path)
+    assert load_baseline(path) == {'case': result}
+
+
+def test_database_cases_only_run_when_asked(mocker, tmp_path):
+    available = mocker.patch.object(runner, 'database_available', return_value=False)
+    mocker.patch.object(runner, 'transform_cases', return_value={'noop': (lambda: None, None)})
+    mocker.patch.object(runner, 'check_import_budgets', return_value=[])
+    baseline = str(tmp_path / 'baseline.json')
+
+    assert runner.main(['--repeats', '1', '--baseline', baseline]) == 0
+    available.assert_not_called()
+
+    runner.main(['--repeats', '1', '--baseline', baseline, '--db'])
+    available.assert_called_once()
+
+
+def test_import_budgets_report_modules_over_their_ceiling(mocker):
+    times = {'fast.module': 5.0, 'slow.module': 900.0}
+    mocker.patch.object(runner, 'import_time_ms', side_effect=lambda module: times[module])
+    budgets = {'fast.module': 100, 'slow.module': 500}
+
+    assert runner.check_import_budgets(budgets, runs=2) == [('slow.module', 900.0, 500)]
+    assert runner.check_import_budgets(budgets, runs=2, only='fast') == []
@@ -0,0 +1,107 @@
+import json
+import time
+
+import pandas as pd
+import psycopg2
+from unittest.mock import MagicMock
+
+from etl.extract import change_listener
+from etl.extract.change_listener import ChangeListener
+from etl.extract.query_cache import ALL_CITIES, QueryCache, cached_query
+from etl.transform.incremental import TransformStates
+
+
+def payload(table, city):
+    return json.dumps({'table': table, 'city': city, 'first_date': '2025-01-08',
+                       'last_date': '2025-01-08', 'rows': 1})
+
+
+def test_notification_invalidates_only_that_city():
+    cache = QueryCache()
+    loader = MagicMock(return_value={'rows': 1})
+    for city in ("Bristol", "London"):
+        cached_query(city, loader, cache)
+    cached_query(ALL_CITIES, loader, cache, kind='all_daily')
+    listener = ChangeListener(cache)
+
+    listener.handle(payload('weather_data', 'bristol'))
+
+    assert cache.stats()['entries'] == 2
+    assert cache.version("Bristol") == (0, 1)
+    assert cache.version("London") == (0, 0)
+
+    # historic rows also feed the every-city entries
+    listener.handle(payload('de11_fehu_capstone', 'london'))
+    assert cache.stats()['entries'] == 0
+
+
+def test_malformed_payloads_are_ignored():
+    cache = QueryCache()
+    listener = ChangeListener(cache)
+
+    assert listener.handle("not json") is None
+    assert listener.handle(json.dumps({'table': 'weather_data'})) is None
+    assert listener.stats()['ignored'] == 2
+
+
+def test_lost_connection_is_retried_and_marks_listener_inactive():
+    connect = MagicMock(side_effect=psycopg2.OperationalError("server closed the connection"))
+    listener = ChangeListener(QueryCache(), connect=connect, reconnect_seconds=0.01).start()
+    deadline = time.monotonic() + 2
+    while connect.call_count < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    listener.stop(timeout=1)
+
+    stats = listener.stats()
+    assert stats['reconnects'] >= 2
+    assert stats['last_error'] == "server closed the connection"
+    assert not stats['active']
+
+
+def test_errors_in_the_listen_loop_reconnect_and_clear_the_cache(mocker):
+    cache = QueryCache()
+    conn = MagicMock()
+    # a city that is not a string gets past handle() and raises in the cache
+    conn.notifies = [MagicMock(payload=json.dumps({'table': 'weather_data', 'city': 5}))]
+    # an entry cached after LISTEN, which the lost notification would have dropped
+    conn.poll.side_effect = lambda: cached_query("Bristol", MagicMock(return_value={'rows': 1}), cache)
+    mocker.patch.object(change_listener, 'select').select.return_value = ([conn], [], [])
+    connects = []
+
+    def connect():
+        connects.append(1)
+        if len(connects) == 1:
+            return conn
+        raise OSError("Bad file descriptor")
+    listener = ChangeListener(cache, connect=connect, reconnect_seconds=0.01).start()
+    deadline = time.monotonic() + 2
+    while len(connects) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    listener.stop(timeout=1)
+
+    stats = listener.stats()
+    assert len(connects) >= 3
+    assert stats['reconnects'] >= 3
+    assert stats['last_error'] == "Bad file descriptor"
+    assert not stats['active']
+    assert cache.stats()['entries'] == 0
+    conn.close.assert_called_once()
+
+
+def test_unchanged_version_skips_the_incremental_query():
+    history = pd.DataFrame({
+        'city': 'Bristol', 'date': pd.to_datetime(['2025-01-07', '2025-01-08']),
+        'avgtemp_c': [5.0, 6.0], 'maxtemp_c': [8.0, 9.0], 'mintemp_c': [2.0, 3.0],
+        'totalprecip_mm': [1.0, 0.0], 'uv_index': 1.0,
+    })
+    load_all = MagicMock(return_value=history)
+    load_since = MagicMock(return_value=history.iloc[1:])
+    states = TransformStates()
+
+    states.refresh("Bristol", load_all, load_since, version=(0, 0))
+    states.refresh("Bristol", load_all, load_since, version=(0, 0))
+    load_since.assert_not_called()
+
+    states.refresh("Bristol", load_all, load_since, version=(0, 1))
+    load_since.assert_called_once()
+    assert states.stats()['unchanged_refreshes'] == 1
@@ -0,0 +1,58 @@
+import pandas as pd
+from unittest.mock import MagicMock
+
+from etl.extract.query_cache import QueryCache, cached_batch_query
+from etl.transform.comparison import city_stats, monthly_by_city, typical_year_by_city
+
+
+def long_frame():
+    dates = pd.date_range('2024-01-30', periods=4, freq='D')
+    return pd.DataFrame({
+        'city': ['bristol'] * 4 + ['london'] * 4,
+        'date': list(dates) * 2,
+        'avgtemp_c': [4.0, 6.0, 8.0, 10.0, 1.0, 2.0, 3.0, 4.0],
+        'maxtemp_c': [6.0, 8.0, 10.0, 12.0, 3.0, 4.0, 5.0, 6.0],
+        'mintemp_c': [2.0, 4.0, 6.0, 8.0, -1.0, 0.0, 1.0, 2.0],
+        'totalprecip_mm': [0.0, 2.0, 0.5, 3.0, 1.0, 1.0, 0.0, 0.0],
+        'uv_index': [1.0] * 8,
+    })
+
+
+def test_city_stats_has_one_row_per_city():
+    stats = city_stats(long_frame()).set_index('city')
+
+    assert list(stats.index) == ['bristol', 'london']
+    assert stats.loc['bristol', 'days'] == 4
+    assert stats.loc['bristol', 'mean_temp_c'] == 7.0
+    assert stats.loc['bristol', 'rainy_days'] == 2
+    assert stats.loc['london', 'frost_days'] == 1
+    assert stats.loc['london', 'rainy_share'] == 0.5
+
+
+def test_monthly_and_typical_year_split_by_city_and_month():
+    monthly = monthly_by_city(long_frame())
+
+    assert len(monthly) == 4
+    january = monthly[(monthly['city'] == 'bristol') & (monthly['month_start'] == '2024-01-01')].iloc[0]
+    assert january['avgtemp_c'] == 5.0
+    assert january['days'] == 2
+
+    typical = typical_year_by_city(monthly).set_index(['city', 'month'])
+    # two stored January days with 2 mm are scaled to the whole month
+    assert typical.loc[('bristol', 1), 'totalprecip_mm'] == 31.0
+
+
+def test_batch_query_loads_only_uncached_cities_in_one_call():
+    cache = QueryCache()
+    frame = long_frame()
+    loader = MagicMock(side_effect=lambda cities: frame[frame['city'].isin(cities)])
+
+    cached_batch_query(["Bristol"], loader, cache)
+    df = cached_batch_query(["London", " bristol", "Nowhere"], loader, cache)
+
+    assert [c.args[0] for c in loader.call_args_list] == [['bristol'], ['london', 'nowhere']]
+    assert list(df['city'].unique()) == ['london', 'bristol']
+    assert len(df) == 8
+
+    cached_batch_query(["nowhere", "london"], loader, cache)
+    assert loader.call_count == 2
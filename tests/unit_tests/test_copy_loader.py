@@ -0,0 +1,73 @@
+import datetime
+from unittest.mock import MagicMock
+from etl.extract.current import current_row, load_current
+from etl.extract.historic import history_rows, load_history
+from etl.load.copy_loader import CURRENT_TARGET, HISTORIC_TARGET, copy_rows, create_staging_stmt, merge_stmt
+from tests.load.fake_weatherapi import current_payload, history_payload
+from tests.unit_tests.conftest import TEST_CITY
+
+
+def test_copy_rows_streams_fixed_size_chunks():
+    cursor = MagicMock()
+    chunks = []
+    cursor.copy_expert.side_effect = lambda sql, buffer: chunks.append(buffer.read())
+    rows = (("Bristol", "", i, None, datetime.date(2025, 1, i)) for i in range(1, 6))
+
+    copied = copy_rows(cursor, ('city', 'region', 'x', 'y', 'date'), rows, chunk_rows=2)
+
+    assert copied == 5
+    assert len(chunks) == 3
+    assert chunks[0] == "Bristol,,1,\\N,2025-01-01\nBristol,,2,\\N,2025-01-02\n"
+    assert chunks[2] == "Bristol,,5,\\N,2025-01-05\n"
+    sql = cursor.copy_expert.call_args[0][0]
+    assert sql.startswith("COPY weather_copy_staging (city, region, x, y, date) FROM STDIN")
+
+
+def test_merge_keeps_the_last_duplicate_and_applies_the_target_conflict_rule():
+    historic = merge_stmt(HISTORIC_TARGET)
+    current = merge_stmt(CURRENT_TARGET)
+
+    assert "ORDER BY LOWER(city), date, seq DESC" in historic
+    assert "ON CONFLICT (city_key, date) DO UPDATE SET region = EXCLUDED.region" in historic
+    assert "ON CONFLICT (city_key, date, last_updated) DO NOTHING" in current
+
+
+def test_historic_staging_reads_fractional_uv():
+    assert "ALTER COLUMN uv_index TYPE NUMERIC" in create_staging_stmt(HISTORIC_TARGET)
+    assert "ALTER COLUMN" not in create_staging_stmt(CURRENT_TARGET)
+
+
+def test_real_history_rows_stage_their_fractional_uv():
+    cursor = MagicMock()
+    chunks = []
+    cursor.copy_expert.side_effect = lambda sql, buffer: chunks.append(buffer.read())
+    payload = history_payload("Bristol", datetime.date(2025, 1, 8), datetime.date(2025, 1, 8))
+    payload['forecast']['forecastday'][0]['day']['uv'] = 1.0
+
+    copy_rows(cursor, HISTORIC_TARGET.columns, history_rows(payload))
+
+    fields = chunks[0].rstrip('\n').split(',')
+    assert fields[HISTORIC_TARGET.columns.index('date')] == "2025-01-08"
+    assert fields[HISTORIC_TARGET.columns.index('uv_index')] == "1.0"
+    # INTEGER would reject "1.0" in COPY, the staging column takes it
+    assert "ALTER COLUMN uv_index TYPE NUMERIC" in create_staging_stmt(HISTORIC_TARGET)
+
+
+def test_real_history_rows_load_through_copy(test_db):
+    payload = history_payload(TEST_CITY, datetime.date(2025, 1, 8), datetime.date(2025, 1, 9))
+    payload['forecast']['forecastday'][0]['day']['uv'] = 1.0
+    payload['forecast']['forecastday'][1]['day']['uv'] = 2.6
+
+    assert load_history(test_db, history_rows(payload)) == 2
+
+    with test_db.cursor() as cursor:
+        cursor.execute("SELECT date, uv_index FROM student.de11_fehu_capstone WHERE city_key = LOWER(%s) "
+                       "ORDER BY date", (TEST_CITY,))
+        assert cursor.fetchall() == [(datetime.date(2025, 1, 8), 1), (datetime.date(2025, 1, 9), 3)]
+
+
+def test_readings_already_stored_are_not_counted_as_written(test_db):
+    rows = [current_row(current_payload(TEST_CITY, datetime.datetime(2025, 1, 8, 9, 15)))]
+
+    assert load_current(test_db, rows) == 1
+    assert load_current(test_db, rows) == 0
@@ -0,0 +1,36 @@
+import datetime
+from unittest.mock import MagicMock
+from etl.extract.copy_reader import copy_frame, copy_query
+from etl.extract.weather_repository import WEATHER_COLUMNS
+
+
+def test_copy_query_binds_numbered_parameters_through_mogrify():
+    cursor = MagicMock()
+    cursor.mogrify.return_value = b"SELECT 1"
+
+    statement = copy_query(cursor, "SELECT * FROM t WHERE a = LOWER($1) AND b >= $2 AND c LIKE 'x%'",
+                           ("Bristol", datetime.date(2025, 1, 1)))
+
+    cursor.mogrify.assert_called_once_with(
+        "SELECT * FROM t WHERE a = LOWER(%(1)s) AND b >= %(2)s AND c LIKE 'x%%'",
+        {'1': "Bristol", '2': datetime.date(2025, 1, 1)},
+    )
+    assert statement == "COPY (SELECT 1) TO STDOUT WITH (FORMAT csv, HEADER true)"
+
+
+def test_copy_frame_returns_compact_dtypes():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.mogrify.return_value = b"SELECT 1"
+    cursor.copy_expert.side_effect = lambda sql, buffer: buffer.write(
+        b"city,date,avgtemp_c,maxtemp_c,mintemp_c,totalprecip_mm,uv_index\n"
+        b"Bristol,2025-01-08 00:00:00,5.0,8.0,2.0,1.5,1\n"
+        b"Bristol,2025-01-09 00:00:00,6.0,9.0,3.0,,2\n"
+    )
+
+    df = copy_frame(conn, "SELECT $1", ("Bristol",), WEATHER_COLUMNS)
+
+    assert str(df['city'].dtype) == 'category'
+    assert str(df['date'].dtype) == 'datetime64[ns]'
+    assert str(df['maxtemp_c'].dtype) == 'float32'
+    assert df['totalprecip_mm'].isna().tolist() == [False, True]
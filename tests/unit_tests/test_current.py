@@ -0,0 +1,50 @@
+import datetime
+from contextlib import contextmanager
+
+import pytest
+from unittest.mock import MagicMock
+
+from etl.extract import current
+from tests.load.fake_weatherapi import current_payload
+from utils.http_client import WeatherApiError
+
+READING = datetime.datetime(2025, 1, 8, 6, 15)
+
+
+@pytest.fixture
+def cache(mocker):
+    cache = mocker.patch.object(current, 'weather_cache')
+    cache.key_for.return_value = ('bristol', None)
+    return cache
+
+
+@pytest.fixture
+def api(mocker, cache):
+    @contextmanager
+    def connection():
+        yield MagicMock()
+    mocker.patch.object(current, 'load_dotenv')
+    mocker.patch.object(current, 'initialise_db')
+    mocker.patch.object(current, 'get_connection', connection)
+    mocker.patch.object(current, 'refresh_latest')
+    mocker.patch.object(current, 'refresh_monthly_rollups')
+    client = mocker.patch.object(current, 'get_client').return_value
+    client.get.return_value = current_payload("Bristol", READING)
+    return client
+
+
+@pytest.mark.parametrize('outcome', ['stored', 'already stored', 'failed'])
+def test_progress_ends_at_completion_on_every_outcome(api, cache, outcome):
+    if outcome == 'already stored':
+        cache.key_for.return_value = ('bristol', READING)
+    elif outcome == 'failed':
+        api.get.side_effect = WeatherApiError("HTTP Status Code 400: No location found", 400)
+    progress = MagicMock()
+
+    result = current.insert_current("Bristol", progress=progress)
+
+    assert result == {'stored': True, 'already stored': False, 'failed': None}[outcome]
+    fractions = [c.args[0] for c in progress.call_args_list]
+    assert fractions == sorted(fractions)
+    assert fractions[-1] == 1.0
+    assert fractions.count(1.0) == 1
@@ -0,0 +1,71 @@
+import pytest
+import psycopg2
+from unittest.mock import MagicMock
+from utils import db_pool
+from utils.db_pool import DatabasePool, PoolTimeout
+
+
+@pytest.fixture
+def fake_pool(mocker):
+    inner = MagicMock()
+    inner._used = {}
+    inner._pool = []
+    mocker.patch('utils.db_pool.pg_pool.ThreadedConnectionPool',
+                 return_value=inner)
+    return inner
+
+
+def make_conn():
+    conn = MagicMock()
+    conn.closed = 0
+    conn.info.transaction_status = \
+        psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    return conn
+
+
+def test_getconn_times_out_when_pool_is_exhausted(fake_pool):
+    fake_pool.getconn.side_effect = [make_conn()]
+    pool = DatabasePool(0, 1, timeout=0.01)
+
+    pool.getconn()
+
+    with pytest.raises(PoolTimeout):
+        pool.getconn()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_putconn_rolls_back_open_transaction(fake_pool):
+    conn = make_conn()
+    conn.info.transaction_status = \
+        psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    fake_pool.getconn.return_value = conn
+    pool = DatabasePool(0, 1)
+
+    pool.putconn(pool.getconn())
+
+    conn.rollback.assert_called_once()
+    fake_pool.putconn.assert_called_once_with(conn, close=False)
+
+
+def test_stale_connection_failing_healthcheck_is_replaced(fake_pool):
+    stale, fresh = make_conn(), make_conn()
+    stale.cursor.return_value.__enter__.return_value.execute.side_effect = \
+        psycopg2.OperationalError
+    fake_pool.getconn.side_effect = [stale, fresh]
+    pool = DatabasePool(0, 2, healthcheck_interval=0)
+    pool._last_used[id(stale)] = 0
+
+    assert pool.getconn() is fresh
+    fake_pool.putconn.assert_called_once_with(stale, close=True)
+    assert pool.stats()['healthcheck_failures'] == 1
+
+
+def test_get_connection_returns_connection_to_pool(fake_pool, mocker):
+    conn = make_conn()
+    fake_pool.getconn.return_value = conn
+    mocker.patch.object(db_pool, '_pool', DatabasePool(0, 1))
+
+    with db_pool.get_connection() as borrowed:
+        assert borrowed is conn
+
+    fake_pool.putconn.assert_called_once_with(conn, close=False)
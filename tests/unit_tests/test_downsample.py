@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+from etl.transform.downsample import lttb_indices, minmax_indices, downsample, render_mode
+
+
+def daily_frame(days=5000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'date': pd.date_range('2000-01-01', periods=days),
+        'avgtemp_c': 10 + 8 * np.sin(np.arange(days) / 58) + rng.normal(size=days),
+        'totalprecip_mm': rng.exponential(2, days),
+    })
+
+
+def test_lttb_keeps_ends_and_peaks():
+    y = np.zeros(1000)
+    y[437] = 50
+    picked = lttb_indices(np.arange(1000), y, 50)
+    assert len(picked) == 50
+    assert picked[0] == 0 and picked[-1] == 999
+    assert 437 in picked
+    assert np.all(np.diff(picked) > 0)
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    y = np.random.default_rng(1).normal(size=1000)
+    picked = minmax_indices(y, 10)
+    for bucket in np.array_split(np.arange(1000), 10):
+        assert bucket[np.argmax(y[bucket])] in picked
+        assert bucket[np.argmin(y[bucket])] in picked
+
+
+def test_downsample_frames():
+    df = daily_frame()
+    shown = downsample(df, 'date', ['avgtemp_c'], max_points=500)
+    assert len(shown) == 500
+    assert shown['date'].is_monotonic_increasing
+
+    bars = downsample(df, 'date', ['totalprecip_mm'], max_points=500, method='minmax')
+    assert bars['totalprecip_mm'].max() == df['totalprecip_mm'].max()
+
+    small = df.head(100)
+    assert downsample(small, 'date', ['avgtemp_c'], max_points=500) is small
+    assert (render_mode(500), render_mode(5000)) == ('svg', 'webgl')
@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from config.env_config import cleanup_previous_env
+
+
+@pytest.mark.parametrize('key', [
+    'QUERY_CACHE_TTL', 'QUERY_CACHE_MAX_ENTRIES', 'WEATHER_READ_MODE', 'AGGREGATION_MODE',
+    'WEATHER_SNAPSHOT_DIR', 'METRICS_TEXTFILE', 'TRANSFORM_FULL_REFRESH_SECONDS',
+    'WEATHER_DATA_PARTITIONED', 'CHART_MAX_POINTS', 'WEATHER_CHANGE_LISTENER',
+    'WEATHER_DATA_RETENTION_DAYS',
+])
+def test_settings_of_the_previous_env_are_cleared(monkeypatch, key):
+    monkeypatch.setenv(key, "left over")
+
+    cleanup_previous_env()
+
+    assert key not in os.environ
@@ -0,0 +1,35 @@
+import pytest
+from etl.extract.current import current_row
+from etl.extract.historic import history_rows
+from tests.load.fake_weatherapi import FakeSettings, FakeWeatherApi
+from utils.http_client import WeatherApiClient, WeatherApiError
+
+
+def client_for(fake):
+    return WeatherApiClient(fake.base_url, timeout=5, retries=1, backoff=0, cache_entries=0)
+
+
+def test_fake_serves_parseable_current_and_history():
+    with FakeWeatherApi(FakeSettings(latency_ms=0, jitter_ms=0, hourly=False)) as fake:
+        client = client_for(fake)
+        first = current_row(client.get("current.json", {'q': "Bristol"}))
+        second = current_row(client.get("current.json", {'q': "Bristol"}))
+        rows = list(history_rows(client.get("history.json", {'q': "Bristol", 'dt': "2025-01-01",
+                                                             'end_dt': "2025-01-30"})))
+        with pytest.raises(WeatherApiError, match="No matching location found"):
+            client.get("current.json", {'q': "Nowhere"})
+
+    assert first[0] == "Bristol"
+    assert second[7] > first[7]
+    assert len(rows) == 30
+    assert rows[0][7] == "2025-01-01"
+
+
+def test_fake_rate_limits_and_errors_are_retried_then_reported():
+    settings = FakeSettings(latency_ms=0, jitter_ms=0, rate_limit_rate=1.0, retry_after=0)
+    with FakeWeatherApi(settings) as fake:
+        with pytest.raises(WeatherApiError) as error:
+            client_for(fake).get("current.json", {'q': "Bristol"})
+
+    assert error.value.status_code == 429
+    assert settings.stats['rate_limited'] == 2
@@ -0,0 +1,90 @@
+from unittest.mock import MagicMock
+import pytest
+import requests
+from utils import http_client
+from utils.http_client import WeatherApiClient, WeatherApiError, current_ttl, history_ttl
+
+
+def response(status, json_body=None, text=""):
+    resp = MagicMock(status_code=status, text=text, reason="Error", headers={})
+    if json_body is None:
+        resp.json.side_effect = ValueError("not json")
+    else:
+        resp.json.return_value = json_body
+    return resp
+
+
+@pytest.fixture
+def client(mocker):
+    mocker.patch.object(http_client.time, 'sleep')
+    client = WeatherApiClient(base_url="http://weather.test/v1", retries=2)
+    mocker.patch.object(client.session, 'get')
+    return client
+
+
+def test_retries_transient_failures_then_caches_the_response(client):
+    body = {'current': {'last_updated_epoch': None}}
+    client.session.get.side_effect = [
+        requests.ConnectionError("reset"), response(503, text="<html>busy</html>"), response(200, body)
+    ]
+
+    assert client.get("current.json", {'q': "Bristol"}) is body
+    assert client.get("current.json", {'q': "Bristol"}) is body
+    assert client.session.get.call_count == 3
+    assert client.stats()['retries'] == 2
+    assert client.stats()['cache_hits'] == 1
+
+
+def test_non_json_error_bodies_raise_a_readable_error(client):
+    client.session.get.return_value = response(502, text="<html>Bad gateway</html>")
+
+    with pytest.raises(WeatherApiError, match="HTTP Status Code 502: <html>Bad gateway</html>") as error:
+        client.get("current.json", {'q': "Bristol"})
+
+    assert error.value.status_code == 502
+    assert client.session.get.call_count == 3
+
+    client.session.get.reset_mock()
+    client.session.get.return_value = response(400, {'error': {'code': 1006, 'message': "No location found"}})
+    with pytest.raises(WeatherApiError, match="No location found"):
+        client.get("current.json", {'q': "Nowhere"})
+    assert client.session.get.call_count == 1
+
+
+def test_current_responses_are_cached_until_the_next_upstream_update():
+    updated = {'current': {'last_updated_epoch': 1000}}
+
+    assert current_ttl(updated, now=1100) == 800
+    assert current_ttl(updated, now=1890) == http_client.MIN_CURRENT_TTL
+
+
+def test_before_attempt_runs_for_every_request_but_not_for_cache_hits(client):
+    body = {'current': {'last_updated_epoch': None}}
+    client.session.get.side_effect = [response(429), response(200, body)]
+    before_attempt = MagicMock()
+
+    client.get("current.json", {'q': "Bristol"}, before_attempt=before_attempt)
+    client.get("current.json", {'q': "Bristol"}, before_attempt=before_attempt)
+
+    assert before_attempt.call_count == 2
+
+
+def test_history_windows_reaching_today_expire_like_current_readings():
+    response_data = {'location': {'localtime': "2025-01-08 13:05"}}
+
+    assert history_ttl(response_data, {'dt': "2025-01-01", 'end_dt': "2025-01-07"}) == http_client.HISTORY_TTL
+    assert history_ttl(response_data, {'dt': "2025-01-01", 'end_dt': "2025-01-08"}) == http_client.CURRENT_UPDATE_SECONDS
+    assert history_ttl(response_data, {'dt': "2025-01-08"}) == http_client.CURRENT_UPDATE_SECONDS
+    assert history_ttl(response_data, {'dt': "2025-01-01", 'end_dt': "2025-02-01"}) == http_client.CURRENT_UPDATE_SECONDS
+
+
+def test_history_cache_entries_use_the_window_ttl(client, mocker):
+    monotonic = mocker.patch.object(http_client.time, 'monotonic', return_value=1000.0)
+    body = {'location': {'localtime': "2025-01-08 13:05"}, 'forecast': {'forecastday': []}}
+    client.session.get.return_value = response(200, body)
+
+    client.get("history.json", {'q': "Bristol", 'dt': "2025-01-08"})
+    monotonic.return_value = 1000.0 + http_client.CURRENT_UPDATE_SECONDS + 1
+    client.get("history.json", {'q': "Bristol", 'dt': "2025-01-08"})
+
+    assert client.session.get.call_count == 2
@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+# modules that must only be imported once they are actually used
+LAZY_DEPENDENCIES = {
+    'utils.http_client': ['requests'],
+    'etl.extract.current': ['requests', 'pandas', 'pyarrow'],
+    'etl.extract.historic': ['requests', 'pandas', 'pyarrow'],
+    'etl.extract.vegtables': ['requests', 'streamlit'],
+    'etl.extract.app2': ['streamlit', 'plotly', 'PIL', 'requests'],
+}
+
+
+def run_python(*args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, *args], cwd=ROOT, env=env, capture_output=True,
+                          text=True, timeout=60, check=True)
+
+
+@pytest.mark.parametrize('module, dependencies', LAZY_DEPENDENCIES.items())
+def test_heavy_dependencies_are_not_imported_eagerly(module, dependencies):
+    code = (f"import sys, {module}\n"
+            f"print(','.join(d for d in {dependencies!r} if d in sys.modules))")
+    assert run_python('-c', code).stdout.strip() == ''
+
+
+@pytest.mark.parametrize('module', ['etl.extract.app2', 'etl.extract.vegtables', 'etl.extract.historic'])
+def test_import_has_no_side_effects(module):
+    # no prints, API calls or page config at import
+    result = run_python('-c', f"import {module}")
+    assert result.stdout == ''
+
+
+def test_read_settings_are_not_read_at_import():
+    # the repository is built on first use, after .env has been loaded
+    env = dict(os.environ, PYTHONPATH=ROOT, WEATHER_READ_MODE='bogus')
+    subprocess.run([sys.executable, '-c', "import etl.extract.app2"], cwd=ROOT, env=env,
+                   capture_output=True, timeout=60, check=True)
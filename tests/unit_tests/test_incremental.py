@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pandas.testing as pdt
+from etl.extract import app2
+from etl.transform.incremental import CityTransformState, TransformStates
+
+
+def series(dates, offset=0.0):
+    dates = pd.to_datetime(dates)
+    n = len(dates)
+    values = np.arange(n, dtype=float) + offset
+    return pd.DataFrame({
+        'city': 'Bristol', 'date': dates, 'avgtemp_c': values, 'maxtemp_c': values + 3,
+        'mintemp_c': values - 3, 'totalprecip_mm': values / 2, 'uv_index': 1.0,
+    })
+
+
+def full_transform(df):
+    df = app2.fill_missing_dates(df.copy())
+    df = app2.add_extreme_flags(df)
+    df = app2.add_cumulative_precipitation(df)
+    return df, app2.transform_to_monthly_data(df)
+
+
+def test_incremental_updates_match_a_full_recompute():
+    history = series(['2025-01-28', '2025-01-29', '2025-02-02'])
+    state = CityTransformState()
+    state.apply(history)
+
+    # a newer reading of the last day, then a gap into a new day
+    same_day = series(['2025-02-02'], offset=20)
+    next_days = series(['2025-02-02', '2025-02-05'], offset=20)
+    state.apply(same_day)
+    state.apply(next_days)
+    daily, monthly = state.frames()
+
+    expected = pd.concat([history.iloc[:2], next_days], ignore_index=True)
+    expected_daily, expected_monthly = full_transform(expected)
+    pdt.assert_frame_equal(daily, expected_daily)
+    pdt.assert_frame_equal(monthly, expected_monthly)
+
+
+def test_refresh_only_loads_days_since_the_last_refresh(mocker):
+    load_all = mocker.Mock(return_value=series(['2025-01-01', '2025-01-02']))
+    load_since = mocker.Mock(return_value=series(['2025-01-02', '2025-01-03'], offset=1))
+    states = TransformStates()
+
+    states.refresh("Bristol", load_all, load_since)
+    daily, _ = states.refresh(" bristol", load_all, load_since)
+
+    load_all.assert_called_once_with("Bristol")
+    load_since.assert_called_once_with(" bristol", pd.Timestamp('2025-01-02').date())
+    assert list(daily['maxtemp_c']) == [3.0, 4.0, 5.0]
+    assert daily['is_highest_temp'].tolist() == [False, False, True]
+
+
+def test_latest_readings_past_the_history_match_a_full_recompute():
+    history = series(pd.date_range('2025-01-05', '2025-01-10'))
+    state = CityTransformState()
+
+    # the series ends in the city's single latest reading, which moves on
+    # over days the historic rows never cover
+    for day, offset in (('2025-01-11', 20), ('2025-01-12', 10), ('2025-01-14', 5)):
+        latest = series([day], offset=offset)
+        full = pd.concat([history, latest], ignore_index=True)
+        if state.last_date is None:
+            state.apply(full)
+        else:
+            state.apply(full[full['date'] >= state.last_date])
+        daily, monthly = state.frames()
+
+        expected_daily, expected_monthly = full_transform(full)
+        pdt.assert_frame_equal(daily, expected_daily)
+        pdt.assert_frame_equal(monthly, expected_monthly)
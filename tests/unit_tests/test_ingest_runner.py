@@ -0,0 +1,158 @@
+import asyncio
+import datetime
+import threading
+import time
+
+import psycopg2
+import pytest
+
+from etl.extract import ingest_runner
+from etl.extract.ingest_runner import CurrentIngestRunner, TokenBucket
+from tests.load.fake_weatherapi import current_payload
+from utils.http_client import WeatherApiError
+from utils.metrics import STAGE_ERRORS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+
+class FakeClient:
+    """Stands in for WeatherApiClient: `attempts` HTTP attempts per city."""
+
+    def __init__(self, attempts=None, errors=None, latency=0.0):
+        self.attempts = attempts or {}
+        self.errors = errors or {}
+        self.latency = latency
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def get(self, endpoint, params, before_attempt=None):
+        city = params['q']
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            for _ in range(self.attempts.get(city, 1)):
+                before_attempt()
+                time.sleep(self.latency)
+            if city in self.errors:
+                raise self.errors[city]
+            return current_payload(city, datetime.datetime(2025, 1, 8, 6, 0))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def make_runner(mocker):
+    mocker.patch.object(ingest_runner, 'load_dotenv')
+    mocker.patch.object(ingest_runner, 'weather_cache')
+
+    def make(cities, client, **kwargs):
+        mocker.patch.object(ingest_runner, 'get_client', return_value=client)
+        runner = CurrentIngestRunner(cities, calls_per_minute=6000, burst=100, **kwargs)
+        runner.written = []
+
+        def write_rows(rows):
+            runner.written.extend(rows)
+            return len(rows)
+        runner.write_rows = write_rows
+        return runner
+    return make
+
+
+def test_bucket_spends_its_burst_then_waits_for_refills():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    async def take(count):
+        for _ in range(count):
+            await bucket.acquire()
+    asyncio.run(take(3))
+    assert clock.sleeps == []
+
+    asyncio.run(take(2))
+    assert clock.sleeps == [0.5, 0.5]
+    assert clock.now == 101.0
+
+
+def test_bucket_refill_is_capped_at_capacity():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=1, capacity=2, clock=clock, sleep=clock.sleep)
+
+    clock.now += 0.25
+    bucket._refill()
+    assert bucket._tokens == 2
+
+    async def take(count):
+        for _ in range(count):
+            await bucket.acquire()
+    asyncio.run(take(2))
+    clock.now += 1000
+    asyncio.run(take(3))
+    assert clock.sleeps == [1.0]
+
+
+def test_cycle_bounds_concurrency_and_writes_one_batch(make_runner):
+    client = FakeClient(latency=0.02)
+    runner = make_runner([f"City {i}" for i in range(6)], client, max_concurrency=2)
+
+    summary = asyncio.run(runner.run_cycle())
+
+    assert client.max_in_flight == 2
+    assert summary['inserted'] == 6 and summary['failed'] == {}
+    assert sorted(row[0] for row in runner.written) == [f"City {i}" for i in range(6)]
+
+
+def test_failed_cities_are_reported_and_the_rest_still_load(make_runner):
+    client = FakeClient(errors={'Nowhere': WeatherApiError("No location found", 400),
+                                'Broken': KeyError('current')})
+    runner = make_runner(["Bristol", "Nowhere", "Broken", "London"], client)
+
+    summary = asyncio.run(runner.run_cycle())
+
+    assert summary['failed'] == {'Nowhere': "No location found", 'Broken': "'current'"}
+    assert [row[0] for row in runner.written] == ["Bristol", "London"]
+    assert ingest_runner.weather_cache.note_ingest.call_count == 4
+
+
+def test_a_failed_write_is_reported_and_the_next_cycle_still_runs(make_runner, mocker):
+    runner = make_runner(["Bristol", "Nowhere"], FakeClient(errors={'Nowhere': KeyError('current')}))
+    runner.write_rows = mocker.Mock(side_effect=[psycopg2.OperationalError("server closed the connection\n"), 1])
+    errors = mocker.patch.object(ingest_runner.metrics, 'inc')
+
+    summary = asyncio.run(runner.run_cycle())
+
+    assert summary['inserted'] == 0
+    assert summary['failed'] == {'Nowhere': "'current'", 'Bristol': "write failed: server closed the connection"}
+    errors.assert_called_once_with(STAGE_ERRORS, stage='ingest_write')
+    ingest_runner.weather_cache.note_ingest.assert_not_called()
+
+    summary = asyncio.run(runner.run_cycle())
+    assert summary['inserted'] == 1 and summary['failed'] == {'Nowhere': "'current'"}
+
+
+def test_every_http_attempt_takes_a_token(make_runner, mocker):
+    acquired = []
+    original = TokenBucket.acquire
+
+    async def counting_acquire(self):
+        acquired.append(1)
+        await original(self)
+    mocker.patch.object(TokenBucket, 'acquire', counting_acquire)
+    runner = make_runner(["Bristol", "London"], FakeClient(attempts={'Bristol': 3}))
+
+    asyncio.run(runner.run_cycle())
+
+    assert len(acquired) == 4
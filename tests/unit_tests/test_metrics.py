@@ -0,0 +1,38 @@
+import pytest
+from utils.metrics import MetricsRegistry, STAGE_ERRORS
+
+
+def test_timed_records_histograms_and_errors():
+    metrics = MetricsRegistry(buckets=(0.1, 1.0))
+    with metrics.timed('db_query', statement='weather_series'):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.timed('api_fetch', endpoint='current.json'):
+            raise ValueError("boom")
+    metrics.count_rows('db_load', 250, table='student.weather_data')
+
+    summary = {row['stage']: row for row in metrics.summary()}
+    assert summary['db_query']['count'] == 1
+    assert summary['api_fetch']['count'] == 1
+    assert metrics.counters()[(STAGE_ERRORS, (('endpoint', 'current.json'), ('stage', 'api_fetch')))] == 1
+
+
+def test_prometheus_text_format(tmp_path, monkeypatch):
+    monkeypatch.delenv("METRICS_TEXTFILE", raising=False)
+    metrics = MetricsRegistry(buckets=(0.1, 1.0))
+    metrics.observe('weather_stage_duration_seconds', 0.5, stage='render')
+    metrics.observe('weather_stage_duration_seconds', 2.0, stage='render')
+    metrics.count_rows('db_load', 3, table='student "x"')
+
+    text = metrics.prometheus_text()
+    assert '# TYPE weather_stage_duration_seconds histogram' in text
+    assert 'weather_stage_duration_seconds_bucket{stage="render",le="0.1"} 0' in text
+    assert 'weather_stage_duration_seconds_bucket{stage="render",le="1.0"} 1' in text
+    assert 'weather_stage_duration_seconds_bucket{stage="render",le="+Inf"} 2' in text
+    assert 'weather_stage_duration_seconds_count{stage="render"} 2' in text
+    assert 'weather_stage_rows_total{stage="db_load",table="student \\"x\\""} 3' in text
+
+    path = tmp_path / 'weather.prom'
+    assert metrics.write_textfile(str(path)) == str(path)
+    assert path.read_text() == text
+    assert metrics.write_textfile() is None
@@ -0,0 +1,142 @@
+from datetime import date
+
+import pytest
+from unittest.mock import MagicMock, call
+
+from etl.load import migrations, rollups
+from etl.load.migrations import (
+    MIGRATION_LOCK_ID, MIGRATIONS, MIGRATIONS_TABLE, PARTITION_MIGRATION,
+    _add_latest_and_daily_tables, _add_month, ensure_month_partitions, extend_partitions, migrate,
+    rebuild_rollup_v7,
+)
+
+LOCK = call("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+
+
+def make_conn(*applied):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [(version,) for version in applied]
+    return conn, cursor
+
+
+def executed_sql(cursor):
+    return [c.args[0] for c in cursor.execute.call_args_list]
+
+
+def test_versions_are_unique_and_increasing():
+    versions = [version for version, _, _ in MIGRATIONS]
+
+    assert versions == sorted(set(versions))
+    assert versions[0] == 1
+    assert PARTITION_MIGRATION[0] > versions[-1]
+
+
+def test_each_migration_runs_under_the_lock_and_applied_ones_are_skipped(mocker):
+    add_index = MagicMock()
+    mocker.patch.object(migrations, 'MIGRATIONS', [
+        (1, 'create', "CREATE TABLE one ();"),
+        (2, 'add index', add_index),
+        (3, 'add column', "ALTER TABLE one ADD COLUMN two INT;"),
+    ])
+    conn, cursor = make_conn(1)
+
+    assert migrate(conn, partition=False) == [2, 3]
+
+    add_index.assert_called_once_with(cursor)
+    # one transaction per migration, each starting with the lock
+    segments = []
+    for sql in executed_sql(cursor):
+        if sql == LOCK.args[0]:
+            segments.append([])
+        segments[-1].append(sql.split()[0])
+    assert segments == [
+        ['SELECT', 'CREATE', 'SELECT'],
+        ['SELECT', 'CREATE', 'SELECT', 'INSERT'],
+        ['SELECT', 'CREATE', 'SELECT', 'ALTER', 'INSERT'],
+    ]
+    recorded = [c.args[1] for c in cursor.execute.call_args_list if MIGRATIONS_TABLE in c.args[0]
+                and c.args[0].startswith('INSERT')]
+    assert recorded == [(2, 'add index'), (3, 'add column')]
+    assert conn.commit.call_count == 3
+
+
+def test_rollup_migrations_run_their_own_frozen_rebuild(mocker):
+    mocker.patch.object(migrations, 'rebuild_latest')
+    cursor = MagicMock()
+
+    _add_latest_and_daily_tables(cursor)
+
+    assert cursor.execute.call_args_list[-1] == call(rebuild_rollup_v7)
+    assert "FROM student.weather_data_latest l" in rebuild_rollup_v7
+    # no migration defers to the live rollup code, which later changes rewrite
+    assert not any(step is rollups.rebuild_monthly_rollups for _, _, step in MIGRATIONS)
+
+
+def test_partition_migration_only_runs_when_asked(mocker):
+    mocker.patch.object(migrations, 'MIGRATIONS', [(1, 'create', "CREATE TABLE one ();")])
+    partition = MagicMock()
+    mocker.patch.object(migrations, 'PARTITION_MIGRATION', (100, 'partition', partition))
+    extend = mocker.patch.object(migrations, 'extend_partitions')
+
+    conn, _ = make_conn(1)
+    assert migrate(conn, partition=False) == []
+    partition.assert_not_called()
+    extend.assert_not_called()
+
+    assert migrate(conn, partition=True) == [100]
+    partition.assert_called_once()
+    extend.assert_called_once_with(conn)
+
+
+@pytest.mark.parametrize('month_start, months, expected', [
+    (date(2025, 1, 1), 1, date(2025, 2, 1)),
+    (date(2024, 12, 1), 1, date(2025, 1, 1)),
+    (date(2024, 11, 1), 3, date(2025, 2, 1)),
+    (date(2024, 3, 1), 22, date(2026, 1, 1)),
+])
+def test_add_month_rolls_over_years(month_start, months, expected):
+    assert _add_month(month_start, months) == expected
+
+
+def test_missing_partitions_are_created_with_month_bounds():
+    cursor = MagicMock()
+    # December already exists
+    cursor.fetchone.side_effect = [(None,), ('student.weather_data_2024_12',), (None,)]
+
+    ensure_month_partitions(cursor, date(2024, 11, 17), date(2025, 1, 1))
+
+    probes = [c.args[1] for c in cursor.execute.call_args_list if c.args[0] == "SELECT to_regclass(%s)"]
+    assert probes == [("student.weather_data_2024_11",), ("student.weather_data_2024_12",),
+                      ("student.weather_data_2025_01",)]
+    created = [sql for sql in executed_sql(cursor) if "PARTITION OF" in sql]
+    assert len(created) == 2
+    assert "student.weather_data_2024_11" in created[0]
+    assert "FOR VALUES FROM ('2024-11-01') TO ('2024-12-01')" in created[0]
+    assert "FOR VALUES FROM ('2025-01-01') TO ('2025-02-01')" in created[1]
+
+
+def test_rows_in_the_default_partition_are_moved_into_the_new_one():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = (None,)
+
+    ensure_month_partitions(cursor, date(2025, 3, 1), date(2025, 3, 1))
+
+    hold, create, restore = cursor.execute.call_args_list[1:]
+    assert "DELETE FROM student.weather_data_default" in hold.args[0]
+    assert hold.args[1] == {'start': date(2025, 3, 1), 'end': date(2025, 4, 1)}
+    assert "CREATE TABLE student.weather_data_2025_03" in create.args[0]
+    assert "INSERT INTO student.weather_data" in restore.args[0]
+
+
+def test_extend_starts_at_the_oldest_stranded_row():
+    conn, cursor = make_conn()
+    cursor.fetchone.side_effect = [(date(2024, 12, 20),)] + [('exists',)] * 6
+
+    extend_partitions(conn, today=date(2025, 2, 10))
+
+    assert cursor.execute.call_args_list[0] == LOCK
+    probes = [c.args[1][0] for c in cursor.execute.call_args_list if c.args[0] == "SELECT to_regclass(%s)"]
+    assert probes == [f"student.weather_data_{month}" for month in
+                      ('2024_12', '2025_01', '2025_02', '2025_03', '2025_04', '2025_05')]
+    conn.commit.assert_called_once()
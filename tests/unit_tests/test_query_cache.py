@@ -0,0 +1,51 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+from etl.extract.query_cache import QueryCache, cached_query
+
+
+def test_repeat_query_is_served_from_cache():
+    cache = QueryCache()
+    loader = MagicMock(return_value={'rows': 1})
+
+    cached_query("Bristol", loader, cache)
+    cached_query(" bristol ", loader, cache)
+
+    loader.assert_called_once_with("Bristol")
+    assert cache.stats()['hits'] == 1
+
+
+def test_newer_ingest_invalidates_only_that_city():
+    cache = QueryCache()
+    loader = MagicMock(return_value={'rows': 1})
+    cached_query("Bristol", loader, cache)
+    cached_query("London", loader, cache)
+
+    assert cache.note_ingest("Bristol", datetime(2025, 1, 8, 10, 0))
+    cached_query("Bristol", loader, cache)
+    cached_query("London", loader, cache)
+
+    assert loader.call_count == 3
+
+
+def test_older_ingest_keeps_cached_entry():
+    cache = QueryCache()
+    cache.note_ingest("Bristol", datetime(2025, 1, 8, 10, 0))
+    loader = MagicMock(return_value={'rows': 1})
+    cached_query("Bristol", loader, cache)
+
+    assert not cache.note_ingest("Bristol", datetime(2025, 1, 8, 9, 0))
+    cached_query("Bristol", loader, cache)
+
+    loader.assert_called_once()
+
+
+def test_expired_and_evicted_entries_are_reloaded():
+    cache = QueryCache(ttl=0, max_entries=1)
+    loader = MagicMock(return_value={'rows': 1})
+
+    cached_query("Bristol", loader, cache)
+    cached_query("Bristol", loader, cache)
+    cached_query("London", loader, cache)
+
+    assert loader.call_count == 3
+    assert cache.stats()['entries'] == 1
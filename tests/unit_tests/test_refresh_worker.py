@@ -0,0 +1,40 @@
+import threading
+from etl.extract import current
+from etl.extract.refresh_worker import RefreshWorker
+
+
+def test_refresh_runs_in_background_and_joins_running_job(mocker):
+    release = threading.Event()
+
+    def ingest(location, progress):
+        progress(0.6, "Storing")
+        release.wait(5)
+        return True
+
+    insert_current = mocker.patch.object(current, 'insert_current', side_effect=ingest)
+    worker = RefreshWorker()
+
+    job = worker.start("Bristol")
+    assert worker.start(" bristol ") is job
+    assert job.running
+
+    release.set()
+    worker._executor.shutdown(wait=True)
+    insert_current.assert_called_once_with("Bristol", progress=job.report)
+    assert (job.status, job.progress) == ('updated', 1.0)
+    assert worker.job_for("BRISTOL") is job
+
+
+def test_failed_refresh_keeps_the_reported_error(mocker):
+    def ingest(location, progress):
+        progress(1.0, "Failed to retrieve data: HTTP Status Code 400: No location found")
+        return None
+
+    mocker.patch.object(current, 'insert_current', side_effect=ingest)
+    worker = RefreshWorker()
+
+    job = worker.start("Nowhere")
+    worker._executor.shutdown(wait=True)
+
+    assert job.status == 'failed'
+    assert job.message.endswith("No location found")
@@ -0,0 +1,61 @@
+import datetime
+
+import pytest
+from unittest.mock import MagicMock
+
+from etl.load import copy_loader
+from etl.load.copy_loader import CURRENT_TARGET, HISTORIC_TARGET, copy_load
+from etl.load.retention import compact, refresh_latest
+
+
+def test_refresh_latest_probes_each_city_once():
+    cursor = MagicMock()
+    moved = [('bristol', datetime.date(2025, 1, 31)), ('bristol', datetime.date(2025, 2, 1))]
+    cursor.fetchall.return_value = moved
+
+    assert refresh_latest(cursor, ["Bristol", " bristol", "London", None]) == moved
+    assert refresh_latest(cursor, []) == []
+
+    cursor.execute.assert_called_once()
+    sql, params = cursor.execute.call_args.args
+    assert "LIMIT 1" in sql
+    # the replaced row's day too, its month loses that day
+    assert "FROM previous p JOIN refreshed r" in sql
+    assert params == {'city_keys': ['bristol', 'london']}
+
+
+def test_only_current_readings_refresh_the_latest_table(mocker):
+    refresh = mocker.patch.object(copy_loader, 'refresh_latest')
+    mocker.patch.object(copy_loader, 'refresh_monthly_rollups')
+    mocker.patch.object(copy_loader, 'copy_rows', return_value=1)
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = [("Bristol",)]
+
+    copy_load(conn, HISTORIC_TARGET, [])
+    refresh.assert_not_called()
+
+    copy_load(conn, CURRENT_TARGET, [])
+    refresh.assert_called_once_with(cursor, ["Bristol"])
+
+
+def test_compact_walks_batches_up_to_the_retention_cutoff():
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    # oldest raw day, then (readings, days) moved per batch
+    cursor.fetchone.side_effect = [(datetime.date(2025, 1, 1),), (48, 2), (24, 1)]
+
+    removed = compact(conn, retention=30, batch_days=10, today=datetime.date(2025, 2, 20))
+
+    assert removed == 72
+    batches = [c.args[1] for c in cursor.execute.call_args_list[1:]]
+    assert batches == [
+        {'start': datetime.date(2025, 1, 1), 'end': datetime.date(2025, 1, 11)},
+        {'start': datetime.date(2025, 1, 11), 'end': datetime.date(2025, 1, 21)},
+    ]
+    assert conn.commit.call_count == 3
+
+
+def test_compact_refuses_to_prune_everything():
+    with pytest.raises(ValueError):
+        compact(MagicMock(), retention=0)
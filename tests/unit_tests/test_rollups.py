@@ -0,0 +1,148 @@
+import datetime
+from contextlib import contextmanager
+
+from unittest.mock import MagicMock
+
+from etl.extract import current
+from etl.extract.current import load_current, current_row
+from etl.extract.historic import history_rows, load_history
+from etl.load import copy_loader
+from etl.load.copy_loader import CURRENT_TARGET, HISTORIC_TARGET, copy_load
+from etl.load.rollups import (
+    month_start, rebuild_monthly_rollups, rebuild_stmt, refresh_monthly_rollups, refresh_stmt,
+)
+from tests.load.fake_weatherapi import current_payload, history_payload
+from tests.unit_tests.conftest import TEST_CITY
+
+MONTH_BOUNDS = "AND {0}.date >= t.month AND {0}.date < t.month + INTERVAL '1 month'"
+
+
+def test_refresh_targets_each_city_month_once():
+    cursor = MagicMock()
+
+    refreshed = refresh_monthly_rollups(cursor, [
+        ("Bristol", datetime.date(2025, 1, 8)), (" bristol", "2025-01-31"),
+        ("Bristol", datetime.date(2025, 2, 1)), ("London", datetime.date(2024, 12, 31)),
+    ])
+
+    assert refreshed == 3
+    sql, params = cursor.execute.call_args.args
+    assert sql == refresh_stmt
+    assert params == {
+        'city_keys': ['bristol', 'bristol', 'london'],
+        'months': [datetime.date(2025, 1, 1), datetime.date(2025, 2, 1), datetime.date(2024, 12, 1)],
+    }
+
+
+def test_nothing_loaded_means_no_refresh():
+    cursor = MagicMock()
+
+    assert refresh_monthly_rollups(cursor, []) == 0
+    cursor.execute.assert_not_called()
+
+
+def test_month_start_accepts_dates_and_iso_strings():
+    assert month_start("2024-02-29") == datetime.date(2024, 2, 1)
+    assert month_start(datetime.date(2025, 12, 31)) == datetime.date(2025, 12, 1)
+
+
+def test_refresh_reads_only_the_targeted_months():
+    assert "unnest(%(city_keys)s::TEXT[], %(months)s::DATE[])" in refresh_stmt
+    # both sources are cut to [month, month + 1 month) of their target
+    assert MONTH_BOUNDS.format('h') in refresh_stmt
+    assert MONTH_BOUNDS.format('l') in refresh_stmt
+    assert "FROM student.weather_data_latest l" in refresh_stmt
+    assert "ON CONFLICT (city_key, month) DO UPDATE" in refresh_stmt
+
+
+def test_rebuild_targets_every_month_of_both_sources():
+    cursor = MagicMock()
+
+    rebuild_monthly_rollups(cursor)
+
+    cursor.execute.assert_called_once_with(rebuild_stmt)
+    targets = rebuild_stmt.split("),\nhistoric AS", 1)[0]
+    assert "FROM student.de11_fehu_capstone" in targets
+    assert "FROM student.weather_data_latest" in targets
+    assert "%(" not in rebuild_stmt
+
+
+def loader_cursor(mocker, staged):
+    mocker.patch.object(copy_loader, 'copy_rows', return_value=len(staged))
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+    cursor.fetchall.return_value = staged
+    return conn, cursor
+
+
+def test_historic_loads_refresh_the_staged_months(mocker):
+    refresh = mocker.patch.object(copy_loader, 'refresh_monthly_rollups')
+    staged = [("Bristol", datetime.date(2025, 1, 1)), ("Bristol", datetime.date(2025, 2, 1))]
+    conn, cursor = loader_cursor(mocker, staged)
+
+    copy_load(conn, HISTORIC_TARGET, [])
+
+    refresh.assert_called_once_with(cursor, staged)
+
+
+def test_current_loads_refresh_the_months_of_the_latest_row(mocker):
+    refresh = mocker.patch.object(copy_loader, 'refresh_monthly_rollups')
+    moved = [('bristol', datetime.date(2025, 1, 31)), ('bristol', datetime.date(2025, 2, 1))]
+    mocker.patch.object(copy_loader, 'refresh_latest', return_value=moved)
+    conn, cursor = loader_cursor(mocker, [("Bristol",)])
+
+    copy_load(conn, CURRENT_TARGET, [])
+
+    refresh.assert_called_once_with(cursor, moved)
+
+
+def test_insert_current_refreshes_the_months_of_the_latest_row(mocker):
+    conn = MagicMock()
+    cursor = conn.cursor.return_value.__enter__.return_value
+
+    @contextmanager
+    def connection():
+        yield conn
+    mocker.patch.object(current, 'load_dotenv')
+    mocker.patch.object(current, 'initialise_db')
+    mocker.patch.object(current, 'get_connection', connection)
+    mocker.patch.object(current, 'weather_cache')
+    payload = current_payload("Bristol", datetime.datetime(2025, 2, 1, 6, 15))
+    mocker.patch.object(current, 'get_client').return_value.get.return_value = payload
+    moved = [('bristol', datetime.date(2025, 1, 31)), ('bristol', datetime.date(2025, 2, 1))]
+    mocker.patch.object(current, 'refresh_latest', return_value=moved)
+    refresh = mocker.patch.object(current, 'refresh_monthly_rollups')
+
+    assert current.insert_current("Bristol") is True
+
+    refresh.assert_called_once_with(cursor, moved)
+
+
+def rollup_rows(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        SELECT month, avgtemp_c, maxtemp_c, mintemp_c, totalprecip_mm, max_uv_index, day_count
+        FROM student.de11_fehu_monthly_rollup WHERE city_key = LOWER(%s) ORDER BY month
+        """, (TEST_CITY,))
+        return cursor.fetchall()
+
+
+def test_incremental_refreshes_match_a_rebuild(test_db):
+    load_history(test_db, history_rows(history_payload(
+        TEST_CITY, datetime.date(2024, 12, 20), datetime.date(2025, 1, 20), hourly=False
+    )))
+    load_history(test_db, history_rows(history_payload(
+        TEST_CITY, datetime.date(2025, 1, 15), datetime.date(2025, 2, 3), hourly=False
+    )))
+    for reading in ((2025, 2, 4, 9), (2025, 2, 28, 23), (2025, 3, 2, 6)):
+        load_current(test_db, [current_row(current_payload(TEST_CITY, datetime.datetime(*reading)))])
+    incremental = rollup_rows(test_db)
+
+    with test_db.cursor() as cursor:
+        cursor.execute("DELETE FROM student.de11_fehu_monthly_rollup WHERE city_key = LOWER(%s)", (TEST_CITY,))
+        rebuild_monthly_rollups(cursor)
+    test_db.commit()
+
+    assert [row[0] for row in incremental] == [datetime.date(2024, 12, 1), datetime.date(2025, 1, 1),
+                                               datetime.date(2025, 2, 1), datetime.date(2025, 3, 1)]
+    assert incremental == rollup_rows(test_db)
@@ -0,0 +1,53 @@
+import datetime
+import pandas as pd
+from etl.extract.snapshot import SnapshotStore
+from etl.extract.weather_repository import WeatherRepository, WEATHER_COLUMNS
+
+
+def historic(city, days, maxtemp, loaded_at):
+    dates = pd.to_datetime(days)
+    return pd.DataFrame({
+        'city': city, 'date': dates, 'avgtemp_c': 1.0, 'maxtemp_c': maxtemp, 'mintemp_c': 0.0,
+        'totalprecip_mm': 0.5, 'uv_index': 1.0, 'loaded_at': pd.Timestamp(loaded_at, tz='UTC'),
+    })
+
+
+def test_partitions_keep_the_newest_load_of_each_day(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.write_partition("st. john's", 2024, historic("St. John's", ['2024-01-01', '2024-01-02'], 5.0, '2025-01-01'))
+    store.write_partition("st. john's", 2024, historic("St. John's", ['2024-01-02'], 9.0, '2025-02-01'))
+    store.write_partition("st. john's", 2025, historic("St. John's", ['2025-01-01'], 7.0, '2025-02-01'))
+
+    df = store.read_city("st. john's")
+
+    assert df['maxtemp_c'].tolist() == [5.0, 9.0, 7.0]
+    assert len(store.read_city("st. john's", years=[2025])) == 1
+    assert store.read_city("bristol").empty
+
+
+def test_repository_reads_snapshot_plus_postgres_delta(tmp_path, mocker):
+    store = SnapshotStore(str(tmp_path))
+    store.write_partition("bristol", 2025, historic("Bristol", ['2025-01-01', '2025-01-02'], 5.0, '2025-01-01'))
+    high_water_mark = datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc)
+    store.write_meta(high_water_mark, 2)
+    repository = WeatherRepository(connection_factory=mocker.Mock(), snapshot=store)
+    delta = historic("Bristol", ['2025-01-02', '2025-01-03'], 8.0, '2025-02-01')[WEATHER_COLUMNS]
+    read_frame = mocker.patch.object(repository, 'read_frame', return_value=delta)
+
+    df = repository.get_weather_data("Bristol")
+
+    read_frame.assert_called_once_with('weather_series_delta', ("Bristol", high_water_mark), WEATHER_COLUMNS)
+    assert list(df.columns) == WEATHER_COLUMNS
+    assert df['maxtemp_c'].tolist() == [5.0, 8.0, 8.0]
+
+
+def test_snapshot_read_uses_the_normalised_city_key(tmp_path, mocker):
+    store = SnapshotStore(str(tmp_path))
+    store.write_partition("bristol", 2025, historic("Bristol", ['2025-01-01'], 5.0, '2025-01-01'))
+    store.write_meta(datetime.datetime(2025, 1, 1, tzinfo=datetime.timezone.utc), 1)
+    repository = WeatherRepository(connection_factory=mocker.Mock(), snapshot=store)
+    mocker.patch.object(repository, 'read_frame', return_value=pd.DataFrame(columns=WEATHER_COLUMNS))
+
+    df = repository.get_weather_data(" Bristol ")
+
+    assert df['maxtemp_c'].tolist() == [5.0]
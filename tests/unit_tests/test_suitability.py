@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+from etl.extract.vegtables import CropProfile
+from etl.transform.suitability import score_crop_suitability, temperature_scores
+
+
+def profile(name, mintemp, maxtemp, precip):
+    return CropProfile(name, None, np.full(12, mintemp, dtype=float),
+                       np.full(12, maxtemp, dtype=float), np.full(12, precip, dtype=float))
+
+
+def test_temperature_scores_share_of_range_inside_band():
+    band_min = np.array([[0.0] * 12, [10.0] * 12])
+    band_max = np.array([[10.0] * 12, [20.0] * 12])
+
+    scores = temperature_scores(
+        np.array([5.0, 12.0, np.nan]), np.array([15.0, 12.0, 8.0]),
+        np.array([0, 0, 0]), band_min, band_max
+    )
+
+    assert scores.shape == (2, 3)
+    np.testing.assert_allclose(scores[:, :2], [[0.5, 0.0], [0.5, 1.0]])
+    assert np.isnan(scores[:, 2]).all()
+
+
+def test_cities_rank_crops_that_fit_their_weather_first():
+    registry = {'kale': profile('kale', 0, 10, 31), 'melon': profile('melon', 20, 35, 31)}
+    dates = pd.date_range('2025-01-01', '2025-01-31')
+    daily = pd.DataFrame({
+        'city': ['Bristol'] * len(dates) + ['Cairo'] * len(dates),
+        'date': list(dates) * 2,
+        'mintemp_c': [2.0] * len(dates) + [22.0] * len(dates),
+        'maxtemp_c': [8.0] * len(dates) + [30.0] * len(dates),
+        'totalprecip_mm': [1.0] * (2 * len(dates)),
+    })
+
+    scores = score_crop_suitability(daily, registry).set_index(['city', 'crop'])
+
+    assert scores.loc[('bristol', 'kale'), 'rank'] == 1
+    assert scores.loc[('cairo', 'melon'), 'rank'] == 1
+    assert scores.loc[('bristol', 'kale'), 'suitability_score'] == 1.0
+    assert scores.loc[('bristol', 'melon'), 'temperature_score'] == 0.0
+    assert scores.loc[('cairo', 'kale'), 'days'] == 31
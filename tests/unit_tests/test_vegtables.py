@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import pytest
+from etl.extract import vegtables
+
+
+@pytest.fixture
+def data_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(vegtables, 'DATA_FOLDER', str(tmp_path))
+    monkeypatch.setattr(vegtables, '_registry', None)
+    monkeypatch.setattr(vegtables, 'MTIME_CHECK_INTERVAL', 0)
+    return tmp_path
+
+
+def write_crop(folder, name, rows):
+    lines = ["month,mintemp_c,maxtemp_c,precip_mm,growth_phase"] + rows
+    (folder / f"{name}.csv").write_text("\n".join(lines), encoding='utf-8-sig')
+
+
+def test_profiles_hold_month_indexed_readonly_arrays(data_folder):
+    write_crop(data_folder, "beans", ["March,3,9,55,Growth", "January,1,5,60,Dormancy"])
+
+    profile = vegtables.get_crop_profile("beans")
+
+    assert profile.mintemp_c[0] == 1
+    assert profile.maxtemp_c[2] == 9
+    assert np.isnan(profile.precip_mm[1])
+    with pytest.raises(ValueError):
+        profile.precip_mm[0] = 0
+
+
+def test_registry_is_reused_until_a_file_changes(data_folder):
+    write_crop(data_folder, "beans", ["January,1,5,60,Dormancy"])
+    first = vegtables.get_veg_data()
+
+    assert vegtables.get_veg_data() is first
+
+    write_crop(data_folder, "beans", ["January,2,5,60,Dormancy"])
+    path = data_folder / "beans.csv"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert vegtables.get_veg_data() is not first
+    assert vegtables.get_crop_profile("beans").mintemp_c[0] == 2
@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+from utils.metrics import timed
+
+# pool sizing and health check settings, read from the env loaded by
+# config.env_config.setup_env (or a plain .env file when run as a script)
+DEFAULT_POOL_MIN = 1
+DEFAULT_POOL_MAX = 10
+DEFAULT_POOL_TIMEOUT = 30
+DEFAULT_HEALTHCHECK_INTERVAL = 30
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class DatabasePool:
+    """Bounded psycopg2 connection pool shared by the app and ingest scripts.
+
+    psycopg2's ThreadedConnectionPool raises as soon as maxconn connections
+    are borrowed, so checkout is guarded by a semaphore and callers wait up
+    to `timeout` seconds for a connection to be returned instead.
+    """
+
+    def __init__(self, minconn, maxconn, timeout=DEFAULT_POOL_TIMEOUT,
+                 healthcheck_interval=DEFAULT_HEALTHCHECK_INTERVAL,
+                 **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(
+                f"Invalid pool size: min={minconn}, max={maxconn}"
+            )
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+        self._pool = pg_pool.ThreadedConnectionPool(
+            minconn, maxconn, **connect_kwargs
+        )
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_seconds': 0.0,
+            'timeouts': 0,
+            'healthchecks': 0,
+            'healthcheck_failures': 0,
+            'discarded': 0,
+        }
+
+    def getconn(self):
+        start = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats['waits'] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                raise PoolTimeout(
+                    f"No database connection available after "
+                    f"{self.timeout}s (max={self.maxconn})"
+                )
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['wait_seconds'] += time.monotonic() - start
+        return conn
+
+    def putconn(self, conn, close=False):
+        try:
+            if not close and not conn.closed:
+                # never hand a connection back mid-transaction
+                try:
+                    if conn.info.transaction_status != \
+                            psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    close = True
+            with self._lock:
+                self._last_used[id(conn)] = time.monotonic()
+            self._pool.putconn(conn, close=close or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+    def _checkout(self):
+        # retry once per slot so a pool full of dead connections drains
+        for _ in range(self.maxconn + 1):
+            conn = self._pool.getconn()
+            if self._is_healthy(conn):
+                return conn
+            with self._lock:
+                self._stats['discarded'] += 1
+                self._last_used.pop(id(conn), None)
+            self._pool.putconn(conn, close=True)
+        raise psycopg2.OperationalError(
+            "Could not obtain a healthy database connection"
+        )
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        with self._lock:
+            last_used = self._last_used.get(id(conn))
+        # freshly opened or recently used connections skip the round trip
+        if last_used is None or \
+                time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        with self._lock:
+            self._stats['healthchecks'] += 1
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            with self._lock:
+                self._stats['healthcheck_failures'] += 1
+            return False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            in_use = len(self._pool._used)
+            idle = len(self._pool._pool)
+        stats.update({
+            'min': self.minconn,
+            'max': self.maxconn,
+            'in_use': in_use,
+            'idle': idle,
+            'size': in_use + idle,
+        })
+        return stats
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+def _int_env(name, default):
+    value = os.getenv(name)
+    return int(value) if value not in (None, '') else default
+
+
+def connection_params():
+    # for connections kept outside the pool, e.g. a LISTEN session
+    return {
+        'dbname': os.getenv('SOURCE_DB_NAME'),
+        'user': os.getenv('SOURCE_DB_USER'),
+        'password': os.getenv('SOURCE_DB_PASSWORD'),
+        'host': os.getenv('SOURCE_DB_HOST'),
+        'port': os.getenv('SOURCE_DB_PORT'),
+    }
+
+
+def pool_config():
+    return {
+        'minconn': _int_env('DB_POOL_MIN', DEFAULT_POOL_MIN),
+        'maxconn': _int_env('DB_POOL_MAX', DEFAULT_POOL_MAX),
+        'timeout': _int_env('DB_POOL_TIMEOUT', DEFAULT_POOL_TIMEOUT),
+        'healthcheck_interval': _int_env(
+            'DB_POOL_HEALTHCHECK_INTERVAL', DEFAULT_HEALTHCHECK_INTERVAL
+        ),
+        **connection_params(),
+    }
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = DatabasePool(**pool_config())
+    return _pool
+
+
+@contextmanager
+def get_connection():
+    # borrow a connection and always hand it back, closing it on errors
+    # that leave it unusable
+    db_pool = get_pool()
+    with timed('db_connect'):
+        conn = db_pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    finally:
+        db_pool.putconn(conn, close=broken)
+
+
+def pool_stats():
+    if _pool is None:
+        return {}
+    return _pool.stats()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
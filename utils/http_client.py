@@ -0,0 +1,249 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from utils.lazy import lazy_import
+from utils.metrics import timed
+
+# requests is only imported when the first client is built
+requests = lazy_import('requests')
+
+# WeatherAPI client settings, read from the env loaded by
+# config.env_config.setup_env (or a plain .env file when run as a script)
+DEFAULT_BASE_URL = "http://api.weatherapi.com/v1"
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_POOL_SIZE = 10
+MAX_BACKOFF = 30
+
+# WeatherAPI refreshes current conditions every 15 minutes; a cached
+# current.json is kept until the next expected update, within these bounds
+CURRENT_UPDATE_SECONDS = 900
+MIN_CURRENT_TTL = 30
+# past days never change upstream; a window reaching today is still being
+# filled in and is kept no longer than a current reading
+HISTORY_TTL = 24 * 3600
+DEFAULT_CACHE_ENTRIES = 128
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class WeatherApiError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def current_ttl(response_data, params=None, now=None):
+    # seconds until WeatherAPI is expected to publish a newer reading
+    now = time.time() if now is None else now
+    last_updated = response_data.get('current', {}).get('last_updated_epoch')
+    if last_updated is None:
+        return MIN_CURRENT_TTL
+    return min(CURRENT_UPDATE_SECONDS, max(MIN_CURRENT_TTL, last_updated + CURRENT_UPDATE_SECONDS - now))
+
+
+def history_ttl(response_data, params=None, now=None):
+    # end_dt (or dt for a single day) is a local date of the location
+    params = params or {}
+    end = params.get('end_dt') or params.get('dt')
+    localtime = response_data.get('location', {}).get('localtime')
+    if localtime:
+        today = localtime[:10]
+    else:
+        today = time.strftime('%Y-%m-%d', time.localtime(time.time() if now is None else now))
+    if end is None or str(end) >= today:
+        return CURRENT_UPDATE_SECONDS
+    return HISTORY_TTL
+
+
+# endpoint -> function of the decoded response and the query params
+# returning its TTL in seconds
+CACHE_TTLS = {
+    'current.json': current_ttl,
+    'history.json': history_ttl,
+}
+
+
+def error_message(response):
+    # WeatherAPI errors are {"error": {"code": ..., "message": ...}}, but
+    # proxies and outages return HTML or empty bodies
+    try:
+        return response.json()['error']['message']
+    except (ValueError, KeyError, TypeError):
+        text = response.text.strip()
+        return text[:200] if text else response.reason
+
+
+class WeatherApiClient:
+    """Keep-alive WeatherAPI client shared by the app and ingest scripts.
+
+    One requests.Session with a pooled HTTPAdapter, a timeout on every call,
+    retries with jittered exponential backoff on connection errors, 429 and
+    5xx, and an in-process cache of decoded responses keyed on (endpoint,
+    query) with a TTL matched to how often each endpoint changes upstream.
+    """
+
+    def __init__(self, base_url=DEFAULT_BASE_URL, timeout=DEFAULT_TIMEOUT,
+                 retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 pool_size=DEFAULT_POOL_SIZE, cache_entries=DEFAULT_CACHE_ENTRIES):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache_entries = cache_entries
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'retries': 0, 'failures': 0,
+                       'cache_hits': 0, 'cache_misses': 0}
+
+    def _cache_key(self, endpoint, params):
+        # the API key never ends up in the key
+        return endpoint, tuple(sorted((k, str(v)) for k, v in params.items() if k != 'key'))
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self._stats['cache_hits'] += 1
+                return entry[1]
+            self._cache.pop(key, None)
+            self._stats['cache_misses'] += 1
+            return None
+
+    def _store(self, key, endpoint, params, response_data):
+        ttl_for = CACHE_TTLS.get(endpoint)
+        if ttl_for is None or self.cache_entries <= 0:
+            return
+        with self._lock:
+            self._cache[key] = (time.monotonic() + ttl_for(response_data, params), response_data)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_entries:
+                self._cache.popitem(last=False)
+
+    def _sleep_before_retry(self, attempt, response=None):
+        delay = min(MAX_BACKOFF, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.5)
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(MAX_BACKOFF, int(retry_after)))
+        with self._lock:
+            self._stats['retries'] += 1
+        time.sleep(delay)
+
+    def get(self, endpoint, params, use_cache=True, before_attempt=None):
+        """GET `endpoint` with `params` and return the decoded JSON.
+
+        Cached responses are shared, callers must not modify them.
+        `before_attempt`, if given, is called before every HTTP request,
+        retries included, e.g. to take a rate limiter token. Raises
+        WeatherApiError once retries are exhausted or on a non-retryable
+        error response.
+        """
+        key = self._cache_key(endpoint, params)
+        if use_cache:
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+
+        url = f"{self.base_url}/{endpoint}"
+        query = {'key': os.getenv('API_KEY'), **params}
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            if before_attempt is not None:
+                before_attempt()
+            with self._lock:
+                self._stats['requests'] += 1
+            try:
+                with timed('api_fetch', endpoint=endpoint):
+                    response = self.session.get(url, params=query, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt:
+                    self._fail()
+                    raise WeatherApiError(f"Request to {endpoint} failed: {e}") from e
+                self._sleep_before_retry(attempt)
+                continue
+
+            if response.status_code in RETRY_STATUSES and not last_attempt:
+                self._sleep_before_retry(attempt, response)
+                continue
+            if response.status_code != 200:
+                self._fail()
+                raise WeatherApiError(
+                    f"HTTP Status Code {response.status_code}: {error_message(response)}",
+                    response.status_code
+                )
+            try:
+                response_data = response.json()
+            except ValueError as e:
+                self._fail()
+                raise WeatherApiError(f"Invalid JSON from {endpoint}", response.status_code) from e
+            self._store(key, endpoint, params, response_data)
+            return response_data
+
+    def _fail(self):
+        with self._lock:
+            self._stats['failures'] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cache_entries'] = len(self._cache)
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+def _number_env(name, default, cast=int):
+    value = os.getenv(name)
+    return cast(value) if value not in (None, '') else default
+
+
+def client_config():
+    return {
+        'base_url': os.getenv('WEATHER_API_BASE_URL') or DEFAULT_BASE_URL,
+        'timeout': _number_env('WEATHER_API_TIMEOUT', DEFAULT_TIMEOUT, float),
+        'retries': _number_env('WEATHER_API_RETRIES', DEFAULT_RETRIES),
+        'backoff': _number_env('WEATHER_API_BACKOFF', DEFAULT_BACKOFF, float),
+        'pool_size': _number_env('WEATHER_API_POOL_SIZE', DEFAULT_POOL_SIZE),
+        # 0 turns the response cache off, e.g. for load tests
+        'cache_entries': _number_env('WEATHER_API_CACHE_ENTRIES', DEFAULT_CACHE_ENTRIES),
+    }
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WeatherApiClient(**client_config())
+    return _client
+
+
+def client_stats():
+    if _client is None:
+        return {}
+    return _client.stats()
+
+
+def close_client():
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
@@ -0,0 +1,38 @@
+import importlib
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    """Stands in for a module until one of its attributes is first used.
+
+    `px = lazy_import('plotly.express')` at the top of a module keeps the
+    usual `px.line(...)` calls, but plotly is only imported by the first
+    call, so importing the module (or collecting its tests) does not pay
+    for dependencies the caller never touches.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            # import_module holds the import lock, this only stops two
+            # threads both binding the result
+            with _lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
@@ -0,0 +1,167 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# stage latency histogram buckets, in seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# recent samples kept per series for the debug panel's percentiles
+RECENT_SAMPLES = 500
+
+STAGE_SECONDS = 'weather_stage_duration_seconds'
+STAGE_ERRORS = 'weather_stage_errors_total'
+STAGE_ROWS = 'weather_stage_rows_total'
+
+HELP = {
+    STAGE_SECONDS: 'Time spent in each pipeline stage.',
+    STAGE_ERRORS: 'Stage runs that raised an exception.',
+    STAGE_ROWS: 'Rows handled by each stage.',
+}
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+
+    def percentile(self, q):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class MetricsRegistry:
+    """In-process histograms and counters for the ingest and dashboard stages.
+
+    Series are named Prometheus metric families plus labels. Everything is
+    kept in memory; prometheus_text() renders it in the text exposition
+    format for a node_exporter textfile or a scrape.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def timed(self, stage, **labels):
+        # time the block as one run of `stage`; a raised exception is
+        # counted as an error and the time is still recorded
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.inc(STAGE_ERRORS, stage=stage, **labels)
+            raise
+        finally:
+            self.observe(STAGE_SECONDS, time.perf_counter() - start, stage=stage, **labels)
+
+    def count_rows(self, stage, rows, **labels):
+        self.inc(STAGE_ROWS, rows, stage=stage, **labels)
+
+    def summary(self):
+        # one row per timed series for the debug panel, slowest total first
+        with self._lock:
+            rows = [
+                {'stage': dict(key)['stage'],
+                 'labels': ', '.join(f"{k}={v}" for k, v in key if k != 'stage'),
+                 'count': h.count, 'total_ms': round(h.sum * 1000, 1),
+                 'mean_ms': round(h.sum / h.count * 1000, 2),
+                 'p50_ms': round(h.percentile(0.5) * 1000, 2),
+                 'p95_ms': round(h.percentile(0.95) * 1000, 2)}
+                for (name, key), h in self._histograms.items() if name == STAGE_SECONDS
+            ]
+        return sorted(rows, key=lambda row: row['total_ms'], reverse=True)
+
+    def counters(self):
+        with self._lock:
+            return {(name, key): value for (name, key), value in self._counters.items()}
+
+    def prometheus_text(self):
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        lines = []
+        seen = set()
+        for (name, key), histogram in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', repr(float(bound)))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        for (name, key), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+            lines.append(f"{name}{_format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path=None):
+        # atomic write, so a scraper never reads half a file; the path
+        # defaults to METRICS_TEXTFILE and nothing is written without one
+        path = path or os.getenv('METRICS_TEXTFILE')
+        if not path:
+            return None
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+metrics = MetricsRegistry()
+timed = metrics.timed